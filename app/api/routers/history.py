@@ -0,0 +1,35 @@
+# app/api/routers/history.py
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.security import get_current_user
+from app.db.session import get_async_db
+from app.schemas.history import ChatHistoryPage
+from app.schemas.user import AuthenticatedUser
+from app.services import history_service
+
+router = APIRouter()
+
+@router.get("/history/", response_model=ChatHistoryPage)
+async def read_history(
+    limit: int = Query(
+        settings.HISTORY_PAGE_SIZE, ge=1, le=100, description="每页条数"
+    ),
+    cursor: Optional[str] = Query(
+        None, description="上一页响应中的 next_cursor，为空时从最新的记录开始"
+    ),
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    按时间从新到旧分页返回当前用户的问答记录。
+    """
+    try:
+        return await history_service.aget_history_page(
+            db, current_user.id, limit, cursor
+        )
+    except history_service.InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
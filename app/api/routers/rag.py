@@ -1,117 +1,228 @@
 # app/api/routers/rag.py
-from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import StreamingResponse
 
-from langchain.retrievers import MergerRetriever
-
 from typing import AsyncGenerator
-import tempfile
 import os
-from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks, Depends
-
-from app.services import rag_service, ingestion_service
+from fastapi import APIRouter, HTTPException, Depends, status
+from sqlalchemy.orm import Session
+
+from app.services import (
+    history_service,
+    job_queue_service,
+    llm_service,
+    rag_service,
+    sse_service,
+    upload_service,
+)
 from app.core.config import settings
-from app.schemas.rag import QueryRequest, QueryResponse
+from app.db.session import get_db
+from app.schemas.rag import QueryRequest, QueryResponse, UploadJobResponse
 
 from app.core.security import get_current_user
-from app.models.user import User
+from app.schemas.user import AuthenticatedUser
 
 router = APIRouter()
 
-def get_user_collection_name(user: User) -> str:
+def get_user_collection_name(user: AuthenticatedUser) -> str:
     """根据用户ID生成专属的集合名称"""
     return f"user_{user.id}_collection"
 
+def require_llm_pool() -> llm_service.LLMClientPool:
+    """
+    LLM 客户端池不可用（未配置 DEEPSEEK_API_KEY 或启动预热尚未完成）时返回 503，
+    在检索之前拒绝请求
+    """
+    try:
+        return llm_service.get_llm_pool()
+    except RuntimeError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=(
+                "问答服务暂不可用：LLM 客户端未就绪，"
+                "请稍后重试或检查 DEEPSEEK_API_KEY 配置。"
+            ),
+        )
+
 # 1. 非流式问答接口
 @router.post("/query", response_model=QueryResponse)
-async def ask_question(request: QueryRequest, current_user: User = Depends(get_current_user)):
+async def ask_question(
+    request: QueryRequest,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    llm_pool: llm_service.LLMClientPool = Depends(require_llm_pool),
+):
     user_collection_name = get_user_collection_name(current_user)
 
-    # 1. 获取用户个人检索器
-    user_retriever = rag_service.get_retriever(
-        connection=settings.DATABASE_URL,
-        collection_name=user_collection_name,
-        embeddings_model_name=settings.EMBEDDING_MODEL_NAME,
-        async_connection=settings.ASYNC_DATABASE_URL
-    )
-    global_retriever = rag_service.get_retriever(
-        connection=settings.DATABASE_URL,
-        collection_name=settings.COLLECTION_NAME,
+    # 并发检索用户个人知识库和全局知识库
+    retrieval = await rag_service.aretrieve_documents(
+        question=request.question,
+        collection_names=[user_collection_name, settings.COLLECTION_NAME],
         embeddings_model_name=settings.EMBEDDING_MODEL_NAME,
-        async_connection=settings.ASYNC_DATABASE_URL
+        k=settings.RETRIEVAL_K,
+        ef_search=request.ef_search,
+        probes=request.probes,
+        mode=request.retrieval_mode or settings.RETRIEVAL_MODE,
+        rerank=settings.RERANK_ENABLED if request.rerank is None else request.rerank,
     )
 
-    # 3. 合并两个检索器
-    combined_retriever = MergerRetriever(retrievers=[user_retriever, global_retriever])
-    # --- 修改结束 ---
-
     result = await rag_service.get_answer_from_rag(
         question=request.question,
-        retriever=combined_retriever, # 传递合并后的检索器
-        llm_api_key=settings.DEEPSEEK_API_KEY,
-        llm_base_url=settings.LLM_BASE_URL,
-        llm_model=settings.LLM_MODEL_NAME
+        retrieval=retrieval,
+        llm_pool=llm_pool,
+    )
+    # 只放入写缓冲区，由后台任务批量写入数据库
+    history_service.HISTORY_WRITER.record(
+        current_user.id, request.question, result["answer"],
+        sources=[doc.metadata for doc in retrieval.documents], mode="query",
     )
     return result
 
 # 2. 流式问答接口
 @router.post("/stream-query")
-async def stream_ask_question(request: QueryRequest, current_user: User = Depends(get_current_user)) -> StreamingResponse:
+async def stream_ask_question(
+    request: QueryRequest,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    llm_pool: llm_service.LLMClientPool = Depends(require_llm_pool),
+) -> StreamingResponse:
     user_collection_name = get_user_collection_name(current_user)
 
-    user_retriever = rag_service.get_retriever(
-        connection=settings.DATABASE_URL,
-        collection_name=user_collection_name,
-        embeddings_model_name=settings.EMBEDDING_MODEL_NAME,
-        async_connection=settings.ASYNC_DATABASE_URL
-    )
-    global_retriever = rag_service.get_retriever(
-        connection=settings.DATABASE_URL,
-        collection_name=settings.COLLECTION_NAME,
+    retrieval = await rag_service.aretrieve_documents(
+        question=request.question,
+        collection_names=[user_collection_name, settings.COLLECTION_NAME],
         embeddings_model_name=settings.EMBEDDING_MODEL_NAME,
-        async_connection=settings.ASYNC_DATABASE_URL
+        k=settings.RETRIEVAL_K,
+        ef_search=request.ef_search,
+        probes=request.probes,
+        mode=request.retrieval_mode or settings.RETRIEVAL_MODE,
+        rerank=settings.RERANK_ENABLED if request.rerank is None else request.rerank,
     )
 
-    # 3. 合并两个检索器
-    combined_retriever = MergerRetriever(retrievers=[user_retriever, global_retriever])
-    # --- 修改结束 ---
-
-    answer_generator = rag_service.stream_rag_answer(
+    answer_events = rag_service.stream_rag_answer(
         question=request.question,
-        retriever=combined_retriever, # 传递合并后的检索器
-        llm_api_key=settings.DEEPSEEK_API_KEY,
-        llm_base_url=settings.LLM_BASE_URL,
-        llm_model=settings.LLM_MODEL_NAME
+        retrieval=retrieval,
+        llm_pool=llm_pool,
+        # 流式答案完整生成后只保存一次，而不是逐个 token 写入
+        on_complete=lambda answer: history_service.HISTORY_WRITER.record(
+            current_user.id, request.question, answer,
+            sources=[doc.metadata for doc in retrieval.documents], mode="stream",
+        ),
+    )
+    return StreamingResponse(
+        sse_service.encode_events(answer_events),
+        media_type="text/event-stream",
+        headers={
+            "X-Context-Tokens-Saved": str(retrieval.report.tokens_saved),
+            "Cache-Control": "no-cache",
+            # 关闭 Nginx 的响应缓冲，事件到达后立即转发给客户端
+            "X-Accel-Buffering": "no",
+        },
     )
-    return StreamingResponse(answer_generator, media_type="text/event-stream")
-# 3. 文件上传接口
-@router.post("/upload")
+# 3. 文件上传接口：文件流式落盘并写入任务队列，由独立的 worker 进程完成解析和向量化
+# 请求体不经过 UploadFile（它会先完整缓存一份），而是边接收边写盘，
+# 因此在 OpenAPI 中手动声明表单结构
+_UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                }
+            }
+        },
+    }
+}
+
+@router.post(
+    "/upload", status_code=status.HTTP_202_ACCEPTED, openapi_extra=_UPLOAD_OPENAPI
+)
 async def upload_document(
-    background_tasks: BackgroundTasks,
-    file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: Session = Depends(get_db),
 ):
-    if file.content_type != "application/pdf":
-        raise HTTPException(status_code=400, detail="只能上传 PDF 文件。")
-
+    # 背压：队列已满时在读取请求体之前直接拒绝，避免任务无限堆积
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-            content = await file.read()
-            tmp.write(content)
-            tmp_path = tmp.name
-
-        collection_name = get_user_collection_name(current_user)
-        background_tasks.add_task(
-            ingestion_service.process_and_embed_document,
-            file_path=tmp_path,
-            collection_name=collection_name, # 使用用户专属集合
-            embeddings_model_name=settings.EMBEDDING_MODEL_NAME,
-            connection_string=settings.DATABASE_URL
+        await run_in_threadpool(job_queue_service.check_capacity, db, current_user.id)
+    except job_queue_service.QueueFullError as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
         )
-        
-        background_tasks.add_task(os.remove, tmp_path) # 添加任务来清理临时文件
 
-        return {"message": "文件已接收，正在后台处理中...", "filename": file.filename}
+    try:
+        upload = await upload_service.save_pdf_upload(
+            request.headers,
+            request.stream(),
+            dest_dir=settings.UPLOAD_DIR,
+            max_bytes=settings.MAX_DOCUMENT_SIZE_MB * 1024 * 1024,
+        )
+    except upload_service.UploadTooLargeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e)
+        )
+    except upload_service.InvalidUploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
+    collection_name = get_user_collection_name(current_user) # 使用用户专属集合
+    try:
+        # 内容完全相同的文件已入库或正在处理时，直接拒绝，无需再解析
+        duplicate = await run_in_threadpool(
+            job_queue_service.find_duplicate, db, collection_name, upload.sha256
+        )
+        if duplicate is not None:
+            os.remove(upload.path)
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"相同内容的文件已存在: {duplicate}",
+            )
+
+        job = await run_in_threadpool(
+            job_queue_service.enqueue_job,
+            db,
+            user_id=current_user.id,
+            collection_name=collection_name,
+            filename=upload.filename, # 同名文件再次上传时按内容增量更新
+            file_path=upload.path,
+            file_hash=upload.sha256,
+        )
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"文件处理失败: {str(e)}")
\ No newline at end of file
+        os.remove(upload.path)
+        raise HTTPException(status_code=500, detail=f"文件处理失败: {str(e)}")
+
+    return {
+        "message": "文件已接收，正在排队处理中...",
+        "filename": upload.filename,
+        "job_id": job.id,
+        "status": job.status,
+        "size": upload.size,
+    }
+
+# 4. 上传任务状态查询接口
+@router.get("/upload/{job_id}", response_model=UploadJobResponse)
+def get_upload_job(
+    job_id: str,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    job = job_queue_service.get_job(db, job_id, current_user.id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在。")
+    return UploadJobResponse(
+        job_id=job.id,
+        filename=job.filename,
+        status=job.status,
+        attempts=job.attempts,
+        chunks_done=job.chunks_done,
+        chunks_total=job.chunks_total,
+        error=job.error,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+    )
@@ -0,0 +1,41 @@
+# app/api/routers/system.py
+from fastapi import APIRouter, Depends
+
+from app.core.password import get_password_hasher_stats
+from app.core.security import get_auth_stats, get_current_user
+from app.db.session import get_pool_stats
+from app.services import (
+    answer_cache,
+    context_service,
+    embedding_service,
+    history_service,
+    llm_service,
+    rerank_service,
+    sse_service,
+    startup_service,
+)
+from app.services.vector_stores import get_vector_store_backend
+from app.services.vector_stores.global_index import global_index_stats
+
+router = APIRouter()
+
+@router.get("/stats", dependencies=[Depends(get_current_user)])
+def read_stats():
+    """
+    返回进程内共享资源的运行统计，便于容量规划。包含连接池、缓存、队列和索引的内部状态，需要登录。
+    """
+    return {
+        "startup": startup_service.STARTUP.as_dict(),
+        "auth": get_auth_stats(),
+        "password_hasher": get_password_hasher_stats(),
+        "database": get_pool_stats(),
+        "embeddings": embedding_service.get_registry_stats(),
+        "vector_store": get_vector_store_backend().stats(),
+        "global_index": global_index_stats(),
+        "llm_pool": llm_service.get_llm_pool_stats(),
+        "answer_cache": answer_cache.ANSWER_CACHE.stats(),
+        "history": history_service.HISTORY_WRITER.stats(),
+        "context": context_service.CONTEXT_STATS.stats(),
+        "rerank": rerank_service.get_rerank_stats(),
+        "stream": sse_service.get_stream_stats(),
+    }
@@ -1,40 +1,55 @@
 # app/api/routers/user.py
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.session import get_db
-from app.schemas.user import UserCreate, UserResponse, Token
+from app.db.session import get_async_db
+from app.schemas.user import AuthenticatedUser, UserCreate, UserResponse, Token
 from app.services import user_service
-from app.core.security import create_access_token, get_current_user
-from app.models.user import User
+from app.core.password import PasswordHasherBusyError
+from app.core.security import create_user_access_token, get_current_user
 
 
 router = APIRouter()
 
+def _hasher_busy(e: PasswordHasherBusyError) -> HTTPException:
+    # 背压：密码哈希线程池排满时直接拒绝，而不是让请求无限排队
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=str(e),
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
 @router.post("/users/", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def create_new_user(user: UserCreate, db: Session = Depends(get_db)):
+async def create_new_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """
     注册一个新用户。
     """
-    db_user = user_service.get_user_by_username(db, username=user.username)
+    db_user = await user_service.aget_user_by_username(db, username=user.username)
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="用户名已被注册",
         )
-    return user_service.create_user(db=db, user=user)
+    try:
+        return await user_service.acreate_user(db=db, user=user)
+    except PasswordHasherBusyError as e:
+        raise _hasher_busy(e)
 
 @router.post("/token", response_model=Token)
-def login_for_access_token(
-    form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)
+async def login_for_access_token(
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     用户登录并获取 Access Token。
     """
-    user = user_service.authenticate_user(
-        db, username=form_data.username, password=form_data.password
-    )
+    try:
+        user = await user_service.aauthenticate_user(
+            db, username=form_data.username, password=form_data.password
+        )
+    except PasswordHasherBusyError as e:
+        raise _hasher_busy(e)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -42,12 +57,17 @@ def login_for_access_token(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    access_token = create_access_token(data={"sub": user.username})
+    if not user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="用户已被禁用"
+        )
+
+    access_token = create_user_access_token(user)
 
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/users/me", response_model=UserResponse)
-def read_users_me(current_user: User = Depends(get_current_user)):
+async def read_users_me(current_user: AuthenticatedUser = Depends(get_current_user)):
     """
     获取当前登录用户的信息。
     """
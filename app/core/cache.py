@@ -0,0 +1,173 @@
+# app/core/cache.py
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    线程安全的有界缓存：超过容量时淘汰最久未使用的条目 (LRU)，
+    条目空闲超过 ttl 秒后过期（refresh_on_get=False 时改为自写入起计时）。
+    get_or_create / aget_or_create 保证同一个键在并发请求下只会构建一次。
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        timer: Callable[[], float] = time.monotonic,
+        refresh_on_get: bool = True,
+    ):
+        if maxsize <= 0:
+            raise ValueError("maxsize 必须大于 0")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.refresh_on_get = refresh_on_get
+        self._timer = timer
+        self._data: OrderedDict[Hashable, tuple[Any, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks: dict[Hashable, threading.Lock] = {}
+        self._pending: dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return self._lookup(key, self._timer()) is not _MISSING
+
+    def _lookup(self, key: Hashable, now: float) -> Any:
+        """在持有锁的情况下查找条目，命中时刷新其访问时间"""
+        entry = self._data.get(key)
+        if entry is None:
+            return _MISSING
+        value, last_access = entry
+        if now - last_access > self.ttl:
+            del self._data[key]
+            self.evictions += 1
+            return _MISSING
+        if self.refresh_on_get:
+            self._data[key] = (value, now)
+        self._data.move_to_end(key)
+        return value
+
+    def _purge(self, now: float) -> None:
+        """淘汰过期条目以及超出容量的最旧条目"""
+        while self._data:
+            oldest_key, (_, last_access) = next(iter(self._data.items()))
+            if now - last_access <= self.ttl and len(self._data) <= self.maxsize:
+                break
+            del self._data[oldest_key]
+            self.evictions += 1
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            value = self._lookup(key, self._timer())
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            now = self._timer()
+            self._data[key] = (value, now)
+            self._data.move_to_end(key)
+            self._purge(now)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, None)
+            return default if entry is None else entry[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """
+        获取缓存值，不存在时调用 factory 构建并写入缓存。
+        同一个键的并发调用会等待第一个构建完成，而不是各自构建一次。
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        try:
+            with key_lock:
+                with self._lock:
+                    value = self._lookup(key, self._timer())
+                if value is _MISSING:
+                    value = factory()
+                    self.set(key, value)
+                return value
+        finally:
+            with self._lock:
+                if self._key_locks.get(key) is key_lock:
+                    del self._key_locks[key]
+
+    async def aget_or_create(
+        self, key: Hashable, factory: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """
+        get_or_create 的异步版本，factory 是一个返回协程的函数。
+        构建期间到达的同键请求会等待同一个结果，而不会阻塞事件循环。
+        """
+        while True:
+            value = self.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+
+            with self._lock:
+                future = self._pending.get(key)
+                is_owner = future is None
+                if is_owner:
+                    future = asyncio.get_running_loop().create_future()
+                    self._pending[key] = future
+
+            if not is_owner:
+                try:
+                    return await asyncio.shield(future)
+                except asyncio.CancelledError:
+                    # 负责构建的请求被取消（例如客户端断开），重新尝试构建
+                    if future.cancelled():
+                        continue
+                    raise
+
+            try:
+                value = await factory()
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except BaseException as e:
+                future.set_exception(e)
+                future.exception()  # 标记异常已被读取，避免无人等待时的告警
+                raise
+            else:
+                self.set(key, value)
+                future.set_result(value)
+                return value
+            finally:
+                with self._lock:
+                    self._pending.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -2,6 +2,7 @@
 from pydantic_settings import BaseSettings
 from pydantic import SecretStr, Field
 from datetime import timedelta
+from typing import Optional
 
 class Settings(BaseSettings):
     # LLM API 配置
@@ -24,18 +25,162 @@ class Settings(BaseSettings):
     def ASYNC_DATABASE_URL(self) -> str:
         return f"postgresql+psycopg://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
 
+    # 数据库连接池配置（同步和异步引擎各自一个连接池，
+    # 每个进程最多 2 × (DB_POOL_SIZE + DB_MAX_OVERFLOW) 个连接）
+    DB_POOL_SIZE: int = 5  # 常驻连接数
+    DB_MAX_OVERFLOW: int = 10  # 池满时允许临时多建的连接数
+    DB_POOL_TIMEOUT_SECONDS: float = 10.0  # 取出连接的最长等待时间，超时抛出异常
+    # 连接使用超过该时间后重建，避免被数据库或代理静默断开
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_PRE_PING: bool = True  # 取出连接时先检测是否可用
+
     # 嵌入模型配置
     EMBEDDING_MODEL_NAME: str = "shibing624/text2vec-base-chinese"
+    EMBEDDING_DEVICE: str = "cpu"  # 嵌入模型运行设备，如 cpu、cuda
+    EMBEDDING_MAX_WORKERS: int = 2  # 执行查询向量化的线程数上限
+    EMBEDDING_BATCH_WINDOW_MS: float = 5.0  # 合并并发查询的等待窗口（毫秒）
+    EMBEDDING_BATCH_MAX_SIZE: int = 32  # 单次批量向量化的最大问题数
+    QUERY_EMBEDDING_CACHE_SIZE: int = 4096  # 缓存的查询向量数量
 
     # 向量数据库集合名称
     COLLECTION_NAME: str = "all_documents"
 
+    # 向量存储配置
+    VECTOR_STORE_TYPE: str = "pgvector"  # 可选值: pgvector, faiss, chromadb
+    FAISS_INDEX_DIR: str = "vector_store/faiss"  # FAISS 索引目录，每个集合一个子目录
+    CHROMA_PERSIST_DIR: str = "vector_store/chroma"  # Chroma 持久化目录
+    # FAISS IVF 索引每次搜索探查的聚类数，请求中的 probes 优先
+    FAISS_IVF_NPROBE: int = 16
+    # FAISS 写入器新增多少个文本块后在文件提交时发布一个新版本，0 表示只在结束时发布
+    FAISS_PUBLISH_EVERY_CHUNKS: int = 20000
+
+    # 全局集合导出索引配置（由 ingest.py --export-global-index 生成）
+    GLOBAL_INDEX_ENABLED: bool = True  # 全局集合已导出时，检索优先使用导出的索引
+    GLOBAL_INDEX_DIR: str = "vector_store/global"  # 导出索引目录
+    # 可选值: sq8（int8 标量量化）, pq（乘积量化，更小但召回略低）
+    GLOBAL_INDEX_QUANTIZER: str = "sq8"
+    GLOBAL_INDEX_NLIST: Optional[int] = None  # IVF 聚类数，None 表示按 4·√N 自动选择
+    GLOBAL_INDEX_PQ_M: int = 96  # PQ 子向量个数，需整除向量维度
+
+    # 批量摄取配置
+    # 解析和切分 PDF 的进程数，None 表示使用 CPU 核数
+    INGEST_WORKERS: Optional[int] = None
+    INGEST_EMBEDDING_BATCH_SIZE: int = 256  # 每批向量化并写入数据库的文本块数量
+
+    # 上传任务队列配置
+    UPLOAD_DIR: str = "uploads"  # 待处理上传文件的存放目录，API 与 worker 需能同时访问
+    MAX_DOCUMENT_SIZE_MB: int = 50  # 单个上传文件的大小上限
+    INGEST_QUEUE_MAX_PENDING: int = 100  # 全局未完成任务达到该数量时拒绝新上传
+    INGEST_QUEUE_MAX_PENDING_PER_USER: int = 10  # 单个用户未完成任务的上限
+    INGEST_WORKER_CONCURRENCY: int = 2  # worker 进程数
+    INGEST_WORKER_POLL_SECONDS: float = 1.0  # 队列为空时的轮询间隔
+    INGEST_WORKER_NICE: int = 10  # worker 进程的 nice 值增量，0 表示不调整优先级
+    INGEST_JOB_MAX_ATTEMPTS: int = 3  # 单个任务最多尝试次数
+    INGEST_JOB_RETRY_BASE_SECONDS: int = 30  # 失败重试的基础等待时间（指数退避）
+    INGEST_JOB_HEARTBEAT_SECONDS: float = 15.0  # 执行中任务的心跳间隔
+    INGEST_JOB_TIMEOUT_SECONDS: int = 300  # 心跳超过该时间未更新则认为 worker 已崩溃
+
+    # 检索配置
+    RETRIEVAL_K: int = 10  # 每个集合返回的文档数量
+    # 默认检索方式: vector（向量）、lexical（全文）、hybrid（两者按 RRF 融合）
+    RETRIEVAL_MODE: str = "vector"
+    RRF_K: int = 60  # 倒数排名融合的平滑常数，score = Σ 1 / (RRF_K + 排名)
+    RETRIEVAL_TOP_K: int = 8  # 各集合结果去重合并后，最多放入上下文的文本块数量
+    # 向量检索的最低余弦相似度，低于该值的结果丢弃，为空时不过滤
+    RETRIEVAL_MIN_SIMILARITY: Optional[float] = None
+    # 上下文的估算 token 上限，为空时只按 RETRIEVAL_TOP_K 截断
+    CONTEXT_TOKEN_BUDGET: Optional[int] = 3000
+
+    # 重排序配置（先廉价地召回较多候选，再用交叉编码器精排，只保留最相关的几个）
+    RERANK_ENABLED: bool = False  # 默认是否启用重排序，可在请求中单独指定
+    RERANK_MODEL_NAME: str = "BAAI/bge-reranker-base"
+    RERANK_DEVICE: str = "cpu"
+    RERANK_CANDIDATES: int = 50  # 参与重排序的候选文本块数量
+    RERANK_TOP_K: int = 4  # 重排序后放入上下文的文本块数量
+    RERANK_BATCH_SIZE: int = 64  # 单次前向计算的 (问题, 文本块) 对数量
+    RERANK_MAX_LENGTH: int = 512  # 问题与文本块拼接后的最大 token 数
+    RERANK_CACHE_SIZE: int = 20000  # 缓存的 (问题, 文本块) 分数数量
+    # 最多缓存的集合向量存储（PGVector 连接 / FAISS 快照）数量
+    RETRIEVER_CACHE_MAX_SIZE: int = 256
+    RETRIEVER_CACHE_TTL_SECONDS: int = 1800  # 向量存储空闲多久后被淘汰
+
+    # 向量索引配置
+    VECTOR_INDEX_METHOD: str = "hnsw"  # 可选值: hnsw, ivfflat, none
+    VECTOR_INDEX_AUTO_MAINTAIN: bool = True  # 启动时检查索引，缺失时创建
+    VECTOR_HNSW_M: int = 16  # HNSW 每个节点的连接数
+    VECTOR_HNSW_EF_CONSTRUCTION: int = 64  # HNSW 构建时的候选集大小
+    # HNSW 搜索候选集大小，None 表示使用 pgvector 默认值 (40)
+    VECTOR_HNSW_EF_SEARCH: Optional[int] = None
+    # IVFFlat 探查的聚类数，None 表示使用 pgvector 默认值 (1)
+    VECTOR_IVFFLAT_PROBES: Optional[int] = None
+    VECTOR_INDEX_REBUILD_FACTOR: float = 2.0  # IVFFlat 行数变化超过该倍数后重建
+
+    # 进程配置：full 提供全部接口；auth 只提供注册、登录和用户信息接口，
+    # 不导入 LangChain、嵌入模型等依赖，适合单独部署、需要快速启动的认证 worker
+    APP_PROFILE: str = "full"  # 可选值: full, auth
+
+    # 启动预热配置
+    # 启动后在后台预加载模型、连接数据库并预热检索，完成前 /readyz 返回 503
+    STARTUP_WARMUP_ENABLED: bool = True
+    STARTUP_RETRY_SECONDS: float = 5.0  # 必需的预热阶段失败后的重试间隔
+
+    # 流式响应 (SSE) 配置
+    # 合并 token 的初始时间窗口（首个 token 总是立即发送），每次发送后翻倍
+    STREAM_COALESCE_MIN_MS: float = 20.0
+    # 时间窗口的上限，为 0 时不合并，每个 token 单独发送
+    STREAM_COALESCE_MAX_MS: float = 200.0
+    STREAM_COALESCE_MAX_BYTES: int = 2048  # 缓冲的答案文本达到该字节数时立即发送
+    # 超过该时间没有输出时发送心跳注释，防止代理断开空闲连接
+    STREAM_HEARTBEAT_SECONDS: float = 15.0
+
+    # 可观测性配置
+    # app 日志级别，DEBUG 时输出检索合并、缓存命中等逐请求的细节
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "text"  # 可选值: text（key=value）, json（每行一个 JSON 对象）
+    # 是否提供 Prometheus /metrics 接口（不需要登录，只应对内网或抓取端开放）
+    METRICS_ENABLED: bool = False
+    # 设置后 /metrics 要求请求头 Authorization: Bearer <METRICS_TOKEN>
+    METRICS_TOKEN: SecretStr = SecretStr("")
+    # 携带 trace id 的请求/响应头，为空时不生成 trace id
+    TRACE_ID_HEADER: Optional[str] = "X-Request-ID"
+
     # LLM 模型配置
     LLM_BASE_URL: str = "https://api.deepseek.com"
     LLM_MODEL_NAME: str = "deepseek-chat"
 
+    # 答案缓存配置
+    ENABLE_CACHE: bool = True
+    CACHE_TTL_SECONDS: int = 3600  # 缓存答案的有效期
+    ANSWER_CACHE_MAX_ENTRIES: int = 1024  # 最多缓存的检索结果组数
+    ANSWER_CACHE_SIMILARITY_THRESHOLD: float = 0.95  # 近似问题命中所需的最低余弦相似度
+
+    # 问答历史配置（记录先进入进程内的写缓冲区，由后台任务批量写入数据库）
+    HISTORY_ENABLED: bool = True  # 是否保存问答记录
+    HISTORY_FLUSH_INTERVAL_SECONDS: float = 1.0  # 记录在缓冲区中的最长停留时间
+    HISTORY_FLUSH_BATCH_SIZE: int = 200  # 每批写入的记录数，缓冲区攒满一批时立即写入
+    # 缓冲区上限，数据库长时间不可用时丢弃最旧的记录
+    HISTORY_BUFFER_MAX_SIZE: int = 10000
+    HISTORY_PAGE_SIZE: int = 20  # 历史记录每页的默认条数
+
+    # LLM 客户端池配置
+    LLM_MAX_CONCURRENCY: int = 32  # 同时发往上游的最大请求数
+    LLM_MAX_CONNECTIONS: int = 64  # HTTP 连接池的最大连接数
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = 32  # 保持长连接的最大空闲连接数
+    LLM_KEEPALIVE_EXPIRY_SECONDS: float = 60.0  # 空闲长连接的保留时间
+    LLM_TIMEOUT_SECONDS: float = 120.0  # 单次上游请求超时时间
+
     SECRET_KEY: SecretStr = Field(default=SecretStr("a_very_secret_key_that_you_should_change"), description="用于签名 JWT 的密钥")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # Token 有效期：7天
+    AUTH_USER_CACHE_SIZE: int = 10000  # 缓存的已认证用户数量
+    # 用户信息缓存的有效期，其它进程对用户的修改最多延迟该时间生效
+    AUTH_USER_CACHE_TTL_SECONDS: float = 30.0
+    # 是否直接信任 token 中签名的用户 ID 和启用状态（不查缓存和数据库）
+    AUTH_TRUST_TOKEN_CLAIMS: bool = False
+    # 只信任签发不超过该时间的 token 中的声明，更早的 token 仍走缓存
+    AUTH_TRUST_TOKEN_CLAIMS_MAX_AGE_SECONDS: int = 300
+    PASSWORD_HASH_WORKERS: int = 4  # 执行 bcrypt 哈希和校验的专用线程数
+    # 排队和执行中的哈希任务上限，超过时登录和注册返回 503
+    PASSWORD_HASH_MAX_PENDING: int = 64
     
     @property
     def ACCESS_TOKEN_EXPIRE_DELTA(self) -> timedelta:
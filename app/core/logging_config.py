@@ -0,0 +1,115 @@
+# app/core/logging_config.py
+"""
+结构化日志：应用代码使用 logging.getLogger(__name__)，事件名作为消息，
+字段通过 extra 传入，例如
+    logger.debug("retrieval.merged", extra={"candidates": 30, "kept": 8})
+输出格式由 LOG_FORMAT 决定（text 为 key=value，json 为每行一个 JSON 对象），
+级别由 LOG_LEVEL 控制，低于该级别的日志在调用处即被丢弃，不做格式化。
+
+日志记录在调用线程中只放入队列，由后台线程格式化并写出，事件循环不因写终端或文件而阻塞。
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Optional
+
+from .config import settings
+
+# 当前请求的 trace id，由请求中间件设置，写入该请求内产生的每条日志
+trace_id: ContextVar[Optional[str]] = ContextVar("trace_id", default=None)
+
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None)))
+_STANDARD_ATTRS |= {"message", "asctime"}
+_EXCEPTION_FORMATTER = logging.Formatter()
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    在调用线程中只合并消息参数、取出 trace id（后台线程中读不到请求的上下文变量），
+    其余格式化留给后台线程
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            # 异常对象引用着栈帧，不放入队列
+            if not record.exc_text:
+                record.exc_text = _EXCEPTION_FORMATTER.formatException(
+                    record.exc_info
+                )
+            record.exc_info = None
+        if getattr(record, "trace_id", None) is None:
+            record.trace_id = trace_id.get()
+        return record
+
+
+class StructuredFormatter(logging.Formatter):
+    def __init__(self, fmt: str = "text"):
+        super().__init__()
+        self.json = fmt == "json"
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = {
+            key: value for key, value in vars(record).items()
+            if key not in _STANDARD_ATTRS and value is not None
+        }
+        created = datetime.fromtimestamp(record.created, timezone.utc)
+        timestamp = created.isoformat(timespec="milliseconds")
+        if self.json:
+            entry = {
+                "ts": timestamp,
+                "level": record.levelname,
+                "logger": record.name,
+                "event": record.getMessage(),
+                **fields,
+            }
+            if record.exc_text:
+                entry["exc_info"] = record.exc_text
+            return json.dumps(entry, ensure_ascii=False, default=str)
+        line = f"{timestamp} {record.levelname:<7} {record.name} {record.getMessage()}"
+        if fields:
+            line += " " + " ".join(
+                f"{key}={_text_value(value)}" for key, value in fields.items()
+            )
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+def _text_value(value) -> str:
+    if isinstance(value, str):
+        text = value
+    else:
+        text = json.dumps(
+            value, ensure_ascii=False, default=str, separators=(",", ":")
+        )
+    if not text or " " in text or "=" in text:
+        return json.dumps(text, ensure_ascii=False)
+    return text
+
+
+def configure_logging() -> None:
+    """配置 app 命名空间下的日志（uvicorn 自己的日志不受影响），重复调用时只生效一次"""
+    global _listener
+    if _listener is not None:
+        return
+    handler = logging.StreamHandler()
+    handler.setFormatter(StructuredFormatter(settings.LOG_FORMAT))
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = _QueueHandler(log_queue)
+
+    logger = logging.getLogger("app")
+    logger.setLevel(settings.LOG_LEVEL.upper())
+    logger.addHandler(queue_handler)
+    logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, handler)
+    _listener.start()
+    atexit.register(_listener.stop)
@@ -0,0 +1,133 @@
+# app/core/metrics.py
+"""
+Prometheus 指标：问答各阶段的耗时直方图和计数器，由 /metrics 接口导出。
+多 worker 部署时设置环境变量 PROMETHEUS_MULTIPROC_DIR（每次启动前清空该目录），
+/metrics 汇总所有 worker 的数据。
+
+本请求内各阶段的耗时同时累加到 stage_timings 中，请求结束时随访问日志输出。
+"""
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+)
+
+from .config import settings
+
+# 从进程内检索的亚毫秒级到完整流式回答的数十秒
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+TOKEN_RATE_BUCKETS = (1, 5, 10, 20, 30, 50, 75, 100, 150, 200, 300, 500, 1000)
+
+STAGE_SECONDS = Histogram(
+    "rag_stage_duration_seconds",
+    "问答各阶段的耗时：auth、query_embedding、merge、rerank、prompt_build、"
+    "llm（LLM 调用开始到结束）",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+SEARCH_SECONDS = Histogram(
+    "rag_search_duration_seconds",
+    "单个集合的一次检索耗时；scope 区分全局集合 (global) 与用户集合 (user)，"
+    "避免按用户产生标签",
+    ["kind", "scope", "backend"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_TTFT_SECONDS = Histogram(
+    "rag_llm_time_to_first_token_seconds",
+    "从发起 LLM 调用到收到第一个 token 的时间（流式）",
+    buckets=LATENCY_BUCKETS,
+)
+LLM_TOKENS_PER_SECOND = Histogram(
+    "rag_llm_tokens_per_second",
+    "首个 token 之后的生成速度（流式）",
+    buckets=TOKEN_RATE_BUCKETS,
+)
+STREAM_SECONDS = Histogram(
+    "rag_stream_duration_seconds",
+    "流式回答从开始到最后一个输出的总时长",
+    ["outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+DOCUMENTS_RETRIEVED = Counter(
+    "rag_documents_retrieved_total",
+    "各集合检索返回的文本块数（合并去重前）",
+    ["scope"],
+)
+CONTEXT_DOCUMENTS = Counter("rag_context_documents_total", "放入上下文的文本块数")
+PROMPT_TOKENS = Counter(
+    "rag_prompt_tokens_total",
+    "发送给 LLM 的估算 token 数（上下文与问题，不含缓存命中）",
+)
+COMPLETION_TOKENS = Counter("rag_completion_tokens_total", "LLM 流式生成的 token 数")
+SSE_EVENTS = Counter(
+    "rag_sse_events_total",
+    "流式响应写出的 SSE 事件数，heartbeat 为心跳注释",
+    ["event"],
+)
+SSE_TOKENS = Counter(
+    "rag_sse_tokens_total", "流式响应发送的 token 数（合并为事件之前）"
+)
+HTTP_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "HTTP 请求耗时（流式响应到最后一个字节为止），route 为路由模板",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+DB_POOL_WAIT_SECONDS = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "从数据库连接池取出连接的等待时间",
+    ["pool"],
+    buckets=LATENCY_BUCKETS,
+)
+
+# 当前请求内各阶段的累计耗时（毫秒），由请求中间件为每个请求设置
+stage_timings: ContextVar[Optional[dict]] = ContextVar("stage_timings", default=None)
+
+
+def record_stage(name: str, seconds: float) -> None:
+    """把阶段耗时累加到当前请求的统计中（不在请求中时忽略）"""
+    timings = stage_timings.get()
+    if timings is not None:
+        timings[name] = round(timings.get(name, 0.0) + seconds * 1000, 3)
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    STAGE_SECONDS.labels(stage).observe(seconds)
+    record_stage(stage, seconds)
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """记录代码块的耗时到 rag_stage_duration_seconds{stage}，抛出异常时也记录"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+def collection_scope(collection_name: str) -> str:
+    return "global" if collection_name == settings.COLLECTION_NAME else "user"
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """生成 /metrics 的响应内容和 Content-Type"""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
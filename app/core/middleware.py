@@ -0,0 +1,77 @@
+# app/core/middleware.py
+"""
+请求上下文中间件（纯 ASGI 实现，不缓冲流式响应）：
+- 为每个请求确定 trace id：沿用请求头 TRACE_ID_HEADER 中的合法值，否则新生成，
+  并写入响应头和该请求的日志；
+- 记录 HTTP 请求耗时到 http_request_duration_seconds，
+  请求结束时输出一条访问日志，附带各阶段耗时。
+"""
+import logging
+import re
+import time
+import uuid
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import settings
+from .logging_config import trace_id
+from .metrics import HTTP_SECONDS, stage_timings
+
+logger = logging.getLogger(__name__)
+
+_VALID_TRACE_ID = re.compile(r"^[A-Za-z0-9._-]{1,128}$")
+# 探针和指标抓取过于频繁，访问日志只在 DEBUG 级别输出
+_QUIET_ROUTES = {"/healthz", "/readyz", "/metrics"}
+
+
+class RequestContextMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        header = settings.TRACE_ID_HEADER
+        request_trace_id = None
+        if header:
+            raw = dict(scope["headers"]).get(header.lower().encode("latin-1"), b"")
+            incoming = raw.decode("latin-1")
+            if _VALID_TRACE_ID.match(incoming):
+                request_trace_id = incoming
+            else:
+                request_trace_id = uuid.uuid4().hex
+        trace_token = trace_id.set(request_trace_id)
+        timings_token = stage_timings.set({})
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_with_trace_id(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if header:
+                    MutableHeaders(scope=message).append(header, request_trace_id)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace_id)
+        finally:
+            seconds = time.perf_counter() - start
+            route = getattr(scope.get("route"), "path", "<unmatched>")
+            HTTP_SECONDS.labels(
+                scope["method"], route, str(status_code)
+            ).observe(seconds)
+            level = logging.DEBUG if route in _QUIET_ROUTES else logging.INFO
+            if logger.isEnabledFor(level):
+                logger.log(level, "request.completed", extra={
+                    "method": scope["method"],
+                    "route": route,
+                    "status": status_code,
+                    "duration_ms": round(seconds * 1000, 3),
+                    "stages_ms": stage_timings.get() or None,
+                })
+            stage_timings.reset(timings_token)
+            trace_id.reset(trace_token)
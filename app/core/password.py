@@ -1,6 +1,25 @@
 # app/core/password.py
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
 import bcrypt
 
+from .config import settings
+
+# bcrypt 单次计算约 100–300 毫秒。放在专用的有界线程池中执行，
+# 登录高峰时既不阻塞事件循环，也不会占满 FastAPI 处理其它请求的线程池
+_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt"
+)
+_stats = {"pending": 0, "completed": 0, "rejected": 0}
+
+
+class PasswordHasherBusyError(Exception):
+    """排队的哈希任务已达到 PASSWORD_HASH_MAX_PENDING"""
+
+    retry_after = 1  # 建议客户端等待的秒数
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """验证明文密码是否与哈希后的密码匹配"""
     # bcrypt 需要字节串，所以我们对它们进行编码
@@ -11,4 +30,26 @@ def get_password_hash(password: str) -> str:
     # bcrypt 同样需要字节串进行哈希
     hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
     # 将哈希后的字节串解码成字符串以便存入数据库
-    return hashed.decode('utf-8')
\ No newline at end of file
+    return hashed.decode('utf-8')
+
+async def _run_in_hasher(func, *args):
+    if _stats["pending"] >= settings.PASSWORD_HASH_MAX_PENDING:
+        _stats["rejected"] += 1
+        raise PasswordHasherBusyError("登录请求过多，请稍后重试")
+    _stats["pending"] += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_executor, func, *args)
+    finally:
+        _stats["pending"] -= 1
+        _stats["completed"] += 1
+
+async def averify_password(plain_password: str, hashed_password: str) -> bool:
+    """在专用线程池中验证密码"""
+    return await _run_in_hasher(verify_password, plain_password, hashed_password)
+
+async def aget_password_hash(password: str) -> str:
+    """在专用线程池中生成密码的哈希值"""
+    return await _run_in_hasher(get_password_hash, password)
+
+def get_password_hasher_stats() -> dict:
+    return {"workers": settings.PASSWORD_HASH_WORKERS, **_stats}
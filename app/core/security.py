@@ -1,34 +1,91 @@
 # app/core/security.py
+import time
 from datetime import datetime, timezone
 from jose import jwt
 
+from .cache import TTLCache
 from .config import settings
+from .metrics import timed
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError
-from sqlalchemy.orm import Session
-from app.db.session import get_db
+from sqlalchemy import event, inspect
+from app.db.session import AsyncSessionLocal
 from app.services import user_service
-from app.schemas.user import TokenData
+from app.schemas.user import AuthenticatedUser
 from app.models.user import User
 
-# ... (create_access_token, oauth2_scheme, get_current_user 等其他函数保持不变) ...
+# 已认证用户的缓存，键为 token 的 subject（用户名）。
+# 自写入起计时过期：本进程内的修改通过下面的事件立即失效，
+# 其它进程的修改最多延迟 TTL 秒生效
+USER_CACHE = TTLCache(
+    maxsize=settings.AUTH_USER_CACHE_SIZE,
+    ttl=settings.AUTH_USER_CACHE_TTL_SECONDS,
+    refresh_on_get=False,
+)
+_stats = {"claims_trusted": 0, "db_lookups": 0}
 
 def create_access_token(data: dict) -> str:
-    """创建 JWT access token"""
+    """创建 JWT access token（签发时间写入 iat，用于判断是否可以信任其中的声明）"""
     to_encode = data.copy()
-    expire = datetime.now(timezone.utc) + settings.ACCESS_TOKEN_EXPIRE_DELTA
-    to_encode.update({"exp": expire})
+    now = datetime.now(timezone.utc)
+    to_encode.update({"exp": now + settings.ACCESS_TOKEN_EXPIRE_DELTA, "iat": now})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY.get_secret_value(), algorithm="HS256")
     return encoded_jwt
 
+def create_user_access_token(user: User) -> str:
+    """为用户签发 token，除用户名外还带上签名的用户 ID 和启用状态"""
+    return create_access_token(
+        data={"sub": user.username, "uid": user.id, "active": user.is_active}
+    )
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/token")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+def invalidate_user(username: str) -> None:
+    """用户被修改、禁用或删除后，使其缓存失效"""
+    USER_CACHE.pop(username)
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target: User) -> None:
+    # 用户名被修改时，旧用户名对应的缓存也要失效
+    for username in {target.username, *inspect(target).attrs.username.history.deleted}:
+        invalidate_user(username)
+
+def _user_from_claims(payload: dict) -> AuthenticatedUser | None:
+    """
+    AUTH_TRUST_TOKEN_CLAIMS 开启且 token 签发不超过
+    AUTH_TRUST_TOKEN_CLAIMS_MAX_AGE_SECONDS 时，
+    直接使用 token 中签名的用户 ID 和启用状态，不查缓存和数据库。
+    """
+    if not settings.AUTH_TRUST_TOKEN_CLAIMS:
+        return None
+    uid = payload.get("uid")
+    active = payload.get("active")
+    issued_at = payload.get("iat")
+    if uid is None or active is None or issued_at is None:
+        return None
+    if time.time() - issued_at > settings.AUTH_TRUST_TOKEN_CLAIMS_MAX_AGE_SECONDS:
+        return None
+    _stats["claims_trusted"] += 1
+    return AuthenticatedUser(id=uid, username=payload["sub"], is_active=active)
+
+async def _load_user(username: str) -> AuthenticatedUser | None:
+    _stats["db_lookups"] += 1
+    async with AsyncSessionLocal() as db:
+        user = await user_service.aget_user_by_username(db, username=username)
+        return AuthenticatedUser.model_validate(user) if user is not None else None
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> AuthenticatedUser:
     """
     解析并验证 token，返回当前用户。
-    如果 token 无效或用户不存在，则会抛出异常。
+    用户信息优先来自签名的声明或进程内缓存，只有缓存未命中时才查询数据库（使用异步会话，不占用线程池）。
+    如果 token 无效或用户不存在，则会抛出异常；用户已被禁用时返回 403。
     """
+    with timed("auth"):
+        return await _resolve_user(token)
+
+async def _resolve_user(token: str) -> AuthenticatedUser:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="无法验证凭据",
@@ -38,18 +95,29 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         payload = jwt.decode(
             token, settings.SECRET_KEY.get_secret_value(), algorithms=["HS256"]
         )
-        username: str | None = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        token_data = TokenData(username=username)
     except JWTError:
         raise credentials_exception
-
-    if token_data.username is None:
+    username: str | None = payload.get("sub")
+    if username is None:
         raise credentials_exception
 
-    user = user_service.get_user_by_username(db, username=token_data.username)
+    user = _user_from_claims(payload)
     if user is None:
-        raise credentials_exception
+        async def load() -> AuthenticatedUser:
+            loaded = await _load_user(username)
+            if loaded is None:
+                # 不存在的用户不缓存，异常会传给同时等待的请求
+                raise credentials_exception
+            return loaded
+
+        # 同一用户的并发请求在缓存未命中时只查询一次数据库
+        user = await USER_CACHE.aget_or_create(username, load)
+
+    if not user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="用户已被禁用"
+        )
+    return user
 
-    return user
\ No newline at end of file
+def get_auth_stats() -> dict:
+    return {"user_cache": USER_CACHE.stats(), **_stats}
@@ -0,0 +1,36 @@
+# app/crud/crud_history.py
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import insert, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.history import ChatHistory
+
+
+async def add_history_batch(db: AsyncSession, rows: list[dict]) -> None:
+    """一次事务批量写入多条问答记录（executemany）"""
+    await db.execute(insert(ChatHistory), rows)
+    await db.commit()
+
+
+async def list_history(
+    db: AsyncSession,
+    user_id: int,
+    limit: int,
+    before: Optional[tuple[datetime, str]] = None,
+) -> list[ChatHistory]:
+    """
+    按时间从新到旧返回用户的问答记录。
+    before 为上一页最后一条记录的 (created_at, id)，只返回排在它之后的记录，
+    直接沿 (user_id, created_at, id) 索引定位，翻到多深的页面代价都相同。
+    """
+    stmt = select(ChatHistory).where(ChatHistory.user_id == user_id)
+    if before is not None:
+        stmt = stmt.where(
+            tuple_(ChatHistory.created_at, ChatHistory.id) < tuple_(*before)
+        )
+    stmt = stmt.order_by(
+        ChatHistory.created_at.desc(), ChatHistory.id.desc()
+    ).limit(limit)
+    return list((await db.execute(stmt)).scalars())
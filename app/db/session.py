@@ -1,13 +1,122 @@
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator
+
 from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from app.core.config import settings
+from app.core.metrics import DB_POOL_WAIT_SECONDS
+
+
+class PoolWaitStats:
+    """
+    进程内累计的连接池取出等待时间（池满时排队，以及新建连接的耗时）。
+    等待时间持续升高说明连接池不够用，或者有请求长时间占用连接。
+    """
+
+    def __init__(self, window: int = 1024):
+        self._lock = threading.Lock()
+        # 最近的若干次等待时间，用于计算分位数
+        self._recent: deque[float] = deque(maxlen=window)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def record(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.timeouts += timed_out
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+            self._recent.append(seconds)
+
+    def stats(self) -> dict:
+        with self._lock:
+            recent = sorted(self._recent)
+        def percentile_ms(q: float) -> float:
+            if not recent:
+                return 0.0
+            return round(recent[min(int(len(recent) * q), len(recent) - 1)] * 1000, 3)
+        avg_ms = 0.0
+        if self.checkouts:
+            avg_ms = round(self.total_seconds / self.checkouts * 1000, 3)
+        return {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "avg_ms": avg_ms,
+            "p50_ms": percentile_ms(0.5),
+            "p99_ms": percentile_ms(0.99),
+            "max_ms": round(self.max_seconds * 1000, 3),
+        }
+
+
+class _TimedCheckout:
+    """
+    连接池混入：记录每次取出连接的等待时间。
+    统计放在类属性上，引擎 dispose 重建连接池后仍然累计
+    """
+
+    wait_stats: PoolWaitStats
+    metrics_label: str
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self._record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        self._record_wait(time.perf_counter() - start)
+        return connection
+
+    def _record_wait(self, seconds: float, timed_out: bool = False) -> None:
+        self.wait_stats.record(seconds, timed_out=timed_out)
+        DB_POOL_WAIT_SECONDS.labels(self.metrics_label).observe(seconds)
 
-# 使用我们 config.py 中的数据库连接字符串
-engine = create_engine(settings.DATABASE_URL)
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    wait_stats = PoolWaitStats()
+    metrics_label = "sync"
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    wait_stats = PoolWaitStats()
+    metrics_label = "async"
+
+
+def _pool_options() -> dict:
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+# 同步引擎：摄取 worker、命令行脚本以及上传任务队列等仍在线程池中执行的代码使用
+engine = create_engine(
+    settings.DATABASE_URL, poolclass=TimedQueuePool, **_pool_options()
+)
 
 # 创建一个 SessionLocal 类，它的实例将是实际的数据库会话
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 异步引擎（psycopg 驱动）：注册、登录和认证等请求路径使用，数据库 I/O 不占用线程池
+async_engine = create_async_engine(
+    settings.ASYNC_DATABASE_URL, poolclass=TimedAsyncQueuePool, **_pool_options()
+)
+
+# 提交后不过期已加载的属性，避免在异步会话中隐式触发 I/O
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
+
 def get_db():
     """
     FastAPI 依赖项，用于获取数据库会话。
@@ -17,4 +126,18 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """
+    FastAPI 依赖项，用于获取异步数据库会话，请求结束后关闭并归还连接。
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def get_pool_stats() -> dict:
+    """两个连接池的当前占用和取出等待时间"""
+    return {
+        name: {"status": pool.status(), "checkout_wait": pool.wait_stats.stats()}
+        for name, pool in (("async", async_engine.pool), ("sync", engine.pool))
+    }
@@ -1,12 +1,45 @@
-from fastapi import FastAPI
+import asyncio
+import contextlib
+import secrets
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.routers import rag,users
+from app.api.routers import users
+from app.core.config import settings
+from app.core.logging_config import configure_logging
+from app.core.metrics import render_metrics
+from app.core.middleware import RequestContextMiddleware
+from app.db.session import async_engine, engine
+from app.services import llm_service, startup_service
+
+configure_logging()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动时在后台预热共享资源，退出时释放"""
+    warmup_task = startup_service.start_warmup(engine)
+    history_task = None
+    if settings.APP_PROFILE == "full":
+        from app.services import history_service
+
+        history_task = history_service.start_writer()
+    yield
+    if warmup_task is not None:
+        warmup_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await warmup_task
+    if history_task is not None:
+        await history_service.stop_writer(history_task)
+    await llm_service.close_llm_pool()
+    await async_engine.dispose()
 
 # 创建 FastAPI 应用实例
 app = FastAPI(
     title="RAG 问答机器人 API",
     description="一个文档问答机器人。",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # 配置 CORS 中间件
@@ -16,14 +49,51 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[settings.TRACE_ID_HEADER] if settings.TRACE_ID_HEADER else [],
 )
+# 最外层：trace id 与请求耗时覆盖 CORS 在内的整个处理过程
+app.add_middleware(RequestContextMiddleware)
 
 # 包含 (挂载) RAG 相关的 API 路由
-# 所有在 rag.py 中定义的 API 都会被自动添加进来
-app.include_router(rag.router, prefix="/api/v1", tags=["RAG"])
+# 所有在 rag.py 中定义的 API 都会被自动添加进来；auth 配置下不导入问答相关的模块
+if settings.APP_PROFILE == "full":
+    from app.api.routers import history, rag, system
+
+    app.include_router(rag.router, prefix="/api/v1", tags=["RAG"])
+    app.include_router(history.router, prefix="/api/v1", tags=["History"])
+    app.include_router(system.router, prefix="/api/v1", tags=["System"])
 app.include_router(users.router, prefix="/api/v1", tags=["Users"])
 
 # 定义一个根路径，用于快速测试服务是否启动
 @app.get("/")
 def read_root():
-    return {"message": "欢迎使用RAG 问答机器人 API!"}
\ No newline at end of file
+    return {"message": "欢迎使用RAG 问答机器人 API!"}
+
+@app.get("/healthz", tags=["System"])
+def healthz():
+    """存活探针：进程能处理请求即返回 200"""
+    return {"status": "ok"}
+
+@app.get("/readyz", tags=["System"])
+def readyz(response: Response):
+    """就绪探针：启动预热的必需阶段全部完成前返回 503，响应中包含各阶段的状态和耗时"""
+    state = startup_service.STARTUP.as_dict()
+    if not state["ready"]:
+        response.status_code = 503
+    return state
+
+@app.get("/metrics", include_in_schema=False)
+def metrics(request: Request):
+    """
+    Prometheus 指标：各阶段耗时直方图、检索与 token 计数器、HTTP 请求耗时。
+    默认关闭（METRICS_ENABLED）；设置了 METRICS_TOKEN 时要求抓取端携带该令牌。
+    """
+    if not settings.METRICS_ENABLED:
+        return Response(status_code=404)
+    token = settings.METRICS_TOKEN.get_secret_value()
+    authorization = request.headers.get("Authorization", "").encode("latin-1")
+    expected = f"Bearer {token}".encode("utf-8")
+    if token and not secrets.compare_digest(authorization, expected):
+        return Response(status_code=401, headers={"WWW-Authenticate": "Bearer"})
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
@@ -0,0 +1,36 @@
+import uuid
+from datetime import datetime
+
+from sqlalchemy import JSON, DateTime, ForeignKey, Index, String, Text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.user import Base
+
+
+class ChatHistory(Base):
+    """
+    用户的问答记录，每个问题及其完整答案一行。
+    记录先进入进程内的写缓冲区再批量写入，
+    因此 id 和 created_at 在生成答案时就已确定，而不是由数据库生成。
+    按 (user_id, created_at, id) 建索引，分页查询使用游标（keyset），不使用 OFFSET。
+    """
+    __tablename__ = "chat_history"
+    __table_args__ = (
+        Index("ix_chat_history_user_id_created_at", "user_id", "created_at", "id"),
+    )
+
+    id: Mapped[str] = mapped_column(
+        String(36), primary_key=True, default=lambda: str(uuid.uuid4())
+    )
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
+    question: Mapped[str] = mapped_column(Text, nullable=False)
+    answer: Mapped[str] = mapped_column(Text, nullable=False)
+    sources: Mapped[list[dict]] = mapped_column(
+        JSON().with_variant(JSONB, "postgresql"), nullable=False, default=list
+    )
+    # query（一次性返回）或 stream（流式）
+    mode: Mapped[str] = mapped_column(String(16), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False
+    )
@@ -0,0 +1,25 @@
+# app/schemas/history.py
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class ChatHistoryItem(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    question: str
+    answer: str
+    sources: list[dict] = Field(
+        default_factory=list, description="答案参考的来源文档元数据"
+    )
+    mode: str = Field(..., description="query（一次性返回）或 stream（流式）")
+    created_at: datetime
+
+
+class ChatHistoryPage(BaseModel):
+    items: list[ChatHistoryItem] = Field(..., description="按时间从新到旧排列")
+    next_cursor: Optional[str] = Field(
+        None, description="下一页的游标，为空表示没有更多记录"
+    )
@@ -1,6 +1,7 @@
 # 临时定义 Pydantic 模型，未来会移到 schemas 文件夹
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Literal, Optional
+from datetime import datetime
 
 # 定义单个来源文档的结构
 class SourceDocument(BaseModel):
@@ -10,8 +11,56 @@ class SourceDocument(BaseModel):
 # 定义API的请求体模型
 class QueryRequest(BaseModel):
     question: str = Field(..., min_length=1, description="用户提出的问题")
+    ef_search: Optional[int] = Field(
+        None, ge=1, le=1000, description="HNSW 索引搜索候选集大小，越大召回越高"
+    )
+    probes: Optional[int] = Field(
+        None, ge=1, le=1000, description="IVFFlat 索引探查的聚类数，越大召回越高"
+    )
+    retrieval_mode: Optional[Literal["vector", "lexical", "hybrid"]] = Field(
+        None,
+        description=(
+            "检索方式: vector（向量）、lexical（全文，无需向量化问题）、"
+            "hybrid（融合），默认使用服务端配置"
+        ),
+    )
+    rerank: Optional[bool] = Field(
+        None, description="是否用交叉编码器对候选结果重排序，默认使用服务端配置"
+    )
+
+# 检索结果合并成上下文时的取舍统计
+class RetrievalReport(BaseModel):
+    candidates: int = Field(..., description="各集合返回的候选结果总数")
+    below_threshold: int = Field(0, description="低于相似度阈值被丢弃的数量")
+    duplicates: int = Field(0, description="内容重复被合并的数量")
+    reranked: int = Field(0, description="经过重排序模型打分的候选数量")
+    dropped_by_top_k: int = 0
+    dropped_by_budget: int = Field(0, description="超出 token 预算被丢弃的数量")
+    tokens_candidates: int = Field(..., description="所有候选结果的估算 token 数")
+    tokens_context: int = Field(..., description="最终上下文的估算 token 数")
+    tokens_saved: int = Field(
+        ..., description="相比把所有候选结果放入上下文节省的估算 token 数"
+    )
 
 # 定义API的响应体模型
 class QueryResponse(BaseModel):
     answer: str = Field(..., description="模型生成的答案")
     source_documents: list[SourceDocument] = Field(..., description="答案所参考的来源文档列表")
+    retrieval_report: Optional[RetrievalReport] = Field(
+        None, description="检索结果合并统计"
+    )
+
+# 上传任务的响应模型
+class UploadJobResponse(BaseModel):
+    job_id: str = Field(..., description="摄取任务 ID")
+    filename: str
+    status: str = Field(..., description="任务状态: queued, running, succeeded, failed")
+    attempts: int = 0
+    chunks_done: int = Field(0, description="已写入的文本块数量")
+    chunks_total: Optional[int] = Field(
+        None, description="目前已切分出的待写入文本块数，随解析进度增加"
+    )
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
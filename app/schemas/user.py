@@ -1,5 +1,5 @@
 # app/schemas/user.py
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 class UserBase(BaseModel):
     username: str = Field(..., min_length=3, max_length=50)
@@ -14,6 +14,17 @@ class UserResponse(UserBase):
     class Config:
         from_attributes = True # 允许从 ORM 模型直接转换
 
+class AuthenticatedUser(BaseModel):
+    """
+    通过认证的当前用户。是数据库记录的只读快照（或来自 token 中签名的声明），
+    可以在请求和线程之间安全地缓存、共享。
+    """
+    model_config = ConfigDict(from_attributes=True, frozen=True)
+
+    id: int
+    username: str
+    is_active: bool
+
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
@@ -0,0 +1,170 @@
+# app/services/answer_cache.py
+import hashlib
+import re
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+# 问题末尾不影响语义的标点
+_TRAILING_PUNCTUATION = "?？!！。.,，;；~～ "
+
+
+def normalize_question(question: str) -> str:
+    """统一全角/半角、大小写和空白，去掉末尾标点"""
+    text = unicodedata.normalize("NFKC", question).lower()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip(_TRAILING_PUNCTUATION)
+
+
+def chunk_fingerprint(documents: list[Document]) -> str:
+    """根据检索到的文本块 ID（没有 ID 时使用内容哈希）生成指纹"""
+    digest = hashlib.sha1()
+    for doc in documents:
+        chunk_id = doc.id or hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest()
+        digest.update(chunk_id.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+@dataclass
+class _CachedAnswer:
+    question: str
+    embedding: Optional[np.ndarray]  # 全文检索的请求没有问题向量，只能精确命中
+    tokens: list[str]
+    created_at: float
+
+
+@dataclass
+class _Bucket:
+    """同一组检索结果下缓存的答案"""
+    entries: list[_CachedAnswer] = field(default_factory=list)
+
+
+class AnswerCache:
+    """
+    问答结果缓存。
+    键由 规范化后的问题 + 检索到的文本块指纹 组成；
+    在同一组文本块下，问题向量余弦相似度不低于阈值的近似问题也视为命中。
+    缓存不需要随摄取主动失效：文本块 ID 由内容哈希得到，
+    内容变化后检索返回的是新的 ID，指纹随之不同；删除的文本块不会再被检索到。
+    因此摄取进程（CLI 或其它 worker）修改集合后，每个 API 进程的缓存都不会返回过期答案。
+    """
+
+    # 每组文本块最多保留的不同问法数量
+    MAX_ENTRIES_PER_BUCKET = 16
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        similarity_threshold: float,
+        timer: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self._timer = timer
+        self._buckets = TTLCache(
+            maxsize=maxsize, ttl=ttl, timer=timer, refresh_on_get=False
+        )
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def _bucket_key(
+        self, variant: str, collection_names: list[str], documents: list[Document]
+    ) -> tuple:
+        return variant, tuple(collection_names), chunk_fingerprint(documents)
+
+    @staticmethod
+    def _unit(embedding: list[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def lookup(
+        self,
+        variant: str,
+        collection_names: list[str],
+        question: str,
+        query_embedding: Optional[list[float]],
+        documents: list[Document],
+    ) -> Optional[list[str]]:
+        """查找缓存的答案，命中时返回生成答案时的 token 列表"""
+        bucket = self._buckets.get(
+            self._bucket_key(variant, collection_names, documents)
+        )
+        now = self._timer()
+        normalized = normalize_question(question)
+        with self._lock:
+            entries = []
+            if bucket:
+                entries = [
+                    e for e in bucket.entries if now - e.created_at <= self.ttl
+                ]
+            for entry in entries:
+                if entry.question == normalized:
+                    self.exact_hits += 1
+                    return entry.tokens
+
+            entries = [e for e in entries if e.embedding is not None]
+            if entries and query_embedding is not None:
+                query = self._unit(query_embedding)
+                best = max(entries, key=lambda e: float(np.dot(e.embedding, query)))
+                if float(np.dot(best.embedding, query)) >= self.similarity_threshold:
+                    self.semantic_hits += 1
+                    return best.tokens
+
+            self.misses += 1
+            return None
+
+    def store(
+        self,
+        variant: str,
+        collection_names: list[str],
+        question: str,
+        query_embedding: Optional[list[float]],
+        documents: list[Document],
+        tokens: list[str],
+    ) -> None:
+        key = self._bucket_key(variant, collection_names, documents)
+        entry = _CachedAnswer(
+            question=normalize_question(question),
+            embedding=None if query_embedding is None else self._unit(query_embedding),
+            tokens=list(tokens),
+            created_at=self._timer(),
+        )
+        with self._lock:
+            bucket = self._buckets.get(key) or _Bucket()
+            bucket.entries = [e for e in bucket.entries if e.question != entry.question]
+            bucket.entries.append(entry)
+            del bucket.entries[:-self.MAX_ENTRIES_PER_BUCKET]
+            self._buckets.set(key, bucket)
+
+    def clear(self) -> None:
+        self._buckets.clear()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": settings.ENABLE_CACHE,
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "similarity_threshold": self.similarity_threshold,
+            "buckets": self._buckets.stats(),
+        }
+
+
+ANSWER_CACHE = AnswerCache(
+    maxsize=settings.ANSWER_CACHE_MAX_ENTRIES,
+    ttl=settings.CACHE_TTL_SECONDS,
+    similarity_threshold=settings.ANSWER_CACHE_SIMILARITY_THRESHOLD,
+)
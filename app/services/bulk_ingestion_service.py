@@ -0,0 +1,462 @@
+# app/services/bulk_ingestion_service.py
+import hashlib
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Iterator, Optional
+
+from langchain_core.documents import Document
+from langchain_text_splitters import CharacterTextSplitter
+
+from .embedding_service import get_embeddings
+from .vector_stores import VectorStoreBackend, get_vector_store_backend
+
+_HASH_BUFFER_SIZE = 1024 * 1024
+# 使用进程池时，每个任务切分的页数；大文档会被拆成多个页段并行处理
+PAGES_PER_TASK = 32
+
+
+def iter_pdf_pages(
+    file_path: str, start_page: int = 0, stop_page: Optional[int] = None
+) -> Iterator[Document]:
+    """
+    逐页读取 PDF（页码从 0 开始，不含 stop_page），每次只在内存中保留一页。
+    元数据与 PyMuPDFLoader 的按页模式保持一致的主要字段
+    （source、page、total_pages 等）。
+    """
+    import pymupdf
+
+    with pymupdf.open(file_path) as doc:
+        metadata = {
+            "source": file_path,
+            "file_path": file_path,
+            "total_pages": len(doc),
+            **{
+                k: v
+                for k, v in doc.metadata.items()
+                if isinstance(v, (str, int)) and v != ""
+            },
+        }
+        stop_page = len(doc) if stop_page is None else min(stop_page, len(doc))
+        for number in range(start_page, stop_page):
+            page = doc.load_page(number)
+            yield Document(
+                page_content=page.get_text().strip(),
+                metadata={**metadata, "page": number},
+            )
+
+
+def count_pdf_pages(file_path: str) -> int:
+    import pymupdf
+
+    with pymupdf.open(file_path) as doc:
+        return len(doc)
+
+
+def iter_pdf_chunks(
+    file_path: str, start_page: int = 0, stop_page: Optional[int] = None
+) -> Iterator[Document]:
+    """
+    逐页切分 PDF 并逐个产出文本块，同时去掉 PostgreSQL 不接受的 NUL 字符。
+    切分以页为单位（与对整本书调用 split_documents 的结果相同），
+    内存占用与文档页数无关。
+    只依赖文件路径，可以在进程池的子进程中按页段执行。
+    """
+    text_splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
+    for page in iter_pdf_pages(file_path, start_page, stop_page):
+        for chunk in text_splitter.split_documents([page]):
+            chunk.page_content = chunk.page_content.replace('\x00', '')
+            yield chunk
+
+
+def _load_page_range(
+    chunk_loader: Callable[..., Iterable[Document]],
+    file_path: str,
+    start_page: int,
+    stop_page: int,
+) -> list[Document]:
+    """进程池任务：切分一个页段，返回该页段的文本块"""
+    return list(chunk_loader(file_path, start_page, stop_page))
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BUFFER_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_id(collection_name: str, source: str, content: str) -> str:
+    """文本块 ID 由集合、来源和内容共同决定，内容不变时 ID 不变"""
+    key = f"{collection_name}\0{source}\0{content}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class SourceFile:
+    path: str  # 磁盘上的文件路径
+    source: str  # 写入 metadata["source"]、并作为清单键的文件名称
+    # 已知的内容哈希（例如上传时边接收边计算的），为空时读取文件计算
+    file_hash: Optional[str] = None
+    # 旧版本写入 metadata["source"] 的其它名称，首次摄取该文件时一并清理
+    legacy_sources: tuple[str, ...] = ()
+
+
+@dataclass
+class _FilePlan:
+    """一个正在摄取的文件的增量状态"""
+    source: SourceFile
+    file_hash: str
+    old_ids: set[str]
+    is_new: bool
+    tasks_remaining: int = 1  # 尚未完成解析的页段数
+    pending: int = 0  # 已进入缓冲区、尚未写入的文本块数
+    added: int = 0
+    failed: bool = False
+    seen_ids: set[str] = field(default_factory=set)
+    chunk_ids: list[str] = field(default_factory=list)
+
+
+@dataclass
+class IngestStats:
+    files_total: int = 0
+    files_done: int = 0
+    files_failed: int = 0
+    files_new: int = 0
+    files_changed: int = 0
+    files_unchanged: int = 0
+    files_removed: int = 0
+    chunks_planned: int = 0  # 需要向量化的文本块（随文件解析完成而增加）
+    chunks: int = 0  # 本次向量化并写入的文本块
+    chunks_reused: int = 0  # 内容未变、直接复用的文本块
+    chunks_removed: int = 0
+    batches: int = 0
+    embed_seconds: float = 0.0
+    write_seconds: float = 0.0
+    elapsed_seconds: float = 0.0
+    dry_run: bool = False
+    changes: list[dict] = field(default_factory=list)
+    errors: list[str] = field(default_factory=list)
+
+    @property
+    def docs_per_second(self) -> float:
+        return self.files_done / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    def summary(self) -> str:
+        prefix = "[演练，未写入数据库] " if self.dry_run else ""
+        return (
+            f"{prefix}处理文件 {self.files_done}/{self.files_total}"
+            f"（失败 {self.files_failed}）: "
+            f"新增 {self.files_new}, 变更 {self.files_changed}, "
+            f"未变 {self.files_unchanged}, 删除 {self.files_removed}\n"
+            f"文本块: 写入 {self.chunks}, 复用 {self.chunks_reused}, "
+            f"删除 {self.chunks_removed}，"
+            f"共 {self.batches} 批，耗时 {self.elapsed_seconds:.1f} 秒\n"
+            f"吞吐: {self.docs_per_second:.2f} 文档/秒, "
+            f"{self.chunks_per_second:.1f} 文本块/秒 "
+            f"(向量化 {self.embed_seconds:.1f} 秒, 写库 {self.write_seconds:.1f} 秒)"
+        )
+
+
+def _iter_parse_results(
+    plans: Iterable[_FilePlan],
+    chunk_loader: Callable[..., Iterable[Document]],
+    page_counter: Callable[[str], int],
+    workers: int,
+    pages_per_task: int,
+):
+    """
+    依次产出 (文件计划, 文本块可迭代对象或异常)。
+    workers <= 0 时在当前进程中逐页流式切分整个文件；
+    workers > 0 时把文件拆成若干页段交给进程池，
+    同时最多保留 workers * 2 个未完成的页段，避免向量化跟不上时解析结果在内存中堆积。
+    """
+    if workers <= 0:
+        for plan in plans:
+            yield plan, chunk_loader(plan.source.path)
+        return
+
+    def page_tasks():
+        # 产出 (计划, 页段, 立即结果)；页段为 None 时直接使用立即结果
+        for plan in plans:
+            try:
+                pages = page_counter(plan.source.path)
+            except Exception as e:
+                yield plan, None, e
+                continue
+            ranges = [
+                (start, min(start + pages_per_task, pages))
+                for start in range(0, pages, pages_per_task)
+            ]
+            if not ranges:
+                yield plan, None, []
+                continue
+            plan.tasks_remaining = len(ranges)
+            for page_range in ranges:
+                yield plan, page_range, None
+
+    # 主进程已加载嵌入模型（含多线程运行时），使用 spawn 启动子进程，避免 fork 后死锁
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        tasks = page_tasks()
+        pending: dict[Future, _FilePlan] = {}
+        ready: deque = deque()
+
+        def submit_next() -> None:
+            for plan, page_range, immediate in tasks:
+                if page_range is None:
+                    ready.append((plan, immediate))
+                    continue
+                future = executor.submit(
+                    _load_page_range, chunk_loader, plan.source.path, *page_range
+                )
+                pending[future] = plan
+                return
+
+        for _ in range(workers * 2):
+            submit_next()
+        while pending or ready:
+            while ready:
+                yield ready.popleft()
+            if not pending:
+                continue
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                plan = pending.pop(future)
+                submit_next()
+                try:
+                    yield plan, future.result()
+                except Exception as e:
+                    yield plan, e
+
+
+def bulk_ingest(
+    files: list[SourceFile],
+    collection_name: str,
+    embed_documents: Callable[[list[str]], list[list[float]]],
+    writer,
+    workers: int = 0,
+    batch_size: int = 256,
+    chunk_loader: Callable[..., Iterable[Document]] = iter_pdf_chunks,
+    page_counter: Callable[[str], int] = count_pdf_pages,
+    pages_per_task: int = PAGES_PER_TASK,
+    progress: Optional[Callable[[IngestStats], None]] = None,
+    prune_missing: bool = False,
+    dry_run: bool = False,
+) -> IngestStats:
+    """
+    增量、流式的批量摄取流水线：
+    1. 计算文件哈希，与清单一致的文件直接跳过；
+    2. 其余文件逐页切分（workers > 0 时按页段在进程池中并行），文本块按内容哈希生成 ID，
+       清单中已有的文本块直接复用；
+    3. 新文本块进入固定大小的滚动批次，用同一个嵌入模型批量向量化，每批通过 writer
+       一次性写入并提交 —— 大文档的前几批在整个文件处理完之前就可以被检索到，
+       内存中只保留当前批次和正在切分的页；
+    4. 文件的新文本块全部写入后，删除它已不存在的旧文本块并更新清单；
+    5. prune_missing 为 True 时，清单中有、本次文件列表中没有的文件视为已删除。
+    dry_run 为 True 时只统计会发生的变化，不向量化也不写库。
+    每处理一批调用一次 progress 回调。
+    """
+    stats = IngestStats(files_total=len(files), dry_run=dry_run)
+    start = time.perf_counter()
+    manifest = writer.load_manifest()
+    buffer: list[Document] = []
+    active: dict[str, _FilePlan] = {}
+
+    def fail(plan: _FilePlan, error: Exception) -> None:
+        if plan.failed:
+            return
+        plan.failed = True
+        stats.files_failed += 1
+        stats.errors.append(f"{plan.source.source}: {error}")
+        print(f"!!! 处理文件 {plan.source.path} 时发生错误: {error}")
+
+    def maybe_finish(plan: _FilePlan) -> None:
+        """文件解析完成且新文本块全部写入后，提交清单"""
+        if plan.tasks_remaining > 0 or plan.pending > 0:
+            return
+        active.pop(plan.source.source, None)
+        if plan.failed:
+            return
+        stale_ids = sorted(plan.old_ids - plan.seen_ids)
+        stats.files_done += 1
+        if plan.is_new:
+            stats.files_new += 1
+        else:
+            stats.files_changed += 1
+        stats.chunks_removed += len(stale_ids)
+        stats.changes.append({
+            "source": plan.source.source,
+            "status": "new" if plan.is_new else "changed",
+            "added_chunks": plan.added,
+            "removed_chunks": len(stale_ids),
+        })
+        if not dry_run:
+            writer.commit_file(
+                plan.source.source,
+                plan.file_hash,
+                plan.chunk_ids,
+                stale_ids,
+                plan.is_new,
+                plan.source.legacy_sources,
+            )
+
+    def flush() -> None:
+        batch = buffer[:]
+        buffer.clear()
+        # 上次中断前已写入的文本块不再重复向量化
+        existing = writer.existing_ids([doc.id for doc in batch])
+        documents = [doc for doc in batch if doc.id not in existing]
+        stats.chunks_reused += len(batch) - len(documents)
+        stats.chunks_planned -= len(batch) - len(documents)
+        if documents and not dry_run:
+            embed_start = time.perf_counter()
+            vectors = embed_documents([doc.page_content for doc in documents])
+            write_start = time.perf_counter()
+            stats.embed_seconds += write_start - embed_start
+            writer.write(documents, vectors)
+            stats.write_seconds += time.perf_counter() - write_start
+            stats.batches += 1
+        stats.chunks += len(documents)
+
+        touched: dict[str, _FilePlan] = {}
+        for doc in batch:
+            plan = active[doc.metadata["source"]]
+            plan.pending -= 1
+            if doc.id not in existing:
+                plan.added += 1
+            touched[plan.source.source] = plan
+        stats.elapsed_seconds = time.perf_counter() - start
+        if progress:
+            progress(stats)
+        for plan in touched.values():
+            maybe_finish(plan)
+
+    def add_chunk(plan: _FilePlan, doc: Document) -> None:
+        if plan.failed:
+            return
+        doc.metadata["source"] = plan.source.source
+        doc.id = chunk_id(collection_name, plan.source.source, doc.page_content)
+        # 同一文件内内容相同的文本块只保留一个
+        if doc.id in plan.seen_ids:
+            return
+        plan.seen_ids.add(doc.id)
+        plan.chunk_ids.append(doc.id)
+        if doc.id in plan.old_ids:
+            stats.chunks_reused += 1
+            return
+        plan.pending += 1
+        stats.chunks_planned += 1
+        buffer.append(doc)
+        if len(buffer) >= batch_size:
+            flush()
+
+    def changed_files() -> Iterator[_FilePlan]:
+        for file in files:
+            entry = manifest.get(file.source)
+            plan = _FilePlan(
+                source=file,
+                file_hash="",
+                old_ids=set(entry.chunk_ids) if entry else set(),
+                is_new=entry is None,
+            )
+            try:
+                plan.file_hash = file.file_hash or file_sha256(file.path)
+            except Exception as e:
+                fail(plan, e)
+                continue
+            if entry is not None and entry.file_hash == plan.file_hash:
+                stats.files_done += 1
+                stats.files_unchanged += 1
+                stats.chunks_reused += len(entry.chunk_ids)
+                continue
+            active[file.source] = plan
+            yield plan
+
+    results = _iter_parse_results(
+        changed_files(), chunk_loader, page_counter, workers, pages_per_task
+    )
+    for plan, result in results:
+        if isinstance(result, Exception):
+            fail(plan, result)
+        else:
+            try:
+                for doc in result:
+                    add_chunk(plan, doc)
+            except Exception as e:
+                fail(plan, e)
+        plan.tasks_remaining -= 1
+        maybe_finish(plan)
+
+    if buffer:
+        flush()
+
+    if prune_missing:
+        present = {file.source for file in files}
+        for source, entry in manifest.items():
+            if source in present:
+                continue
+            stats.files_removed += 1
+            stats.chunks_removed += len(entry.chunk_ids)
+            stats.changes.append({
+                "source": source,
+                "status": "removed",
+                "added_chunks": 0,
+                "removed_chunks": len(entry.chunk_ids),
+            })
+            if not dry_run:
+                writer.remove_source(source, entry.chunk_ids)
+
+    stats.elapsed_seconds = time.perf_counter() - start
+    return stats
+
+
+def print_progress(stats: IngestStats) -> None:
+    print(
+        f"[进度] 文件 {stats.files_done + stats.files_failed}/{stats.files_total} | "
+        f"文本块 {stats.chunks} | {stats.docs_per_second:.2f} 文档/秒 | "
+        f"{stats.chunks_per_second:.1f} 文本块/秒"
+    )
+
+
+def ingest_files(
+    files: list[SourceFile],
+    collection_name: str,
+    embeddings_model_name: str,
+    workers: int = 0,
+    batch_size: int = 256,
+    prune_missing: bool = False,
+    dry_run: bool = False,
+    progress: Optional[Callable[[IngestStats], None]] = print_progress,
+    backend: Optional[VectorStoreBackend] = None,
+) -> IngestStats:
+    """
+    使用共享嵌入模型，把一组 PDF 增量摄取到指定集合。
+    backend 为空时使用 VECTOR_STORE_TYPE 配置的向量存储后端。
+    """
+    embeddings = get_embeddings(embeddings_model_name)
+    backend = backend or get_vector_store_backend()
+    writer = backend.open_writer(collection_name, embeddings_model_name)
+    try:
+        stats = bulk_ingest(
+            files,
+            collection_name=collection_name,
+            embed_documents=embeddings.embed_documents,
+            writer=writer,
+            workers=workers,
+            batch_size=batch_size,
+            progress=progress,
+            prune_missing=prune_missing,
+            dry_run=dry_run,
+        )
+    finally:
+        writer.close()
+    return stats
@@ -0,0 +1,176 @@
+# app/services/context_service.py
+import hashlib
+import math
+import re
+import threading
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+from langchain_core.documents import Document
+
+# 带分数的检索结果，分数越大越相关（与 LangChain 的 *_with_score 返回形式一致）
+ScoredDocument = tuple[Document, float]
+
+_CJK_PATTERN = re.compile(r"[㐀-䶿一-鿿豈-﫿　-〿＀-￯]")
+_WHITESPACE_PATTERN = re.compile(r"\s")
+# DeepSeek 官方给出的估算：1 个中文字符约 0.6 个 token，1 个英文字符约 0.3 个 token
+_CJK_TOKENS_PER_CHAR = 0.6
+_OTHER_TOKENS_PER_CHAR = 0.3
+
+
+def estimate_tokens(text: str) -> int:
+    """按字符估算 token 数，不依赖分词器文件，每个文本块只需扫描一次"""
+    cjk = len(_CJK_PATTERN.findall(text))
+    other = len(text) - cjk - len(_WHITESPACE_PATTERN.findall(text))
+    return math.ceil(cjk * _CJK_TOKENS_PER_CHAR + other * _OTHER_TOKENS_PER_CHAR)
+
+
+def content_hash(doc: Document) -> str:
+    """
+    按内容去重的键。文本块 ID 包含集合名称，
+    同一份文档分别上传到个人库和全局库时 ID 不同，
+    因此这里只对内容（忽略首尾空白）取哈希。
+    """
+    return hashlib.sha256(doc.page_content.strip().encode("utf-8")).hexdigest()
+
+
+def reciprocal_rank_fusion(
+    results: list[list[ScoredDocument]], k: int = 60
+) -> list[ScoredDocument]:
+    """
+    倒数排名融合：文档得分为它在各个结果列表中 1 / (k + 排名) 之和，按得分从高到低返回。
+    只使用排名，不需要把向量相似度和 ts_rank 换算到同一尺度。
+    内容相同的文本块合并为一个。
+    """
+    scores: dict[str, float] = {}
+    documents: dict[str, Document] = {}
+    for docs in results:
+        for rank, (doc, _) in enumerate(docs, start=1):
+            key = content_hash(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            documents.setdefault(key, doc)
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    return [(documents[key], scores[key]) for key in ranked]
+
+
+@dataclass
+class ContextReport:
+    """一次检索从候选结果到最终上下文的取舍情况"""
+    candidates: int = 0  # 各集合返回的结果总数（原先会全部放入上下文）
+    below_threshold: int = 0  # 低于相似度阈值被丢弃的数量
+    duplicates: int = 0  # 内容重复被合并的数量
+    reranked: int = 0  # 经过重排序模型打分的候选数量
+    dropped_by_top_k: int = 0
+    dropped_by_budget: int = 0  # 超出 token 预算被丢弃的数量
+    tokens_candidates: int = 0  # 所有候选结果拼接后的估算 token 数
+    tokens_context: int = 0  # 最终上下文的估算 token 数
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_candidates - self.tokens_context
+
+    def as_dict(self) -> dict:
+        return {**asdict(self), "tokens_saved": self.tokens_saved}
+
+
+def merge_candidates(
+    results: list[list[ScoredDocument]],
+    fuse: bool = False,
+    rrf_k: int = 60,
+    below_threshold: int = 0,
+) -> tuple[list[ScoredDocument], ContextReport]:
+    """
+    合并多个集合 / 多路检索的结果：按内容去重
+    （fuse=True 时按倒数排名融合，否则保留最高分），再全局按分数从高到低排序。
+    """
+    report = ContextReport(below_threshold=below_threshold)
+    for docs in results:
+        report.candidates += len(docs)
+        report.tokens_candidates += sum(
+            estimate_tokens(doc.page_content) for doc, _ in docs
+        )
+
+    if fuse:
+        ranked = reciprocal_rank_fusion(results, k=rrf_k)
+    else:
+        best: dict[str, ScoredDocument] = {}
+        for docs in results:
+            for doc, score in docs:
+                key = content_hash(doc)
+                if key not in best or score > best[key][1]:
+                    best[key] = (doc, score)
+        ranked = sorted(best.values(), key=lambda item: item[1], reverse=True)
+    report.duplicates = report.candidates - len(ranked)
+    return ranked, report
+
+
+def select_context(
+    ranked: list[ScoredDocument],
+    top_k: int,
+    token_budget: Optional[int],
+    report: ContextReport,
+) -> list[ScoredDocument]:
+    """
+    取前 top_k 个结果，按顺序放入上下文，放不下的文本块跳过，
+    总 token 数不超过 token_budget
+    （排在最前的文本块总会保留，避免预算过小时上下文为空）。
+    """
+    report.dropped_by_top_k = max(len(ranked) - top_k, 0)
+    selected = []
+    for doc, score in ranked[:top_k]:
+        doc_tokens = estimate_tokens(doc.page_content)
+        over_budget = (
+            token_budget is not None
+            and report.tokens_context + doc_tokens > token_budget
+        )
+        if selected and over_budget:
+            report.dropped_by_budget += 1
+            continue
+        selected.append((doc, score))
+        report.tokens_context += doc_tokens
+
+    CONTEXT_STATS.record(report)
+    return selected
+
+
+def build_context(
+    results: list[list[ScoredDocument]],
+    top_k: int,
+    token_budget: Optional[int] = None,
+    fuse: bool = False,
+    rrf_k: int = 60,
+    below_threshold: int = 0,
+) -> tuple[list[ScoredDocument], ContextReport]:
+    """去重合并后按 top_k 和 token 预算选出上下文"""
+    ranked, report = merge_candidates(
+        results, fuse=fuse, rrf_k=rrf_k, below_threshold=below_threshold
+    )
+    return select_context(ranked, top_k, token_budget, report), report
+
+
+class ContextStats:
+    """进程内累计的上下文裁剪统计"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.tokens_candidates = 0
+        self.tokens_context = 0
+
+    def record(self, report: ContextReport) -> None:
+        with self._lock:
+            self.queries += 1
+            self.tokens_candidates += report.tokens_candidates
+            self.tokens_context += report.tokens_context
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "queries": self.queries,
+                "tokens_candidates": self.tokens_candidates,
+                "tokens_context": self.tokens_context,
+                "tokens_saved": self.tokens_candidates - self.tokens_context,
+            }
+
+
+CONTEXT_STATS = ContextStats()
@@ -0,0 +1,272 @@
+# app/services/embedding_service.py
+import asyncio
+import logging
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Optional
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+if TYPE_CHECKING:
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+
+def __getattr__(name: str):
+    # langchain_huggingface（及 transformers 等依赖）在首次加载模型时才导入，
+    # 不需要模型的进程不付出这部分开销
+    if name == "HuggingFaceEmbeddings":
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        globals()[name] = HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+@dataclass
+class _RegisteredModel:
+    embeddings: "HuggingFaceEmbeddings"
+    memory_bytes: int
+    hits: int = 0
+
+
+# 进程级嵌入模型注册表，键为 (模型名称, 设备)
+_REGISTRY: dict[tuple[str, str], _RegisteredModel] = {}
+# 每个模型被加载的次数（清空注册表后仍保留，便于发现重复加载）
+_LOAD_COUNTS: dict[tuple[str, str], int] = {}
+_LOCK = threading.Lock()
+
+# 查询向量化属于 CPU 密集型操作，放到有界线程池中执行，避免阻塞事件循环
+_EMBEDDING_EXECUTOR = ThreadPoolExecutor(
+    max_workers=settings.EMBEDDING_MAX_WORKERS,
+    thread_name_prefix="embedding",
+)
+
+
+def _estimate_model_memory(embeddings: "HuggingFaceEmbeddings") -> int:
+    """估算模型参数与缓冲区占用的内存字节数"""
+    client = getattr(embeddings, "_client", None)
+    if client is None or not hasattr(client, "parameters"):
+        return 0
+    total = sum(p.numel() * p.element_size() for p in client.parameters())
+    if hasattr(client, "buffers"):
+        total += sum(b.numel() * b.element_size() for b in client.buffers())
+    return total
+
+
+def get_embeddings(
+    model_name: str, device: Optional[str] = None
+) -> "HuggingFaceEmbeddings":
+    """
+    获取共享的嵌入模型实例。
+    同一进程内相同 (模型名称, 设备) 只会加载一次，所有检索器和摄取流程共用。
+    """
+    key = (model_name, device or settings.EMBEDDING_DEVICE)
+    registered = _REGISTRY.get(key)
+    if registered is None:
+        # 加锁后再次检查，避免并发请求重复加载同一个模型
+        with _LOCK:
+            registered = _REGISTRY.get(key)
+            if registered is None:
+                logger.info(
+                    "embedding.model_loading",
+                    extra={"model": key[0], "device": key[1]},
+                )
+                embeddings_class = getattr(
+                    sys.modules[__name__], "HuggingFaceEmbeddings"
+                )
+                embeddings = embeddings_class(
+                    model_name=key[0],
+                    model_kwargs={"device": key[1]},
+                )
+                registered = _RegisteredModel(
+                    embeddings=embeddings,
+                    memory_bytes=_estimate_model_memory(embeddings),
+                )
+                _REGISTRY[key] = registered
+                _LOAD_COUNTS[key] = _LOAD_COUNTS.get(key, 0) + 1
+    registered.hits += 1
+    return registered.embeddings
+
+
+class QueryEmbeddingBatcher:
+    """
+    查询向量的微批处理器。
+    编码器空闲时问题立即计算；编码器忙碌时，在一个很短的时间窗口内收集
+    并发请求的问题，合并成一次批量前向计算。
+    计算结果按文本缓存在 LRU 中，相同问题不会重复计算。
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        device: str,
+        max_batch_size: int,
+        window_seconds: float,
+        cache_size: int,
+        executor: ThreadPoolExecutor,
+    ):
+        self.model_name = model_name
+        self.device = device
+        self.max_batch_size = max_batch_size
+        self.window_seconds = window_seconds
+        self.cache = TTLCache(maxsize=cache_size, ttl=float("inf"))
+        self._executor = executor
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: list[str] = []
+        self._futures: dict[str, asyncio.Future] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._running_batches = 0
+        self.batches = 0
+        self.batched_texts = 0
+        self.max_observed_batch = 0
+
+    def _encode(self, texts: list[str]) -> list[list[float]]:
+        embeddings = get_embeddings(self.model_name, self.device)
+        # 未单独配置查询编码参数时，embed_query 与 embed_documents 的编码方式一致
+        return embeddings.embed_documents(texts)
+
+    async def embed(self, text: str) -> list[float]:
+        cached = self.cache.get(text)
+        if cached is not None:
+            return cached
+
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # 事件循环发生变化（例如测试中），丢弃绑定在旧循环上的状态
+            self._loop = loop
+            self._pending = []
+            self._futures = {}
+            self._flush_handle = None
+            self._running_batches = 0
+
+        future = self._futures.get(text)
+        if future is None:
+            future = loop.create_future()
+            self._futures[text] = future
+            self._pending.append(text)
+            if self._running_batches == 0 or len(self._pending) >= self.max_batch_size:
+                self._flush()
+            elif self._flush_handle is None:
+                self._flush_handle = loop.call_later(self.window_seconds, self._flush)
+        return await asyncio.shield(future)
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        texts, self._pending = self._pending, []
+        if texts:
+            self._running_batches += 1
+            self._loop.create_task(self._run_batch(texts))
+
+    async def _run_batch(self, texts: list[str]) -> None:
+        try:
+            await self._encode_batch(texts)
+        finally:
+            self._running_batches -= 1
+
+    async def _encode_batch(self, texts: list[str]) -> None:
+        self.batches += 1
+        self.batched_texts += len(texts)
+        self.max_observed_batch = max(self.max_observed_batch, len(texts))
+        futures = [self._futures.pop(text) for text in texts]
+        try:
+            vectors = await self._loop.run_in_executor(
+                self._executor, self._encode, texts
+            )
+        except Exception as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+                    future.exception()
+            return
+        for text, vector, future in zip(texts, vectors, futures):
+            self.cache.set(text, vector)
+            if not future.done():
+                future.set_result(vector)
+
+    def stats(self) -> dict:
+        return {
+            "model_name": self.model_name,
+            "device": self.device,
+            "batches": self.batches,
+            "batched_texts": self.batched_texts,
+            "avg_batch_size": (
+                self.batched_texts / self.batches if self.batches else 0.0
+            ),
+            "max_batch_size": self.max_observed_batch,
+            "cache": self.cache.stats(),
+        }
+
+
+_BATCHERS: dict[tuple[str, str], QueryEmbeddingBatcher] = {}
+# 与模型注册表的 _LOCK 分开：加载模型时会长时间持有 _LOCK，
+# 而获取批处理器是在事件循环中进行的
+_BATCHERS_LOCK = threading.Lock()
+
+
+def get_query_batcher(
+    model_name: str, device: Optional[str] = None
+) -> QueryEmbeddingBatcher:
+    key = (model_name, device or settings.EMBEDDING_DEVICE)
+    batcher = _BATCHERS.get(key)
+    if batcher is not None:
+        return batcher
+    with _BATCHERS_LOCK:
+        batcher = _BATCHERS.get(key)
+        if batcher is None:
+            batcher = QueryEmbeddingBatcher(
+                model_name=key[0],
+                device=key[1],
+                max_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+                window_seconds=settings.EMBEDDING_BATCH_WINDOW_MS / 1000,
+                cache_size=settings.QUERY_EMBEDDING_CACHE_SIZE,
+                executor=_EMBEDDING_EXECUTOR,
+            )
+            _BATCHERS[key] = batcher
+    return batcher
+
+
+async def aembed_query(
+    text: str, model_name: str, device: Optional[str] = None
+) -> list[float]:
+    """
+    计算查询向量：经过微批处理器合并并发请求，在嵌入线程池中执行
+    （首次调用时模型也在线程池中加载）。
+    """
+    return await get_query_batcher(model_name, device).embed(text)
+
+
+def get_registry_stats() -> dict:
+    """返回注册表中各模型的内存占用、加载次数和复用次数"""
+    models = [
+        {
+            "model_name": model_name,
+            "device": device,
+            "memory_bytes": registered.memory_bytes,
+            "load_count": _LOAD_COUNTS.get((model_name, device), 0),
+            "hits": registered.hits,
+        }
+        for (model_name, device), registered in list(_REGISTRY.items())
+    ]
+    return {
+        "models": models,
+        "total_memory_bytes": sum(m["memory_bytes"] for m in models),
+        "load_counts": {
+            f"{name}@{device}": count for (name, device), count in _LOAD_COUNTS.items()
+        },
+        "query_batchers": [batcher.stats() for batcher in list(_BATCHERS.values())],
+    }
+
+
+def clear_registry() -> None:
+    """释放所有已加载的模型（主要用于测试和重新加载配置）"""
+    with _LOCK:
+        _REGISTRY.clear()
+    with _BATCHERS_LOCK:
+        _BATCHERS.clear()
@@ -0,0 +1,267 @@
+# app/services/history_service.py
+"""
+问答历史：答案生成后只把记录放入进程内的写缓冲区，请求路径上不访问数据库；
+后台任务每隔 HISTORY_FLUSH_INTERVAL_SECONDS（或缓冲区攒满一批时）批量写入。
+读取按 (created_at, id) 游标分页。
+
+写入失败时区分两类错误：连接、超时等暂时性错误把整批记录放回缓冲区等下次重试；
+数据库拒绝数据本身（如违反约束、无法存储的字符）时逐条重写这一批，丢弃并记录被拒绝的那一条，
+一条坏记录不会阻塞之后所有用户的写入。
+"""
+import asyncio
+import base64
+import binascii
+import contextlib
+import json
+import logging
+import time
+import uuid
+from collections import Counter, deque
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import exc as sa_exc
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.crud import crud_history
+from app.db.session import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidCursorError(ValueError):
+    """分页游标无法解析"""
+
+
+def _is_data_error(error: BaseException) -> bool:
+    """数据库因记录内容拒绝写入（重试也不会成功），而不是连接或超时等暂时性错误"""
+    if isinstance(error, (sa_exc.DataError, sa_exc.IntegrityError)):
+        return True
+    # 参数绑定阶段的错误（无法序列化的值等）没有到达数据库
+    return isinstance(error, sa_exc.StatementError) and not isinstance(
+        error, sa_exc.DBAPIError
+    )
+
+
+def _clean_text(text: str) -> str:
+    # PostgreSQL 的 text 类型不能存储 NUL 字符
+    return text.replace("\x00", "")
+
+
+class HistoryWriter:
+    """问答记录的写缓冲区（write-behind），只在事件循环线程中使用"""
+
+    def __init__(self):
+        self._buffer: deque[dict] = deque()
+        self._pending_by_user: Counter[int] = Counter()
+        # 后台任务运行时存在，攒满一批时唤醒它
+        self._wake: Optional[asyncio.Event] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._lock_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._last_created_at = datetime.min.replace(tzinfo=timezone.utc)
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.failures = 0
+        self.last_flush_ms = 0.0
+
+    def record(
+        self,
+        user_id: int,
+        question: str,
+        answer: str,
+        sources: list[dict],
+        mode: str,
+    ) -> None:
+        """把一条完整的问答记录放入写缓冲区，不等待数据库"""
+        if not settings.HISTORY_ENABLED:
+            return
+        if len(self._buffer) >= settings.HISTORY_BUFFER_MAX_SIZE:
+            # 数据库长时间不可用时丢弃最旧的记录，防止内存无限增长
+            self._forget(self._buffer.popleft())
+            self.dropped += 1
+        # 本进程内的记录时间严格递增，连续的问答在分页中保持先后顺序
+        self._last_created_at = max(
+            datetime.now(timezone.utc),
+            self._last_created_at + timedelta(microseconds=1),
+        )
+        self._buffer.append({
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "question": _clean_text(question),
+            "answer": _clean_text(answer),
+            "sources": sources,
+            "mode": mode,
+            "created_at": self._last_created_at,
+        })
+        self._pending_by_user[user_id] += 1
+        batch_full = len(self._buffer) >= settings.HISTORY_FLUSH_BATCH_SIZE
+        if batch_full and self._wake is not None:
+            self._wake.set()
+
+    def has_pending(self, user_id: int) -> bool:
+        return self._pending_by_user[user_id] > 0
+
+    def _forget(self, row: dict) -> None:
+        self._pending_by_user[row["user_id"]] -= 1
+        if self._pending_by_user[row["user_id"]] <= 0:
+            del self._pending_by_user[row["user_id"]]
+
+    def _get_lock(self) -> asyncio.Lock:
+        # 锁与事件循环绑定，测试中可能先后使用多个事件循环
+        loop = asyncio.get_running_loop()
+        if self._lock_loop is not loop:
+            self._lock, self._lock_loop = asyncio.Lock(), loop
+        return self._lock
+
+    async def aflush(self) -> int:
+        """
+        把缓冲区中的记录分批写入数据库，返回写入的条数。
+        暂时性错误时未写入的记录放回缓冲区头部，等下次重试；
+        批次被拒绝时逐条写入，丢弃数据库拒绝的记录。
+        同一时间只有一个写入在进行，因此 aflush 返回时，
+        调用之前放入缓冲区的记录都已写入（或写入失败）。
+        """
+        written = 0
+        async with self._get_lock():
+            while self._buffer:
+                size = min(len(self._buffer), settings.HISTORY_FLUSH_BATCH_SIZE)
+                batch = [self._buffer.popleft() for _ in range(size)]
+                start = time.perf_counter()
+                try:
+                    await self._insert(batch)
+                except (Exception, asyncio.CancelledError) as e:
+                    if not _is_data_error(e):
+                        self._requeue(batch, e)
+                        break
+                    logger.warning(
+                        "history.batch_rejected",
+                        extra={"rows": len(batch), "error": repr(e)},
+                    )
+                    rows_written, completed = await self._write_rows(batch)
+                    written += rows_written
+                    if not completed:
+                        break
+                    continue
+                self._done(batch, start)
+                written += len(batch)
+        return written
+
+    async def _write_rows(self, batch: list[dict]) -> tuple[int, bool]:
+        """逐条写入被拒绝的批次，返回写入的条数，以及是否没有遇到暂时性错误"""
+        written = 0
+        for i, row in enumerate(batch):
+            start = time.perf_counter()
+            try:
+                await self._insert([row])
+            except (Exception, asyncio.CancelledError) as e:
+                if not _is_data_error(e):
+                    self._requeue(batch[i:], e)
+                    return written, False
+                self._forget(row)
+                self.rejected += 1
+                logger.error("history.row_rejected", extra={
+                    "id": row["id"],
+                    "user_id": row["user_id"],
+                    "error": repr(e),
+                })
+                continue
+            self._done([row], start)
+            written += 1
+        return written, True
+
+    @staticmethod
+    async def _insert(rows: list[dict]) -> None:
+        async with AsyncSessionLocal() as db:
+            await crud_history.add_history_batch(db, rows)
+
+    def _done(self, rows: list[dict], start: float) -> None:
+        self.last_flush_ms = (time.perf_counter() - start) * 1000
+        self.batches += 1
+        self.written += len(rows)
+        for row in rows:
+            self._forget(row)
+
+    def _requeue(self, rows: list[dict], error: BaseException) -> None:
+        """暂时性错误：把记录放回缓冲区头部等下次重试（任务被取消时继续抛出）"""
+        self._buffer.extendleft(reversed(rows))
+        if isinstance(error, asyncio.CancelledError):
+            raise error
+        self.failures += 1
+        logger.warning(
+            "history.flush_failed", extra={"rows": len(rows), "error": repr(error)}
+        )
+
+    async def run(self) -> None:
+        """后台写入循环，由应用 lifespan 启动"""
+        self._wake = asyncio.Event()
+        try:
+            while True:
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(
+                        self._wake.wait(), settings.HISTORY_FLUSH_INTERVAL_SECONDS
+                    )
+                self._wake.clear()
+                await self.aflush()
+        finally:
+            self._wake = None
+
+    def stats(self) -> dict:
+        return {
+            "buffered": len(self._buffer),
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+            "failures": self.failures,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+        }
+
+
+HISTORY_WRITER = HistoryWriter()
+
+
+def start_writer() -> Optional[asyncio.Task]:
+    if not settings.HISTORY_ENABLED:
+        return None
+    return asyncio.create_task(HISTORY_WRITER.run())
+
+
+async def stop_writer(task: Optional[asyncio.Task]) -> None:
+    """停止后台写入，并把缓冲区中剩余的记录写入数据库"""
+    if task is None:
+        return
+    task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await task
+    await HISTORY_WRITER.aflush()
+
+
+def encode_cursor(created_at: datetime, entry_id: str) -> str:
+    payload = json.dumps([created_at.isoformat(), entry_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        created_at, entry_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), str(entry_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise InvalidCursorError("无效的分页游标")
+
+
+async def aget_history_page(
+    db: AsyncSession, user_id: int, limit: int, cursor: Optional[str] = None
+) -> dict:
+    """按时间从新到旧返回一页问答记录及下一页的游标"""
+    before = decode_cursor(cursor) if cursor else None
+    if HISTORY_WRITER.has_pending(user_id):
+        # 该用户还有未写入的记录时先写入，保证刚得到的答案立即可见
+        await HISTORY_WRITER.aflush()
+    rows = await crud_history.list_history(db, user_id, limit + 1, before)
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor(rows[limit - 1].created_at, rows[limit - 1].id)
+    return {"items": rows[:limit], "next_cursor": next_cursor}
@@ -1,52 +1,40 @@
 # app/services/ingestion_service.py
-from langchain_community.document_loaders import PyMuPDFLoader
-from langchain_text_splitters import CharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_postgres import PGVector
-from typing import List
-import tempfile
-import os
-from ..core.config import settings # 导入配置
-
-def process_and_embed_document(file_path: str, collection_name: str, embeddings_model_name: str, connection_string: str):
+from typing import Optional
+from .bulk_ingestion_service import SourceFile, ingest_files
+
+def process_and_embed_document(
+    file_path: str,
+    collection_name: str,
+    embeddings_model_name: str,
+    source: Optional[str] = None,
+):
     """
-    加载、处理单个 PDF 文档，并将其嵌入到向量数据库中。
+    加载、处理单个 PDF 文档，并将其增量嵌入到向量数据库中。
+    source 为文件在集合中的名称（默认为文件路径）：同名文件再次上传时，
+    内容未变则跳过，内容变化则只替换发生变化的文本块。
     这是一个可复用的核心函数。
     """
     print(f"开始处理文件: {file_path}")
 
-    # 1. 加载文档
     try:
-        loader = PyMuPDFLoader(file_path)
-        documents = loader.load()
+        stats = ingest_files(
+            [SourceFile(path=file_path, source=source or file_path)],
+            collection_name=collection_name,
+            embeddings_model_name=embeddings_model_name,
+            progress=None,
+        )
     except Exception as e:
-        print(f"加载文件 {file_path} 时出错: {e}")
+        print(f"处理文件 {file_path} 时出错: {e}")
         return 0 # 返回处理失败
 
-    # 2. 切分文档
-    text_splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-    splits = text_splitter.split_documents(documents)
-
-    if not splits:
-        print(f"文件 {file_path} 未能切分出任何文本块。")
+    if stats.files_failed:
+        return 0
+    if stats.files_unchanged:
+        print(f"文件 {file_path} 内容未变化，已跳过。")
         return 0
 
-    print(f"文件被切分成 {len(splits)} 个文本块。")
-
-    # 3. 清洗文本
-    for doc in splits:
-        doc.page_content = doc.page_content.replace('\x00', '')
-
-    # 4. 创建嵌入模型
-    embeddings = HuggingFaceEmbeddings(model_name=embeddings_model_name)
-
-    # 5. 存入 PGVector
-    PGVector.from_documents(
-        embedding=embeddings,
-        documents=splits,
-        collection_name=collection_name,
-        connection=connection_string,
+    print(
+        f"文件 {file_path} 已成功存入数据库（新增 {stats.chunks} 个文本块，"
+        f"复用 {stats.chunks_reused} 个，删除 {stats.chunks_removed} 个）。"
     )
-
-    print(f"文件 {file_path} 已成功存入数据库。")
-    return len(splits) # 返回成功处理的文本块数量
\ No newline at end of file
+    return stats.chunks # 返回本次写入的文本块数量
@@ -0,0 +1,120 @@
+# app/services/ingestion_worker.py
+import os
+import signal
+import socket
+import threading
+import traceback
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.ingestion import IngestionJob
+from app.services import job_queue_service
+from app.services.bulk_ingestion_service import SourceFile, ingest_files
+
+
+class _Heartbeat:
+    """
+    任务执行期间在后台线程中定期更新心跳，
+    避免解析大文件等长时间没有进度回调的阶段被误判为 worker 已崩溃。
+    """
+
+    def __init__(self, job_id: str, interval: float):
+        self.job_id = job_id
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            with SessionLocal() as db:
+                try:
+                    job_queue_service.heartbeat(db, self.job_id)
+                except Exception as e:
+                    print(f"警告: 更新任务 {self.job_id} 心跳失败: {e}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def _remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def process_job(job: IngestionJob) -> None:
+    """执行一个已领取的摄取任务，并把结果写回任务表"""
+    print(f"开始处理任务 {job.id}: {job.filename} (第 {job.attempts} 次尝试)")
+    with SessionLocal() as db:
+        def report_progress(stats) -> None:
+            job_queue_service.heartbeat(
+                db,
+                job.id,
+                chunks_done=stats.chunks,
+                chunks_total=stats.chunks_planned,
+            )
+
+        try:
+            with _Heartbeat(job.id, settings.INGEST_JOB_HEARTBEAT_SECONDS):
+                source = SourceFile(
+                    path=job.file_path, source=job.filename, file_hash=job.file_hash
+                )
+                stats = ingest_files(
+                    [source],
+                    collection_name=job.collection_name,
+                    embeddings_model_name=settings.EMBEDDING_MODEL_NAME,
+                    batch_size=settings.INGEST_EMBEDDING_BATCH_SIZE,
+                    progress=report_progress,
+                )
+            if stats.files_failed:
+                raise RuntimeError("; ".join(stats.errors))
+        except Exception as e:
+            traceback.print_exc()
+            if not job_queue_service.fail_job(db, job, f"{type(e).__name__}: {e}"):
+                print(f"任务 {job.id} 已达到最大重试次数，标记为失败。")
+                _remove_file(job.file_path)
+            return
+
+        job_queue_service.complete_job(db, job.id, chunks_done=stats.chunks)
+        _remove_file(job.file_path)
+        print(
+            f"任务 {job.id} 完成: 写入 {stats.chunks} 个文本块，"
+            f"复用 {stats.chunks_reused} 个。"
+        )
+
+
+def run_worker(worker_index: int, stop_event) -> None:
+    """
+    单个 worker 进程的主循环：领取任务 -> 执行 -> 再领取；队列为空时按间隔轮询。
+    stop_event 被设置后，执行完当前任务即退出。
+    """
+    # Ctrl+C 由父进程统一处理，避免任务执行到一半被中断
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if settings.INGEST_WORKER_NICE and hasattr(os, "nice"):
+        # 与 API 部署在同一台机器上时，降低摄取进程的 CPU 优先级，优先保证查询延迟
+        os.nice(settings.INGEST_WORKER_NICE)
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{worker_index}"
+    print(f"摄取 worker {worker_id} 已启动")
+
+    while not stop_event.is_set():
+        try:
+            with SessionLocal() as db:
+                job_queue_service.requeue_stale_jobs(
+                    db, settings.INGEST_JOB_TIMEOUT_SECONDS
+                )
+                job = job_queue_service.claim_job(db, worker_id)
+        except Exception as e:
+            print(f"警告: 领取任务失败: {e}")
+            job = None
+        if job is None:
+            stop_event.wait(settings.INGEST_WORKER_POLL_SECONDS)
+            continue
+        process_job(job)
+
+    print(f"摄取 worker {worker_id} 已退出")
@@ -0,0 +1,219 @@
+# app/services/job_queue_service.py
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.ingestion import IngestionJob, IngestionManifest
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class QueueFullError(Exception):
+    """排队任务过多，暂时不接受新任务"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def count_pending(db: Session, user_id: Optional[int] = None) -> int:
+    """排队中和执行中的任务数量"""
+    query = (
+        select(func.count())
+        .select_from(IngestionJob)
+        .where(IngestionJob.status.in_([QUEUED, RUNNING]))
+    )
+    if user_id is not None:
+        query = query.where(IngestionJob.user_id == user_id)
+    return db.execute(query).scalar_one()
+
+
+def check_capacity(db: Session, user_id: int) -> None:
+    """
+    背压检查：全局或单个用户的未完成任务达到上限时抛出 QueueFullError，
+    由接口返回 429，让客户端稍后重试，而不是无限堆积任务。
+    """
+    if count_pending(db, user_id) >= settings.INGEST_QUEUE_MAX_PENDING_PER_USER:
+        raise QueueFullError("您有过多文件正在处理中，请稍后再上传。", retry_after=30)
+    if count_pending(db) >= settings.INGEST_QUEUE_MAX_PENDING:
+        raise QueueFullError("服务器繁忙，上传队列已满，请稍后再试。", retry_after=60)
+
+
+def find_duplicate(db: Session, collection_name: str, file_hash: str) -> Optional[str]:
+    """
+    内容相同的文件已在集合中，或已有未完成的任务时，返回已有文件的名称。
+    上传时据此直接拒绝重复文件，不必再排队解析。
+    """
+    existing = db.execute(
+        select(IngestionManifest.source).where(
+            IngestionManifest.collection_name == collection_name,
+            IngestionManifest.file_hash == file_hash,
+        ).limit(1)
+    ).scalar_one_or_none()
+    if existing is not None:
+        return existing
+    return db.execute(
+        select(IngestionJob.filename).where(
+            IngestionJob.collection_name == collection_name,
+            IngestionJob.file_hash == file_hash,
+            IngestionJob.status.in_([QUEUED, RUNNING]),
+        ).limit(1)
+    ).scalar_one_or_none()
+
+
+def enqueue_job(
+    db: Session,
+    user_id: int,
+    collection_name: str,
+    filename: str,
+    file_path: str,
+    file_hash: Optional[str] = None,
+) -> IngestionJob:
+    job = IngestionJob(
+        user_id=user_id,
+        collection_name=collection_name,
+        filename=filename,
+        file_path=file_path,
+        file_hash=file_hash,
+        status=QUEUED,
+        max_attempts=settings.INGEST_JOB_MAX_ATTEMPTS,
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def get_job(db: Session, job_id: str, user_id: int) -> Optional[IngestionJob]:
+    """只返回属于该用户的任务"""
+    return db.execute(
+        select(IngestionJob).where(
+            IngestionJob.id == job_id, IngestionJob.user_id == user_id
+        )
+    ).scalar_one_or_none()
+
+
+def claim_job(db: Session, worker_id: str) -> Optional[IngestionJob]:
+    """
+    领取一个可执行的任务。
+    FOR UPDATE SKIP LOCKED 保证多个 worker 并发领取时不会拿到同一个任务，
+    也不会互相等待。
+    """
+    job = db.execute(
+        select(IngestionJob)
+        .where(IngestionJob.status == QUEUED, IngestionJob.run_after <= func.now())
+        .order_by(IngestionJob.run_after, IngestionJob.created_at)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    ).scalar_one_or_none()
+    if job is None:
+        db.rollback()
+        return None
+    now = _now()
+    job.status = RUNNING
+    job.attempts += 1
+    job.worker_id = worker_id
+    job.started_at = now
+    job.heartbeat_at = now
+    job.error = None
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def heartbeat(
+    db: Session,
+    job_id: str,
+    chunks_done: Optional[int] = None,
+    chunks_total: Optional[int] = None,
+) -> None:
+    """更新任务的心跳时间，并可同时更新进度"""
+    values = {"heartbeat_at": _now()}
+    if chunks_done is not None:
+        values["chunks_done"] = chunks_done
+    if chunks_total is not None:
+        values["chunks_total"] = chunks_total
+    db.execute(
+        update(IngestionJob)
+        .where(IngestionJob.id == job_id, IngestionJob.status == RUNNING)
+        .values(**values)
+    )
+    db.commit()
+
+
+def complete_job(db: Session, job_id: str, chunks_done: int) -> None:
+    db.execute(
+        update(IngestionJob)
+        .where(IngestionJob.id == job_id)
+        .values(
+            status=SUCCEEDED, chunks_done=chunks_done, finished_at=_now(), error=None
+        )
+    )
+    db.commit()
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """指数退避：第 1 次失败后等待 base 秒，之后每次翻倍"""
+    base = settings.INGEST_JOB_RETRY_BASE_SECONDS
+    return timedelta(seconds=base * 2 ** max(attempts - 1, 0))
+
+
+def fail_job(db: Session, job: IngestionJob, error: str) -> bool:
+    """
+    记录任务失败。未超过最大尝试次数时重新排队并返回 True，
+    否则标记为最终失败并返回 False。
+    """
+    job = db.merge(job)
+    job.error = error[:2000]
+    if job.attempts < job.max_attempts:
+        job.status = QUEUED
+        job.run_after = _now() + retry_delay(job.attempts)
+        retry = True
+    else:
+        job.status = FAILED
+        job.finished_at = _now()
+        retry = False
+    db.commit()
+    return retry
+
+
+def requeue_stale_jobs(db: Session, timeout_seconds: int) -> int:
+    """
+    worker 崩溃或被杀死时，任务会停留在 running 状态且心跳不再更新；
+    超时后重新排队（尝试次数已用完的直接标记为失败）。返回处理的任务数量。
+    """
+    deadline = _now() - timedelta(seconds=timeout_seconds)
+    stale = or_(
+        IngestionJob.heartbeat_at.is_(None), IngestionJob.heartbeat_at < deadline
+    )
+    base = (
+        update(IngestionJob)
+        .where(IngestionJob.status == RUNNING, stale)
+        .execution_options(synchronize_session=False)
+    )
+    requeued = db.execute(
+        base.where(IngestionJob.attempts < IngestionJob.max_attempts).values(
+            status=QUEUED,
+            run_after=func.now(),
+            error="worker 心跳超时，已重新排队",
+        )
+    ).rowcount
+    failed = db.execute(
+        base.where(IngestionJob.attempts >= IngestionJob.max_attempts).values(
+            status=FAILED,
+            finished_at=func.now(),
+            error="worker 心跳超时，且已达到最大重试次数",
+        )
+    ).rowcount
+    db.commit()
+    return requeued + failed
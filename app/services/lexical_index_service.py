@@ -0,0 +1,170 @@
+# app/services/lexical_index_service.py
+import re
+import weakref
+from typing import Optional
+
+from langchain_core.documents import Document
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+# 与 langchain_pg_embedding 一一对应的全文索引表，向量行被删除时级联删除
+LEXICAL_TABLE = "langchain_pg_embedding_lexical"
+CREATE_STATEMENTS = [
+    f"CREATE TABLE IF NOT EXISTS {LEXICAL_TABLE} ("
+    "id varchar PRIMARY KEY "
+    "REFERENCES langchain_pg_embedding (id) ON DELETE CASCADE, "
+    "collection_id uuid NOT NULL "
+    "REFERENCES langchain_pg_collection (uuid) ON DELETE CASCADE, "
+    "tsv tsvector NOT NULL)",
+    f"CREATE INDEX IF NOT EXISTS ix_{LEXICAL_TABLE}_tsv "
+    f"ON {LEXICAL_TABLE} USING gin (tsv)",
+    f"CREATE INDEX IF NOT EXISTS ix_{LEXICAL_TABLE}_collection_id "
+    f"ON {LEXICAL_TABLE} (collection_id)",
+]
+
+# 中日韩统一表意文字（含扩展 A 区和兼容区）
+_CJK_RUN = r"[㐀-䶿一-鿿豈-﫿]+"
+# 字母数字串，允许中间有 - _ . / 连接，用于匹配产品型号、错误码等（如 ERR-1042、v2.3.1）
+_WORD_RUN = r"[0-9a-z]+(?:[-_./][0-9a-z]+)*"
+_TOKEN_PATTERN = re.compile(f"{_CJK_RUN}|{_WORD_RUN}")
+_SUBWORD_PATTERN = re.compile(r"[0-9a-z]+")
+# tsvector 的限制：单个词位不超过 2047 字节，位置不超过 16383，每个词位最多 256 个位置
+_MAX_LEXEME_CHARS = 64
+_MAX_POSITION = 16383
+_MAX_POSITIONS_PER_LEXEME = 32
+# 查询中最多使用的词位数，避免过长的问题生成过大的 OR 查询
+_MAX_QUERY_TERMS = 48
+
+
+def tokenize(content: str) -> list[str]:
+    """
+    PostgreSQL 自带的全文检索不支持中文分词，这里在应用侧切分：
+    - 连续的汉字切成重叠的二元组（单个汉字保留本身），不依赖词典即可匹配任意中文术语；
+    - 字母数字串整体保留，带连接符的型号同时保留各个组成部分。
+    """
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer(content.lower()):
+        run = match.group()
+        if _SUBWORD_PATTERN.match(run):
+            tokens.append(run)
+            parts = _SUBWORD_PATTERN.findall(run)
+            if len(parts) > 1:
+                tokens.extend(parts)
+        elif len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return [token for token in tokens if len(token) <= _MAX_LEXEME_CHARS]
+
+
+def _quote_lexeme(lexeme: str) -> str:
+    return "'" + lexeme.replace("\\", "\\\\").replace("'", "''") + "'"
+
+
+def tsvector_literal(content: str) -> str:
+    """把文本转换成 tsvector 的文本表示（带词位位置，供 ts_rank 计算词频）"""
+    positions: dict[str, list[int]] = {}
+    for position, token in enumerate(tokenize(content), start=1):
+        token_positions = positions.setdefault(token, [])
+        if len(token_positions) < _MAX_POSITIONS_PER_LEXEME:
+            token_positions.append(min(position, _MAX_POSITION))
+    return " ".join(
+        f"{_quote_lexeme(token)}:{','.join(map(str, sorted(set(token_positions))))}"
+        for token, token_positions in positions.items()
+    )
+
+
+def build_tsquery(question: str) -> Optional[str]:
+    """把问题转换成 OR 连接的 tsquery 文本；问题中没有可检索的词时返回 None"""
+    terms = list(dict.fromkeys(tokenize(question)))[:_MAX_QUERY_TERMS]
+    if not terms:
+        return None
+    return " | ".join(_quote_lexeme(term) for term in terms)
+
+
+_LEXICAL_SEARCH_SQL = text(
+    f"SELECT e.id, e.document, e.cmetadata, ts_rank(l.tsv, q.query) AS rank "
+    f"FROM {LEXICAL_TABLE} l "
+    "JOIN langchain_pg_embedding e ON e.id = l.id "
+    "CROSS JOIN (SELECT CAST(:query AS tsquery) AS query) q "
+    "WHERE l.collection_id = "
+    "(SELECT uuid FROM langchain_pg_collection WHERE name = :collection_name) "
+    "AND l.tsv @@ q.query "
+    "ORDER BY rank DESC "
+    "LIMIT :k"
+)
+
+# 已确认建好全文索引表的引擎
+_READY_ENGINES: "weakref.WeakSet[AsyncEngine]" = weakref.WeakSet()
+
+
+async def aensure_lexical_table(engine: AsyncEngine) -> None:
+    if engine in _READY_ENGINES:
+        return
+    async with engine.begin() as conn:
+        for statement in CREATE_STATEMENTS:
+            await conn.execute(text(statement))
+    _READY_ENGINES.add(engine)
+
+
+async def alexical_search(
+    engine: AsyncEngine, collection_name: str, question: str, k: int
+) -> list[tuple[Document, float]]:
+    """
+    在全文索引中检索，按 ts_rank 从高到低返回 (文档, ts_rank)；不需要计算查询向量，
+    由 GIN 索引完成匹配，通常在毫秒级返回。
+    """
+    query = build_tsquery(question)
+    if query is None:
+        return []
+    await aensure_lexical_table(engine)
+    async with engine.connect() as conn:
+        rows = (await conn.execute(
+            _LEXICAL_SEARCH_SQL,
+            {"query": query, "collection_name": collection_name, "k": k},
+        )).all()
+    return [
+        (
+            Document(
+                id=row.id, page_content=row.document, metadata=row.cmetadata or {}
+            ),
+            float(row.rank),
+        )
+        for row in rows
+    ]
+
+
+def backfill_lexical_index(engine: Engine, batch_size: int = 1000) -> int:
+    """为启用全文索引之前写入的文本块补建索引，返回补建的行数"""
+    total = 0
+    with engine.connect() as conn:
+        for statement in CREATE_STATEMENTS:
+            conn.execute(text(statement))
+        conn.commit()
+        while True:
+            rows = conn.execute(text(
+                "SELECT e.id, e.collection_id, e.document "
+                "FROM langchain_pg_embedding e "
+                f"LEFT JOIN {LEXICAL_TABLE} l ON l.id = e.id "
+                "WHERE l.id IS NULL LIMIT :limit"
+            ), {"limit": batch_size}).all()
+            if not rows:
+                break
+            conn.execute(
+                text(f"INSERT INTO {LEXICAL_TABLE} (id, collection_id, tsv) "
+                     "VALUES (:id, :collection_id, CAST(:tsv AS tsvector)) "
+                     "ON CONFLICT (id) DO NOTHING"),
+                [
+                    {
+                        "id": row.id,
+                        "collection_id": row.collection_id,
+                        "tsv": tsvector_literal(row.document or ""),
+                    }
+                    for row in rows
+                ],
+            )
+            conn.commit()
+            total += len(rows)
+            print(f"已补建 {total} 行全文索引")
+    return total
@@ -0,0 +1,150 @@
+# app/services/llm_service.py
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LLMClientPool:
+    """
+    进程内长期复用的 LLM 客户端。
+    所有请求共用同一个 httpx 连接池（保持长连接，避免每次问答都重新握手），
+    并通过信号量限制同时发往上游的请求数量。
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str,
+        model: str,
+        max_concurrency: int,
+        max_connections: int,
+        max_keepalive_connections: int,
+        keepalive_expiry: float,
+        timeout: float,
+    ):
+        self.max_concurrency = max_concurrency
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._http_client = httpx.AsyncClient(limits=self.limits, timeout=timeout)
+
+        # openai SDK 导入较慢，创建客户端池时才导入
+        from langchain_openai import ChatOpenAI
+
+        # 普通模型与流式模型共用同一个 HTTP 客户端；流式回调按请求通过 config 传入
+        self.chat = ChatOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            model=model,
+            http_async_client=self._http_client,
+        )
+        self.streaming_chat = ChatOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            model=model,
+            streaming=True,
+            http_async_client=self._http_client,
+        )
+
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+        self.peak_in_flight = 0
+        self.total_requests = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """占用一个上游并发名额，名额用尽时排队等待"""
+        self.waiting += 1
+        start = time.perf_counter()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        wait = time.perf_counter() - start
+        self.total_wait_seconds += wait
+        self.max_wait_seconds = max(self.max_wait_seconds, wait)
+        self.total_requests += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "peak_in_flight": self.peak_in_flight,
+            "total_requests": self.total_requests,
+            "avg_wait_seconds": (
+                self.total_wait_seconds / self.total_requests
+                if self.total_requests
+                else 0.0
+            ),
+            "max_wait_seconds": self.max_wait_seconds,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+        }
+
+    async def aclose(self) -> None:
+        await self._http_client.aclose()
+
+
+_POOL: Optional[LLMClientPool] = None
+
+
+def init_llm_pool() -> Optional[LLMClientPool]:
+    """按配置创建全局 LLM 客户端池（由应用 lifespan 在启动时调用）"""
+    global _POOL
+    if _POOL is None:
+        api_key = settings.DEEPSEEK_API_KEY.get_secret_value()
+        if not api_key:
+            logger.warning("llm.api_key_missing")
+            return None
+        _POOL = LLMClientPool(
+            api_key=api_key,
+            base_url=settings.LLM_BASE_URL,
+            model=settings.LLM_MODEL_NAME,
+            max_concurrency=settings.LLM_MAX_CONCURRENCY,
+            max_connections=settings.LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY_SECONDS,
+            timeout=settings.LLM_TIMEOUT_SECONDS,
+        )
+    return _POOL
+
+
+def get_llm_pool() -> LLMClientPool:
+    if _POOL is None:
+        raise RuntimeError(
+            "LLM 客户端池不可用：未配置 DEEPSEEK_API_KEY，或服务未通过 lifespan 启动"
+        )
+    return _POOL
+
+
+def get_llm_pool_stats() -> Optional[dict]:
+    return _POOL.stats() if _POOL is not None else None
+
+
+async def close_llm_pool() -> None:
+    """关闭全局 LLM 客户端池（由应用 lifespan 在退出时调用）"""
+    global _POOL
+    if _POOL is not None:
+        await _POOL.aclose()
+        _POOL = None
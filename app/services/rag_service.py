@@ -1,158 +1,455 @@
-# app/services/rag_service.py (最终修复版 - 同步检索)
+# app/services/rag_service.py
 
-from pydantic import SecretStr
-from langchain_openai import ChatOpenAI
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_postgres import PGVector
-from langchain_core.vectorstores import VectorStoreRetriever
+from langchain_core.callbacks.base import BaseCallbackHandler
+from langchain_core.documents import Document
 from app.schemas.rag import SourceDocument
-from langchain_core.retrievers import BaseRetriever
+from app.services.embedding_service import aembed_query
+from app.services.llm_service import LLMClientPool
+from app.services.answer_cache import ANSWER_CACHE
+from app.services.context_service import (
+    ContextReport,
+    estimate_tokens,
+    merge_candidates,
+    select_context,
+)
+from app.services.rerank_service import arerank
+from app.services.vector_stores import VectorStoreBackend, get_vector_store_backend
+from app.services.vector_stores.global_index import global_index_backend_for
 import asyncio
-from langchain.callbacks.streaming_aiter import AsyncIteratorCallbackHandler
-from langchain_core.prompts import PromptTemplate
-from langchain.chains import create_retrieval_chain
-from langchain.chains.combine_documents import create_stuff_documents_chain
-import json
-from typing import Optional
+import contextlib
+import logging
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import TYPE_CHECKING, Callable, Optional
 
-# 缓存 RAG 链或检索器
-RETRIEVER_CACHE = {}
+from app.core.config import settings
+from app.core.metrics import (
+    COMPLETION_TOKENS,
+    CONTEXT_DOCUMENTS,
+    DOCUMENTS_RETRIEVED,
+    LLM_TOKENS_PER_SECOND,
+    LLM_TTFT_SECONDS,
+    PROMPT_TOKENS,
+    SEARCH_SECONDS,
+    STREAM_SECONDS,
+    collection_scope,
+    observe_stage,
+    record_stage,
+    timed,
+)
 
-def get_retriever(connection: str, collection_name: str, embeddings_model_name: str, **kwargs) -> VectorStoreRetriever:
+if TYPE_CHECKING:
+    from langchain_core.runnables import Runnable
+
+logger = logging.getLogger(__name__)
+
+RETRIEVAL_MODES = ("vector", "lexical", "hybrid")
+
+@dataclass
+class RetrievalResult:
+    documents: list[Document]
+    query_embedding: Optional[list[float]]  # 仅全文检索时不计算问题向量，为 None
+    collection_names: list[str]
+    # 与 documents 一一对应，含义随检索方式不同
+    scores: list[float] = field(default_factory=list)
+    report: ContextReport = field(default_factory=ContextReport)
+
+async def _timed_search(
+    kind: str, collection_name: str, backend_name: str, search
+) -> list:
+    """等待单个集合的检索，按检索方式和集合范围记录耗时与返回的文本块数"""
+    start = time.perf_counter()
+    results = await search
+    seconds = time.perf_counter() - start
+    scope = collection_scope(collection_name)
+    SEARCH_SECONDS.labels(kind, scope, backend_name).observe(seconds)
+    record_stage(f"{kind}_search.{scope}", seconds)
+    DOCUMENTS_RETRIEVED.labels(scope).inc(len(results))
+    return results
+
+async def aretrieve_documents(
+    question: str,
+    collection_names: list[str],
+    embeddings_model_name: str,
+    k: int = 10,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+    mode: str = "vector",
+    top_k: Optional[int] = None,
+    token_budget: Optional[int] = None,
+    min_similarity: Optional[float] = None,
+    rerank: bool = False,
+    backend: Optional[VectorStoreBackend] = None,
+) -> RetrievalResult:
     """
-    连接到 PGVector 并返回一个检索器。
-    (已简化：移除无效的异步连接逻辑)
+    异步检索多个集合，每个集合各取 k 个带分数的结果，再合并成一份上下文。
+    - vector: 问题只向量化一次，各集合的向量搜索并发执行，按余弦相似度全局排序；
+      ef_search / probes 可按请求调整 HNSW / IVFFlat 索引的召回与延迟。
+    - lexical: 只查全文索引，不向量化问题，按 ts_rank 全局排序。
+    - hybrid: 向量检索与全文检索并发执行，所有结果列表按倒数排名融合。
+    合并时丢弃相似度低于 min_similarity 的向量结果，按内容去重，
+    再按 top_k 和 token_budget 截断（未指定时使用配置中的值）。
+    rerank=True 时每个集合至少召回 RERANK_CANDIDATES 个结果，
+    合并后的前 RERANK_CANDIDATES 个由交叉编码器重新打分，
+    上下文只保留其中最相关的 RERANK_TOP_K 个。
+    backend 为空时使用 VECTOR_STORE_TYPE 配置的向量存储后端；
+    后端不支持全文检索时退回向量检索。
     """
-    cache_key = f"{connection}:{collection_name}"
-    if cache_key in RETRIEVER_CACHE:
-        print(f"从缓存中复用检索器 (Key: {cache_key})")
-        return RETRIEVER_CACHE[cache_key]
-
-    print(f"首次连接到 PGVector (Collection: {collection_name})")
-    embeddings = HuggingFaceEmbeddings(model_name=embeddings_model_name)
-
-    # 仅使用同步连接创建 store，因为异步路径存在无法解决的问题
-    store = PGVector(
-        embeddings=embeddings,
-        collection_name=collection_name,
-        connection=connection,
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"未知的检索方式: {mode}")
+    backend = backend or get_vector_store_backend()
+    if mode != "vector" and not backend.supports_lexical:
+        logger.warning(
+            "retrieval.lexical_unsupported",
+            extra={"backend": backend.name, "mode": mode},
+        )
+        mode = "vector"
+    if top_k is None:
+        top_k = settings.RERANK_TOP_K if rerank else settings.RETRIEVAL_TOP_K
+    if rerank:
+        k = max(k, settings.RERANK_CANDIDATES)
+    if token_budget is None:
+        token_budget = settings.CONTEXT_TOKEN_BUDGET
+    if min_similarity is None:
+        min_similarity = settings.RETRIEVAL_MIN_SIMILARITY
+
+    async def vector_search():
+        with timed("query_embedding"):
+            query_embedding = await aembed_query(question, embeddings_model_name)
+        searches = []
+        for name in collection_names:
+            # 全局集合已导出为只读索引时直接在进程内检索，不访问数据库
+            global_backend = global_index_backend_for(name, embeddings_model_name)
+            search = (global_backend or backend).asearch(
+                name, query_embedding, k, ef_search=ef_search, probes=probes
+            )
+            backend_name = "global_index" if global_backend else backend.name
+            searches.append(_timed_search("vector", name, backend_name, search))
+        results = await asyncio.gather(*searches)
+        return query_embedding, list(results)
+
+    async def lexical_search():
+        return list(await asyncio.gather(*(
+            _timed_search(
+                "lexical", name, backend.name,
+                backend.alexical_search(name, question, k),
+            )
+            for name in collection_names
+        )))
+
+    query_embedding = None
+    vector_results, lexical_results = [], []
+    if mode == "vector":
+        query_embedding, vector_results = await vector_search()
+    elif mode == "lexical":
+        lexical_results = await lexical_search()
+    else:
+        (query_embedding, vector_results), lexical_results = await asyncio.gather(
+            vector_search(), lexical_search()
+        )
+
+    merge_start = time.perf_counter()
+    below_threshold = 0
+    if min_similarity is not None:
+        filtered = [
+            [(doc, score) for doc, score in docs if score >= min_similarity]
+            for docs in vector_results
+        ]
+        below_threshold = sum(map(len, vector_results)) - sum(map(len, filtered))
+        vector_results = filtered
+
+    ranked, report = merge_candidates(
+        vector_results + lexical_results,
+        fuse=mode == "hybrid",
+        rrf_k=settings.RRF_K,
+        below_threshold=below_threshold,
     )
-    
-    retriever = store.as_retriever(
-        search_kwargs={'k': 10}
+    merge_seconds = time.perf_counter() - merge_start
+    not_reranked = 0
+    if rerank and ranked:
+        not_reranked = max(len(ranked) - settings.RERANK_CANDIDATES, 0)
+        with timed("rerank"):
+            ranked = await arerank(question, ranked[:settings.RERANK_CANDIDATES])
+        report.reranked = len(ranked)
+    select_start = time.perf_counter()
+    selected = select_context(ranked, top_k, token_budget, report)
+    report.dropped_by_top_k += not_reranked
+    observe_stage("merge", merge_seconds + time.perf_counter() - select_start)
+    CONTEXT_DOCUMENTS.inc(len(selected))
+    logger.debug("retrieval.merged", extra={
+        "candidates": report.candidates,
+        "duplicates": report.duplicates,
+        "below_threshold": report.below_threshold,
+        "reranked": report.reranked,
+        "kept": len(selected),
+        "tokens_candidates": report.tokens_candidates,
+        "tokens_context": report.tokens_context,
+    })
+    return RetrievalResult(
+        documents=[doc for doc, _ in selected],
+        query_embedding=query_embedding,
+        collection_names=list(collection_names),
+        scores=[score for _, score in selected],
+        report=report,
     )
-    RETRIEVER_CACHE[cache_key] = retriever
-    return retriever
 
-# --- 创建 RAG 链 (保持不变) ---
-def _create_rag_chain(llm: ChatOpenAI, retriever: BaseRetriever):
-    template = """
+# --- 问答链 ---
+QA_TEMPLATE = """
     仅根据下面提供的上下文来回答问题。如果上下文中没有相关信息，请直接说“根据我所掌握的文档，无法回答这个问题”，不要试图编造答案。
     保持答案简洁明了。
     上下文: {context}
     问题: {input}
     回答:
     """
-    prompt = PromptTemplate.from_template(template)
-    question_answer_chain = create_stuff_documents_chain(llm, prompt)
-    rag_chain = create_retrieval_chain(retriever, question_answer_chain)
-    return rag_chain
 
-# --- 异步获取答案 (保持不变) ---
+STREAM_QA_TEMPLATE = """
+    请结合下面提供的上下文来回答问题。你应该优先使用上下文中的信息来形成答案。
+    如果上下文中没有足够的信息，你可以结合自己的知识进行补充回答。
+    如果上下文与问题完全无关，再回答“根据我所掌握的文档，无法回答这个问题”。
+    请用中文进行回答。
+
+    上下文: {context}
+
+    问题: {input}
+
+    回答:
+    """
+
+@lru_cache(maxsize=4)
+def _get_qa_chain(llm_pool: LLMClientPool) -> "Runnable":
+    """
+    问答链只依赖共享的 LLM 客户端，按客户端池构建一次后复用
+    （langchain 的链在此时才导入）
+    """
+    from langchain.chains.combine_documents import create_stuff_documents_chain
+    from langchain_core.prompts import PromptTemplate
+
+    prompt = PromptTemplate.from_template(QA_TEMPLATE)
+    return create_stuff_documents_chain(llm_pool.chat, prompt)
+
+@lru_cache(maxsize=4)
+def _get_stream_qa_chain(llm_pool: LLMClientPool) -> "Runnable":
+    from langchain.chains.combine_documents import create_stuff_documents_chain
+    from langchain_core.prompts import PromptTemplate
+
+    prompt = PromptTemplate.from_template(STREAM_QA_TEMPLATE)
+    return create_stuff_documents_chain(llm_pool.streaming_chat, prompt)
+
+class _LLMTimings(BaseCallbackHandler):
+    """
+    问答链回调：记录链开始、开始调用 LLM（prompt 已构建）、首个和最后一个 token
+    以及调用结束的时间，链结束后一次性写入指标。
+    回调在事件循环中直接执行（run_inline），只记录时间戳。
+    """
+
+    run_inline = True
+
+    def __init__(self):
+        self.chain_started_at: Optional[float] = None
+        self.llm_started_at: Optional[float] = None
+        self.first_token_at: Optional[float] = None
+        self.last_token_at: Optional[float] = None
+        self.llm_ended_at: Optional[float] = None
+        self.tokens = 0
+
+    def on_chain_start(self, serialized, inputs, **kwargs) -> None:
+        self.chain_started_at = self.chain_started_at or time.perf_counter()
+
+    def on_chat_model_start(self, serialized, messages, **kwargs) -> None:
+        self.llm_started_at = self.llm_started_at or time.perf_counter()
+
+    def on_llm_start(self, serialized, prompts, **kwargs) -> None:
+        self.llm_started_at = self.llm_started_at or time.perf_counter()
+
+    def on_llm_new_token(self, token: str, **kwargs) -> None:
+        if not token:
+            return
+        now = time.perf_counter()
+        self.first_token_at = self.first_token_at or now
+        self.last_token_at = now
+        self.tokens += 1
+
+    def on_llm_end(self, response, **kwargs) -> None:
+        self.llm_ended_at = time.perf_counter()
+
+    def observe(self) -> None:
+        if self.chain_started_at is None or self.llm_started_at is None:
+            return
+        observe_stage("prompt_build", self.llm_started_at - self.chain_started_at)
+        if self.llm_ended_at is not None:
+            observe_stage("llm", self.llm_ended_at - self.llm_started_at)
+        if self.first_token_at is None:
+            return
+        ttft = self.first_token_at - self.llm_started_at
+        LLM_TTFT_SECONDS.observe(ttft)
+        record_stage("llm_ttft", ttft)
+        COMPLETION_TOKENS.inc(self.tokens)
+        generation_seconds = self.last_token_at - self.first_token_at
+        if self.tokens > 1 and generation_seconds > 0:
+            LLM_TOKENS_PER_SECOND.observe((self.tokens - 1) / generation_seconds)
+
+def _count_prompt_tokens(
+    template: str, question: str, documents: list[Document]
+) -> None:
+    PROMPT_TOKENS.inc(
+        estimate_tokens(template) + estimate_tokens(question)
+        + sum(estimate_tokens(doc.page_content) for doc in documents)
+    )
+
+# --- 异步获取答案 ---
 async def get_answer_from_rag(
     question: str, 
-    retriever: BaseRetriever, 
-    llm_api_key: SecretStr, 
-    llm_base_url: str, 
-    llm_model: str
+    retrieval: RetrievalResult, 
+    llm_pool: LLMClientPool,
 ) -> dict:
-    llm = ChatOpenAI(
-        api_key=llm_api_key,
-        base_url=llm_base_url,
-        model=llm_model
-    )
-    rag_chain = _create_rag_chain(llm, retriever)
-    print(f"正在对问题进行查询: {question}")
-    result = await rag_chain.ainvoke({"input": question})
-    print("查询完成。")
+    documents = retrieval.documents
+    cached_tokens = None
+    if settings.ENABLE_CACHE:
+        cached_tokens = ANSWER_CACHE.lookup(
+            "qa", retrieval.collection_names, question,
+            retrieval.query_embedding, documents,
+        )
+
+    if cached_tokens is not None:
+        logger.debug("answer_cache.hit", extra={"mode": "query"})
+        answer = "".join(cached_tokens)
+    else:
+        qa_chain = _get_qa_chain(llm_pool)
+        timings = _LLMTimings()
+        _count_prompt_tokens(QA_TEMPLATE, question, documents)
+        async with llm_pool.slot():
+            answer = await qa_chain.ainvoke(
+                {"input": question, "context": documents},
+                config={"callbacks": [timings]},
+            )
+        timings.observe()
+        logger.debug(
+            "answer.generated",
+            extra={"documents": len(documents), "answer_chars": len(answer)},
+        )
+        if settings.ENABLE_CACHE:
+            ANSWER_CACHE.store(
+                "qa", retrieval.collection_names, question,
+                retrieval.query_embedding, documents, [answer],
+            )
     source_documents = [
         SourceDocument(page_content=doc.page_content, metadata=doc.metadata)
-        for doc in result.get("context", [])
+        for doc in documents
     ]
     return {
-        "answer": result.get("answer", ""),
-        "source_documents": source_documents
+        "answer": answer,
+        "source_documents": source_documents,
+        "retrieval_report": retrieval.report.as_dict(),
     }
 
 # --- 流式获取答案 ---
 async def stream_rag_answer(
     question: str,
-    retriever: BaseRetriever,
-    llm_api_key: SecretStr,
-    llm_base_url: str,
-    llm_model: str
+    retrieval: RetrievalResult,
+    llm_pool: LLMClientPool,
+    on_complete: Optional[Callable[[str], None]] = None,
 ):
-    print("--- DEBUG 1: 进入 stream_rag_answer 函数 ---")
-    print("--- DEBUG 2: 开始同步检索文档... ---")
-    
-    # 使用同步的 invoke 方法替代有问题的 ainvoke
-    docs = retriever.invoke(question)
-    
-    print(f"--- DEBUG 3: 检索到 {len(docs)} 篇文档。 ---")
-
-    if not docs:
-        print("--- DEBUG 4: 未找到文档，提前返回。 ---")
-        yield "在您的个人知识库和全局知识库中，均未找到与问题相关的文档。请尝试上传文档或更换提问方式。"
-        return
-    
-    callback = AsyncIteratorCallbackHandler()
-    llm = ChatOpenAI(
-        api_key=llm_api_key, 
-        base_url=llm_base_url,
-        model=llm_model,
-        streaming=True,
-        callbacks=[callback],
-    )
-    
-    # 我们需要一个新的 chain 来处理已经检索到的文档
-    # 而不是让 chain 再次去检索
-    template = """
-    请结合下面提供的上下文来回答问题。你应该优先使用上下文中的信息来形成答案。
-    如果上下文中没有足够的信息，你可以结合自己的知识进行补充回答。
-    如果上下文与问题完全无关，再回答“根据我所掌握的文档，无法回答这个问题”。
-    请用中文进行回答。
+    """
+    流式输出 (事件类型, 内容)：答案的每个 token 为 ("token", 文本)，
+    之后是 ("sources", [来源文档元数据])；生成中断时以 ("error", 提示) 结束，
+    不再输出来源文档。由 sse_service.encode_events 编码为 SSE。
+    答案完整生成后以完整答案调用一次 on_complete（例如保存问答历史），
+    生成失败或客户端中途断开时不调用。总时长按结果（llm / cached / no_documents /
+    failed / aborted）记录到 rag_stream_duration_seconds。
+    """
+    start = time.perf_counter()
+    outcome = "aborted"  # 客户端中途断开时生成器在 yield 处被关闭，保持该值
+    try:
+        docs = retrieval.documents
+        if not docs:
+            logger.debug("stream.no_documents")
+            answer = (
+                "在您的个人知识库和全局知识库中，均未找到与问题相关的文档。"
+                "请尝试上传文档或更换提问方式。"
+            )
+            yield "token", answer
+            if on_complete is not None:
+                on_complete(answer)
+            yield "sources", []
+            outcome = "no_documents"
+            return
 
-    上下文: {context}
+        cached_tokens = None
+        if settings.ENABLE_CACHE:
+            cached_tokens = ANSWER_CACHE.lookup(
+                "stream", retrieval.collection_names, question,
+                retrieval.query_embedding, docs,
+            )
 
-    问题: {input}
+        if cached_tokens is not None:
+            # 命中缓存：按原样回放 token，然后照常输出来源文档
+            logger.debug("answer_cache.hit", extra={"mode": "stream"})
+            for token in cached_tokens:
+                yield "token", token
+            if on_complete is not None:
+                on_complete("".join(cached_tokens))
+            result = "cached"
+        else:
+            from langchain.callbacks.streaming_aiter import AsyncIteratorCallbackHandler
 
-    回答:
-    """
-    prompt = PromptTemplate.from_template(template)
-    qa_chain = create_stuff_documents_chain(llm, prompt)
-    
-    print("--- DEBUG 5: 正在为 QA 链创建异步任务... ---")
-    
-    # 直接将同步获取的文档和问题传递给问答链
-    task = asyncio.create_task(
-        qa_chain.ainvoke({"input": question, "context": docs})
-    )
+            # 每个请求只创建自己的回调，LLM 客户端和问答链都是共享的
+            callback = AsyncIteratorCallbackHandler()
+            timings = _LLMTimings()
+            qa_chain = _get_stream_qa_chain(llm_pool)
+            streamed_tokens = []
+            stream_failed = False
+            _count_prompt_tokens(STREAM_QA_TEMPLATE, question, docs)
 
-    try:
-        print("--- DEBUG 6: 即将开始遍历回调的 token... ---")
-        async for token in callback.aiter():
-            yield token
-    except Exception as e:
-        print(f"--- DEBUG 9: 在流式处理中发生异常: {e} ---")
+            async with llm_pool.slot():
+                # 直接将检索到的文档和问题传递给问答链
+                task = asyncio.create_task(qa_chain.ainvoke(
+                    {"input": question, "context": docs},
+                    config={"callbacks": [callback, timings]},
+                ))
+
+                try:
+                    async for token in callback.aiter():
+                        streamed_tokens.append(token)
+                        yield "token", token
+                except Exception as e:
+                    stream_failed = True
+                    logger.warning("stream.failed", extra={"error": repr(e)})
+                except (asyncio.CancelledError, GeneratorExit):
+                    # 客户端断开：立即取消上游调用，释放并发名额和连接，
+                    # 而不是等答案生成完
+                    task.cancel()
+                    raise
+                finally:
+                    # 等待任务完成以确保没有未捕获的异常（已取消的任务不再抛出取消异常）
+                    with contextlib.suppress(asyncio.CancelledError):
+                        await task
+
+            timings.observe()
+            logger.debug(
+                "answer.generated",
+                extra={"documents": len(docs), "tokens": len(streamed_tokens)},
+            )
+            # 只缓存完整生成的答案
+            if settings.ENABLE_CACHE and not stream_failed and streamed_tokens:
+                ANSWER_CACHE.store(
+                    "stream", retrieval.collection_names, question,
+                    retrieval.query_embedding, docs, streamed_tokens,
+                )
+            if on_complete is not None and not stream_failed:
+                on_complete("".join(streamed_tokens))
+            if stream_failed:
+                outcome = "failed"
+                yield "error", "答案生成中断，请重试。"
+                return
+            result = "llm"
+
+        yield "sources", [doc.metadata for doc in docs]
+        outcome = result
+    except Exception:
+        outcome = "failed"
+        raise
     finally:
-        print("--- DEBUG 10: 进入 finally 块，等待任务完成... ---")
-        # 等待任务完成以确保没有未捕获的异常
-        await task
-        print("--- DEBUG 11: 任务完成，开始处理来源文档。 ---")
-
-        if docs:
-            print("--- DEBUG 12: 正在 yield 来源文档。 ---")
-            yield "\n\n---SOURCES---\n"
-            for doc in docs:
-                yield json.dumps(doc.metadata) + "\n"
-    print("--- DEBUG 13: 退出 stream_rag_answer 函数。 ---")
\ No newline at end of file
+        seconds = time.perf_counter() - start
+        STREAM_SECONDS.labels(outcome).observe(seconds)
+        record_stage("stream_total", seconds)
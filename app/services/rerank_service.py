@@ -0,0 +1,119 @@
+# app/services/rerank_service.py
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.services.answer_cache import normalize_question
+from app.services.context_service import ScoredDocument, content_hash
+
+logger = logging.getLogger(__name__)
+
+# 打分函数：输入问题和一批文本，返回与文本一一对应的相关性分数
+Scorer = Callable[[str, list[str]], list[float]]
+
+# 进程级交叉编码器注册表，键为 (模型名称, 设备)
+_MODELS: dict[tuple[str, str], object] = {}
+_LOCK = threading.Lock()
+
+# 重排序是 CPU 密集型的批量前向计算，单线程串行执行，避免多个批次争抢 CPU
+_RERANK_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+
+# (模型, 规范化后的问题, 文本块内容哈希) -> 分数；同一模型对同一对输入的分数不会变化
+SCORE_CACHE = TTLCache(maxsize=settings.RERANK_CACHE_SIZE, ttl=float("inf"))
+
+_stats = {"batches": 0, "pairs_scored": 0, "cache_hits": 0, "seconds": 0.0}
+
+
+def get_cross_encoder(model_name: str, device: Optional[str] = None):
+    """获取共享的交叉编码器，同一进程内相同 (模型名称, 设备) 只加载一次"""
+    key = (model_name, device or settings.RERANK_DEVICE)
+    model = _MODELS.get(key)
+    if model is None:
+        with _LOCK:
+            model = _MODELS.get(key)
+            if model is None:
+                from sentence_transformers import CrossEncoder
+
+                logger.info(
+                    "rerank.model_loading", extra={"model": key[0], "device": key[1]}
+                )
+                model = CrossEncoder(
+                    key[0], device=key[1], max_length=settings.RERANK_MAX_LENGTH
+                )
+                _MODELS[key] = model
+    return model
+
+
+def cross_encoder_scorer(
+    model_name: str,
+    device: Optional[str] = None,
+    batch_size: Optional[int] = None,
+) -> Scorer:
+    """使用交叉编码器对 (问题, 文本) 对打分，一批候选在一次 predict 调用中完成"""
+    def score(question: str, texts: list[str]) -> list[float]:
+        model = get_cross_encoder(model_name, device)
+        scores = model.predict(
+            [(question, text) for text in texts],
+            batch_size=batch_size or settings.RERANK_BATCH_SIZE,
+            show_progress_bar=False,
+        )
+        return [float(s) for s in scores]
+    return score
+
+
+async def arerank(
+    question: str,
+    candidates: list[ScoredDocument],
+    scorer: Optional[Scorer] = None,
+    model_name: Optional[str] = None,
+) -> list[ScoredDocument]:
+    """
+    用重排序模型给候选文本块重新打分，按新分数从高到低返回。
+    已缓存分数的 (问题, 文本块) 不再计算，其余的合并成一批在线程池中打分。
+    """
+    model_name = model_name or settings.RERANK_MODEL_NAME
+    scorer = scorer or cross_encoder_scorer(model_name)
+    normalized = normalize_question(question)
+    keys = [(model_name, normalized, content_hash(doc)) for doc, _ in candidates]
+
+    scores: dict[tuple, float] = {}
+    missing: dict[tuple, str] = {}
+    for key, (doc, _) in zip(keys, candidates):
+        cached = SCORE_CACHE.get(key)
+        if cached is not None:
+            scores[key] = cached
+        else:
+            missing.setdefault(key, doc.page_content)
+    _stats["cache_hits"] += len(candidates) - len(missing)
+
+    if missing:
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        new_scores = await loop.run_in_executor(
+            _RERANK_EXECUTOR, scorer, question, list(missing.values())
+        )
+        _stats["seconds"] += time.perf_counter() - start
+        _stats["batches"] += 1
+        _stats["pairs_scored"] += len(missing)
+        for key, score in zip(missing, new_scores):
+            SCORE_CACHE.set(key, score)
+            scores[key] = score
+
+    reranked = [(doc, scores[key]) for key, (doc, _) in zip(keys, candidates)]
+    reranked.sort(key=lambda item: item[1], reverse=True)
+    return reranked
+
+
+def get_rerank_stats() -> dict:
+    return {
+        "enabled": settings.RERANK_ENABLED,
+        "model": settings.RERANK_MODEL_NAME,
+        "loaded_models": [f"{name}@{device}" for name, device in _MODELS],
+        **_stats,
+        "score_cache": SCORE_CACHE.stats(),
+    }
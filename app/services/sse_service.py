@@ -0,0 +1,177 @@
+# app/services/sse_service.py
+"""
+把流式问答的事件编码为 Server-Sent Events：
+
+    event: token
+    data: {"type": "token", "content": "操作系统是"}
+
+事件类型为 token、sources、done、error；长时间没有输出时发送 ": ping" 注释行作为心跳，
+避免代理或负载均衡器断开空闲连接。
+
+LLM 每个 token 单独写出会让每个 token 都产生一次响应写入和一个 HTTP 分块。
+这里按时间窗口合并 token：首个 token 立即发送；之后的 token 在上次发送后的窗口内
+到达时先缓冲，窗口结束时合并成一个事件发送。
+窗口从 STREAM_COALESCE_MIN_MS 开始、每次发送后翻倍，直到 STREAM_COALESCE_MAX_MS，
+开头的几个 token 仍能很快到达客户端，之后的写入次数大幅减少；
+缓冲的文本达到 STREAM_COALESCE_MAX_BYTES 时立即发送。
+"""
+import asyncio
+import json
+import logging
+from typing import AsyncIterator, Optional
+
+from app.core.config import settings
+from app.core.metrics import SSE_EVENTS, SSE_TOKENS
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT = ": ping\n\n"
+ERROR_MESSAGE = "答案生成失败，请稍后重试。"
+
+_stats = {"streams": 0, "tokens": 0, "token_events": 0, "heartbeats": 0, "errors": 0}
+_event_counters = {
+    event: SSE_EVENTS.labels(event)
+    for event in ("token", "sources", "done", "error", "heartbeat")
+}
+
+
+def format_event(event: str, content=None) -> str:
+    payload = {"type": event}
+    if content is not None:
+        payload["content"] = content
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+def _consume_result(task: asyncio.Task) -> None:
+    # 被放弃的读取任务结束时取出其异常，避免 "exception was never retrieved" 警告
+    if not task.cancelled():
+        task.exception()
+
+
+async def encode_events(
+    events: AsyncIterator[tuple[str, object]],
+    min_window_ms: Optional[float] = None,
+    max_window_ms: Optional[float] = None,
+    max_bytes: Optional[int] = None,
+    heartbeat_seconds: Optional[float] = None,
+) -> AsyncIterator[str]:
+    """
+    把 (事件类型, 内容) 序列编码为 SSE 文本，合并相邻的 token 事件，空闲时发送心跳。
+    事件序列正常结束后追加 done 事件；
+    序列中出现 error 事件或抛出异常时以 error 事件结束。
+    未指定的参数使用配置中的值；max_window_ms 为 0 时不合并，每个 token 单独发送。
+    """
+    if min_window_ms is None:
+        min_window_ms = settings.STREAM_COALESCE_MIN_MS
+    if max_window_ms is None:
+        max_window_ms = settings.STREAM_COALESCE_MAX_MS
+    if max_bytes is None:
+        max_bytes = settings.STREAM_COALESCE_MAX_BYTES
+    if heartbeat_seconds is None:
+        heartbeat_seconds = settings.STREAM_HEARTBEAT_SECONDS
+    min_window = min_window_ms / 1000
+    max_window = max_window_ms / 1000
+
+    loop = asyncio.get_running_loop()
+    iterator = events.__aiter__()
+    window = min(min_window, max_window)
+    buffer: list[str] = []
+    buffered_bytes = 0
+    flush_at: Optional[float] = None  # 缓冲的 token 最晚的发送时间
+    last_token_write = float("-inf")
+    last_write = loop.time()
+    next_event: Optional[asyncio.Future] = None
+    _stats["streams"] += 1
+
+    def flush() -> str:
+        nonlocal buffered_bytes, flush_at, window, last_token_write, last_write
+        text = "".join(buffer)
+        buffer.clear()
+        buffered_bytes, flush_at = 0, None
+        # 首个 token 单独发送，之后的窗口才开始扩大
+        if last_token_write != float("-inf"):
+            window = min(window * 2, max_window)
+        last_token_write = last_write = loop.time()
+        _stats["token_events"] += 1
+        _event_counters["token"].inc()
+        return format_event("token", text)
+
+    try:
+        while True:
+            # 读取下一个事件的任务在等待超时后保留，下一轮继续等待，不会中断问答链
+            if next_event is None:
+                next_event = asyncio.ensure_future(iterator.__anext__())
+            deadline = flush_at if buffer else last_write + heartbeat_seconds
+            timeout = deadline - loop.time()
+            if timeout > 0:
+                await asyncio.wait((next_event,), timeout=timeout)
+            if not next_event.done():
+                if buffer:
+                    yield flush()
+                else:
+                    last_write = loop.time()
+                    _stats["heartbeats"] += 1
+                    _event_counters["heartbeat"].inc()
+                    yield HEARTBEAT
+                continue
+
+            task, next_event = next_event, None
+            try:
+                event, content = task.result()
+            except StopAsyncIteration:
+                break
+
+            if event == "token":
+                if not content:
+                    continue
+                _stats["tokens"] += 1
+                SSE_TOKENS.inc()
+                buffer.append(content)
+                buffered_bytes += len(content.encode("utf-8"))
+                if flush_at is None:
+                    flush_at = last_token_write + window
+                if buffered_bytes >= max_bytes or loop.time() >= flush_at:
+                    yield flush()
+                continue
+
+            if buffer:
+                yield flush()
+            last_write = loop.time()
+            _event_counters[event].inc()
+            if event == "error":
+                _stats["errors"] += 1
+                yield format_event("error", content)
+                return
+            yield format_event(event, content)
+    except Exception:
+        logger.exception("stream.failed")
+        _stats["errors"] += 1
+        _event_counters["error"].inc()
+        if buffer:
+            yield flush()
+        yield format_event("error", ERROR_MESSAGE)
+        return
+    finally:
+        # 客户端断开时关闭事件源：正在读取时取消这次读取，
+        # 否则关闭停在 yield 处的生成器；stream_rag_answer 随之取消上游 LLM 调用
+        # 并释放并发名额（正常结束时事件源已耗尽，两者都不做任何事）
+        if next_event is not None:
+            next_event.add_done_callback(_consume_result)
+            next_event.cancel()
+        elif hasattr(iterator, "aclose"):
+            await iterator.aclose()
+
+    if buffer:
+        yield flush()
+    _event_counters["done"].inc()
+    yield format_event("done")
+
+
+def get_stream_stats() -> dict:
+    token_events = _stats["token_events"]
+    return {
+        **_stats,
+        "tokens_per_event": (
+            round(_stats["tokens"] / token_events, 2) if token_events else 0.0
+        ),
+    }
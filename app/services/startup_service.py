@@ -0,0 +1,216 @@
+# app/services/startup_service.py
+"""
+应用启动预热：在后台依次加载嵌入模型、预热一次向量化、连接数据库、预热全局集合的检索，
+记录每个阶段的耗时。全部必需阶段完成前 /readyz 返回 503，/healthz 始终返回 200。
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.services import llm_service
+
+logger = logging.getLogger(__name__)
+
+_WARMUP_TEXT = "预热"
+
+
+@dataclass
+class StartupPhase:
+    name: str
+    run: Callable[[], Awaitable[Optional[str]]]  # 返回值作为阶段说明，例如跳过的原因
+    required: bool = True  # 必需阶段失败时服务保持未就绪，并定期重试
+    # 后台阶段在服务就绪之后才执行，不影响就绪（用于可能耗时很长的维护工作）
+    background: bool = False
+    status: str = "pending"  # pending / running / ok / failed
+    seconds: float = 0.0
+    attempts: int = 0
+    detail: Optional[str] = None
+
+    def as_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "status": self.status,
+            "required": self.required,
+            "background": self.background,
+            "seconds": round(self.seconds, 3),
+            "attempts": self.attempts,
+            "detail": self.detail,
+        }
+
+
+class StartupState:
+    """记录启动预热的进度，供就绪探针和 /stats 查询"""
+
+    def __init__(self):
+        self.phases: list[StartupPhase] = []
+        self.started_at: Optional[float] = None
+        self.ready_after: Optional[float] = None  # 从开始预热到就绪的秒数
+
+    @property
+    def ready(self) -> bool:
+        return self.started_at is not None and all(
+            p.status == "ok" for p in self.phases if p.required and not p.background
+        )
+
+    async def run_phase(self, phase: StartupPhase) -> None:
+        phase.status = "running"
+        phase.attempts += 1
+        start = time.perf_counter()
+        try:
+            phase.detail = await phase.run()
+            phase.status = "ok"
+        except Exception as e:
+            phase.status = "failed"
+            phase.detail = f"{type(e).__name__}: {e}"
+        phase.seconds = time.perf_counter() - start
+        logger.info("startup.phase", extra={
+            "phase": phase.name,
+            "status": phase.status,
+            "seconds": round(phase.seconds, 3),
+            "detail": phase.detail,
+        })
+
+    async def run(self, phases: list[StartupPhase], retry_seconds: float) -> None:
+        """
+        依次执行各阶段；必需阶段失败时每隔 retry_seconds 重试失败的阶段，直到全部成功。
+        服务就绪后再依次执行后台阶段，后台阶段只执行一次。
+        """
+        self.phases = phases
+        self.started_at = time.perf_counter()
+        foreground = [phase for phase in phases if not phase.background]
+        for phase in foreground:
+            await self.run_phase(phase)
+        while not self.ready:
+            await asyncio.sleep(retry_seconds)
+            for phase in foreground:
+                if phase.required and phase.status == "failed":
+                    await self.run_phase(phase)
+        self.ready_after = time.perf_counter() - self.started_at
+        logger.info("startup.ready", extra={"seconds": round(self.ready_after, 3)})
+        for phase in phases:
+            if phase.background:
+                await self.run_phase(phase)
+
+    def as_dict(self) -> dict:
+        ready_after = None
+        if self.ready_after is not None:
+            ready_after = round(self.ready_after, 3)
+        return {
+            "ready": self.ready,
+            "ready_after_seconds": ready_after,
+            "phases": [phase.as_dict() for phase in self.phases],
+        }
+
+
+STARTUP = StartupState()
+
+
+def default_phases(engine: Engine) -> list[StartupPhase]:
+    """按当前配置组装启动阶段；auth 配置只检查数据库，不导入任何模型相关的模块"""
+
+    async def database():
+        from app.db.session import async_engine
+
+        def ping():
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+        await asyncio.to_thread(ping)
+        # 认证等请求路径使用异步引擎，同时建立它的第一个连接
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    if settings.APP_PROFILE == "auth":
+        return [StartupPhase("database", database)]
+
+    from app.services import (
+        embedding_service,
+        rag_service,
+        rerank_service,
+        vector_index_service,
+    )
+    from app.services.vector_stores import get_vector_store_backend
+    from app.services.vector_stores.global_index import global_index_backend_for
+
+    model_name = settings.EMBEDDING_MODEL_NAME
+    warmup_embedding: list[float] = []
+
+    async def llm_pool():
+        pool = llm_service.init_llm_pool()
+        if pool is None:
+            return "未配置 DEEPSEEK_API_KEY，已跳过"
+        # 问答链（及 langchain 的相关模块）在这里构建，而不是在第一个问题到来时
+        rag_service._get_qa_chain(pool)
+        rag_service._get_stream_qa_chain(pool)
+
+    async def embedding_model():
+        await asyncio.to_thread(embedding_service.get_embeddings, model_name)
+
+    async def embedding_warmup():
+        # 走查询向量化的完整路径，线程池和模型的首次前向计算都在这里完成
+        warmup_embedding[:] = await embedding_service.aembed_query(
+            _WARMUP_TEXT, model_name
+        )
+
+    async def vector_index():
+        if (
+            settings.VECTOR_STORE_TYPE != "pgvector"
+            or not settings.VECTOR_INDEX_AUTO_MAINTAIN
+        ):
+            return "未启用"
+        await asyncio.to_thread(vector_index_service.startup_check, engine)
+
+    async def global_retriever():
+        # 对全局集合执行一次检索：建立向量存储的连接池或打开导出的索引，
+        # 并把索引页读入缓存
+        if not warmup_embedding:
+            raise RuntimeError("预热向量尚未计算")
+        backend = (
+            global_index_backend_for(settings.COLLECTION_NAME, model_name)
+            or get_vector_store_backend()
+        )
+        results = await backend.asearch(
+            settings.COLLECTION_NAME, warmup_embedding, k=1
+        )
+        return f"{backend.name}，{len(results)} 条结果"
+
+    async def rerank_model():
+        scorer = rerank_service.cross_encoder_scorer(settings.RERANK_MODEL_NAME)
+        await asyncio.to_thread(scorer, _WARMUP_TEXT, [_WARMUP_TEXT])
+
+    # 配置了密钥时问答接口依赖客户端池，池不可用时服务不应报告就绪
+    llm_required = bool(settings.DEEPSEEK_API_KEY.get_secret_value())
+    phases = [
+        StartupPhase("llm_pool", llm_pool, required=llm_required),
+        StartupPhase("embedding_model", embedding_model),
+        StartupPhase("embedding_warmup", embedding_warmup),
+        StartupPhase("database", database),
+        StartupPhase("global_retriever", global_retriever),
+    ]
+    if settings.RERANK_ENABLED:
+        phases.append(StartupPhase("rerank_model", rerank_model))
+    # 索引缺失或需要重建时可能要在大表上执行很久的 CREATE INDEX CONCURRENTLY，
+    # 放到就绪之后进行，期间检索照常可用（只是没有索引时较慢）
+    phases.append(
+        StartupPhase("vector_index", vector_index, required=False, background=True)
+    )
+    return phases
+
+
+def start_warmup(engine: Engine) -> Optional[asyncio.Task]:
+    """在后台启动预热任务（由应用 lifespan 调用），不阻塞服务开始接受请求"""
+    if not settings.STARTUP_WARMUP_ENABLED:
+        # 不预热时各组件在首次请求时惰性初始化，服务立即就绪
+        if settings.APP_PROFILE == "full":
+            llm_service.init_llm_pool()
+        STARTUP.started_at = time.perf_counter()
+        STARTUP.ready_after = 0.0
+        return None
+    return asyncio.create_task(
+        STARTUP.run(default_phases(engine), settings.STARTUP_RETRY_SECONDS)
+    )
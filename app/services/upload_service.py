@@ -0,0 +1,185 @@
+# app/services/upload_service.py
+import hashlib
+import os
+import uuid
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ModuleNotFoundError:  # 旧版本 python-multipart 的包名
+    from multipart.multipart import MultipartParser, parse_options_header
+
+# multipart 边界、表单头等额外开销的上限，用于根据 Content-Length 提前拒绝
+_MULTIPART_OVERHEAD_BYTES = 16 * 1024
+_PDF_MAGIC = b"%PDF-"
+
+
+class UploadTooLargeError(Exception):
+    """上传的文件超过大小限制"""
+
+
+class InvalidUploadError(Exception):
+    """请求不是合法的 PDF 上传"""
+
+
+@dataclass
+class SavedUpload:
+    filename: str
+    path: str
+    size: int
+    sha256: str
+
+
+class _PartState:
+    """multipart 解析回调的状态：当前表单项的头部以及待写入的文件数据"""
+
+    def __init__(self, field_name: str):
+        self.field_name = field_name
+        self.header_field = b""
+        self.header_value = b""
+        self.headers: dict[bytes, bytes] = {}
+        self.in_file = False
+        self.filename: Optional[str] = None
+        self.content_type: Optional[str] = None
+        self.pending: list[bytes] = []
+        self.finished = False
+
+    def on_part_begin(self) -> None:
+        self.headers = {}
+        self.in_file = False
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self.header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self.header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self.headers[self.header_field.lower()] = self.header_value
+        self.header_field = b""
+        self.header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(
+            self.headers.get(b"content-disposition", b"")
+        )
+        name = options.get(b"name", b"").decode("utf-8", "replace")
+        if name != self.field_name or b"filename" not in options:
+            return
+        if self.filename is not None:
+            raise InvalidUploadError("一次只能上传一个文件。")
+        self.in_file = True
+        filename = options[b"filename"].decode("utf-8", "replace")
+        self.filename = os.path.basename(filename) or "upload.pdf"
+        content_type = self.headers.get(b"content-type", b"")
+        self.content_type = content_type.decode("latin-1").strip()
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self.in_file:
+            self.pending.append(data[start:end])
+
+    def on_part_end(self) -> None:
+        if self.in_file:
+            self.in_file = False
+            self.finished = True
+
+
+def _feed(parser: MultipartParser, chunk: Optional[bytes]) -> None:
+    """
+    向解析器写入数据（chunk 为 None 时结束解析），
+    格式错误统一转换为 InvalidUploadError
+    """
+    try:
+        if chunk is None:
+            parser.finalize()
+        else:
+            parser.write(chunk)
+    except ValueError as e:
+        raise InvalidUploadError(f"请求体格式错误: {e}") from e
+
+
+async def save_pdf_upload(
+    headers,
+    body: AsyncIterator[bytes],
+    dest_dir: str,
+    max_bytes: int,
+    field_name: str = "file",
+) -> SavedUpload:
+    """
+    流式解析 multipart 请求体，把 PDF 分块写入 dest_dir，
+    整个过程不在内存中保留完整文件。
+    - Content-Length 超过上限时在读取请求体之前就拒绝；
+    - 写入过程中累计字节数，超过上限立即中止并删除已写入的部分；
+    - 边写入边计算 SHA-256，供后续去重使用；
+    - 文件写完后才原子地改名为最终文件，worker 不会读到写了一半的文件。
+    """
+    too_large = f"文件大小超过上限 {max_bytes // (1024 * 1024)} MB。"
+    content_length = headers.get("content-length")
+    if (
+        content_length
+        and content_length.isdigit()
+        and int(content_length) > max_bytes + _MULTIPART_OVERHEAD_BYTES
+    ):
+        raise UploadTooLargeError(too_large)
+
+    content_type, options = parse_options_header(headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in options:
+        raise InvalidUploadError("请求必须是 multipart/form-data 格式。")
+
+    state = _PartState(field_name)
+    parser = MultipartParser(options[b"boundary"], callbacks={
+        "on_part_begin": state.on_part_begin,
+        "on_header_field": state.on_header_field,
+        "on_header_value": state.on_header_value,
+        "on_header_end": state.on_header_end,
+        "on_headers_finished": state.on_headers_finished,
+        "on_part_data": state.on_part_data,
+        "on_part_end": state.on_part_end,
+    })
+
+    os.makedirs(dest_dir, exist_ok=True)
+    final_path = os.path.join(dest_dir, f"{uuid.uuid4().hex}.pdf")
+    part_path = final_path + ".part"
+    digest = hashlib.sha256()
+    size = 0
+    f = None
+    try:
+        async for chunk in body:
+            _feed(parser, chunk)
+            if not state.pending:
+                continue
+            data = b"".join(state.pending)
+            state.pending.clear()
+            if size == 0:
+                if state.content_type and state.content_type != "application/pdf":
+                    raise InvalidUploadError("只能上传 PDF 文件。")
+                if not data.startswith(_PDF_MAGIC[:len(data)]):
+                    raise InvalidUploadError("文件内容不是有效的 PDF。")
+                f = open(part_path, "wb")
+            size += len(data)
+            if size > max_bytes:
+                raise UploadTooLargeError(too_large)
+            digest.update(data)
+            await run_in_threadpool(f.write, data)
+        _feed(parser, None)
+
+        if not state.finished or f is None:
+            raise InvalidUploadError("请求中没有找到上传的文件。")
+        f.close()
+        os.replace(part_path, final_path)
+    except BaseException:
+        if f is not None:
+            f.close()
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+
+    return SavedUpload(
+        filename=state.filename,
+        path=final_path,
+        size=size,
+        sha256=digest.hexdigest(),
+    )
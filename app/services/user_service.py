@@ -1,8 +1,15 @@
 # app/services/user_service.py
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.models.user import User
 from app.schemas.user import UserCreate
-from app.core.password import get_password_hash, verify_password
+from app.core.password import (
+    aget_password_hash,
+    averify_password,
+    get_password_hash,
+    verify_password,
+)
 from typing import Optional
 
 def get_user_by_username(db: Session, username: str) -> Optional[User]:
@@ -33,6 +40,15 @@ def create_user(db: Session, user: UserCreate) -> User:
 
     return db_user
 
+def set_user_active(db: Session, user: User, is_active: bool) -> User:
+    """
+    启用或禁用用户。提交后本进程内的认证缓存立即失效（见 app.core.security）。
+    """
+    user.is_active = is_active
+    db.commit()
+    db.refresh(user)
+    return user
+
 def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
     """
     验证用户名和密码是否正确。
@@ -49,3 +65,37 @@ def authenticate_user(db: Session, username: str, password: str) -> Optional[Use
     # 验证通过，返回用户对象
     return user
 
+# --- 异步版本：供请求路径使用，数据库 I/O 走异步引擎，bcrypt 在专用线程池中执行 ---
+
+async def aget_user_by_username(db: AsyncSession, username: str) -> Optional[User]:
+    """
+    根据用户名从数据库中查询用户。
+    """
+    result = await db.execute(select(User).where(User.username == username))
+    return result.scalars().first()
+
+async def acreate_user(db: AsyncSession, user: UserCreate) -> User:
+    """
+    创建一个新用户并存入数据库。
+    """
+    db_user = User(
+        username=user.username,
+        hashed_password=await aget_password_hash(user.password)
+    )
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    return db_user
+
+async def aauthenticate_user(
+    db: AsyncSession, username: str, password: str
+) -> Optional[User]:
+    """
+    验证用户名和密码是否正确。
+    """
+    user = await aget_user_by_username(db, username=username)
+    if not user:
+        return None
+    if not await averify_password(password, user.hashed_password):
+        return None
+    return user
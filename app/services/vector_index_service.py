@@ -0,0 +1,343 @@
+# app/services/vector_index_service.py
+import json
+import logging
+import math
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Connection, Engine
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# langchain_postgres.PGVector 默认使用的表
+EMBEDDING_TABLE = "langchain_pg_embedding"
+INDEX_NAMES = {
+    "hnsw": f"ix_{EMBEDDING_TABLE}_hnsw",
+    "ivfflat": f"ix_{EMBEDDING_TABLE}_ivfflat",
+}
+# PGVector 默认使用余弦距离
+_OPERATOR_CLASS = "vector_cosine_ops"
+# 避免多个进程同时建索引
+_ADVISORY_LOCK_ID = 7303390115372544001
+
+
+@dataclass
+class SearchParams:
+    ef_search: Optional[int] = None  # HNSW 搜索时的候选集大小，越大召回越高、越慢
+    probes: Optional[int] = None  # IVFFlat 搜索时探查的聚类数
+
+
+_SEARCH_PARAMS: ContextVar[Optional[SearchParams]] = ContextVar(
+    "vector_search_params", default=None
+)
+
+
+@contextmanager
+def search_params(
+    ef_search: Optional[int] = None, probes: Optional[int] = None
+) -> Iterator[None]:
+    """在当前上下文中覆盖向量搜索参数（只影响本次请求发起的查询）"""
+    token = _SEARCH_PARAMS.set(SearchParams(ef_search=ef_search, probes=probes))
+    try:
+        yield
+    finally:
+        _SEARCH_PARAMS.reset(token)
+
+
+def _effective_search_params() -> dict[str, Optional[int]]:
+    override = _SEARCH_PARAMS.get() or SearchParams()
+    return {
+        "hnsw.ef_search": override.ef_search or settings.VECTOR_HNSW_EF_SEARCH,
+        "ivfflat.probes": override.probes or settings.VECTOR_IVFFLAT_PROBES,
+    }
+
+
+def _apply_search_params(dbapi_connection, connection_info: dict) -> None:
+    """连接从连接池取出时，按需设置或重置搜索参数；与连接上次的值相同时不发送任何语句"""
+    applied = connection_info.setdefault("vector_search_params", {})
+    statements = []
+    for name, value in _effective_search_params().items():
+        if applied.get(name) == value:
+            continue
+        if value is None:
+            statements.append(f"RESET {name}")
+        else:
+            statements.append(f"SET {name} = {int(value)}")
+        applied[name] = value
+    if statements:
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+
+def install_search_param_hook(engine: Engine) -> None:
+    """为向量检索所用的引擎注册连接取出事件（异步引擎请传入 engine.sync_engine）"""
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        _apply_search_params(dbapi_connection, connection_record.info)
+
+
+def _relation_exists(conn: Connection, name: str) -> bool:
+    return conn.execute(
+        text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name}
+    ).scalar()
+
+
+def _table_exists(conn: Connection) -> bool:
+    return _relation_exists(conn, EMBEDDING_TABLE)
+
+
+def _row_count(conn: Connection) -> int:
+    return conn.execute(text(f"SELECT count(*) FROM {EMBEDDING_TABLE}")).scalar()
+
+
+def ensure_fixed_dimension(conn: Connection) -> Optional[int]:
+    """
+    HNSW / IVFFlat 要求向量列有固定维度。
+    PGVector 默认建出的是不定长的 vector 列，这里按已有数据把列类型固定下来。
+    """
+    typmod = conn.execute(text(
+        "SELECT atttypmod FROM pg_attribute "
+        "WHERE attrelid = CAST(:table AS regclass) AND attname = 'embedding'"
+    ), {"table": EMBEDDING_TABLE}).scalar()
+    if typmod and typmod > 0:
+        return typmod
+
+    dimension = conn.execute(
+        text(f"SELECT vector_dims(embedding) FROM {EMBEDDING_TABLE} LIMIT 1")
+    ).scalar()
+    if dimension is None:
+        return None
+    logger.info(
+        "vector_index.fix_dimension",
+        extra={"table": EMBEDDING_TABLE, "dimension": dimension},
+    )
+    conn.execute(text(
+        f"ALTER TABLE {EMBEDDING_TABLE} "
+        f"ALTER COLUMN embedding TYPE vector({int(dimension)})"
+    ))
+    return dimension
+
+
+def default_ivfflat_lists(rows: int) -> int:
+    """pgvector 推荐值：100 万行以内取 行数/1000，更多时取 sqrt(行数)"""
+    if rows <= 1_000_000:
+        return max(rows // 1000, 1)
+    return int(math.sqrt(rows))
+
+
+def build_index_sql(
+    method: str,
+    m: int = 16,
+    ef_construction: int = 64,
+    lists: int = 100,
+    concurrently: bool = False,
+) -> str:
+    if method == "hnsw":
+        options = f"m = {int(m)}, ef_construction = {int(ef_construction)}"
+    elif method == "ivfflat":
+        options = f"lists = {int(lists)}"
+    else:
+        raise ValueError(f"不支持的索引类型: {method}")
+    create = "CREATE INDEX CONCURRENTLY" if concurrently else "CREATE INDEX"
+    return (
+        f"{create} IF NOT EXISTS {INDEX_NAMES[method]} "
+        f"ON {EMBEDDING_TABLE} USING {method} (embedding {_OPERATOR_CLASS}) "
+        f"WITH ({options})"
+    )
+
+
+def create_vector_index(
+    engine: Engine,
+    method: str = "hnsw",
+    m: int = 16,
+    ef_construction: int = 64,
+    lists: Optional[int] = None,
+    concurrently: bool = False,
+) -> Optional[dict]:
+    """
+    创建 HNSW 或 IVFFlat 索引，返回构建信息（耗时、行数、参数）。
+    构建信息以 JSON 写入索引注释，供 status 命令展示。
+    """
+    with engine.connect() as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": _ADVISORY_LOCK_ID})
+        try:
+            if not _table_exists(conn):
+                logger.warning(
+                    "vector_index.table_missing", extra={"table": EMBEDDING_TABLE}
+                )
+                return None
+            dimension = ensure_fixed_dimension(conn)
+            conn.commit()
+            if dimension is None:
+                logger.info(
+                    "vector_index.skipped_empty", extra={"table": EMBEDDING_TABLE}
+                )
+                return None
+
+            if _relation_exists(conn, INDEX_NAMES[method]):
+                logger.info("vector_index.exists", extra={"index": INDEX_NAMES[method]})
+                return None
+
+            rows = _row_count(conn)
+            # 结束当前事务，否则 CREATE INDEX CONCURRENTLY 会一直等待它的快照释放
+            conn.commit()
+            lists = lists or default_ivfflat_lists(rows)
+            sql = build_index_sql(
+                method,
+                m=m,
+                ef_construction=ef_construction,
+                lists=lists,
+                concurrently=concurrently,
+            )
+            logger.info("vector_index.build_started", extra={
+                "index": INDEX_NAMES[method],
+                "method": method,
+                "rows": rows,
+                "concurrently": concurrently,
+                "sql": sql,
+            })
+
+            start = time.perf_counter()
+            if concurrently:
+                # CREATE INDEX CONCURRENTLY 不能在事务中执行
+                autocommit = engine.connect().execution_options(
+                    isolation_level="AUTOCOMMIT"
+                )
+                with autocommit as autocommit_conn:
+                    autocommit_conn.execute(text(sql))
+            else:
+                conn.execute(text(sql))
+            build_seconds = time.perf_counter() - start
+
+            if method == "hnsw":
+                params = {"m": m, "ef_construction": ef_construction}
+            else:
+                params = {"lists": lists}
+            build_info = {
+                "method": method,
+                "rows": rows,
+                "dimension": dimension,
+                "build_seconds": round(build_seconds, 3),
+                "built_at": int(time.time()),
+                "params": params,
+            }
+            comment = json.dumps(build_info).replace("'", "''")
+            conn.execute(text(f"COMMENT ON INDEX {INDEX_NAMES[method]} IS '{comment}'"))
+            conn.commit()
+            logger.info("vector_index.build_finished", extra={
+                "index": INDEX_NAMES[method],
+                "rows": rows,
+                "build_seconds": round(build_seconds, 3),
+            })
+            return build_info
+        finally:
+            conn.execute(
+                text("SELECT pg_advisory_unlock(:id)"), {"id": _ADVISORY_LOCK_ID}
+            )
+            conn.commit()
+
+
+def drop_vector_index(engine: Engine, method: str) -> None:
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP INDEX IF EXISTS {INDEX_NAMES[method]}"))
+
+
+def get_index_status(engine: Engine) -> dict:
+    """返回表的行数以及每个向量索引的类型、大小和构建信息"""
+    with engine.connect() as conn:
+        if not _table_exists(conn):
+            return {"table_exists": False, "rows": 0, "indexes": []}
+        rows = conn.execute(text(
+            "SELECT i.relname AS name, am.amname AS method, "
+            "pg_relation_size(i.oid) AS size_bytes, "
+            "obj_description(i.oid, 'pg_class') AS comment "
+            "FROM pg_index x "
+            "JOIN pg_class i ON i.oid = x.indexrelid "
+            "JOIN pg_am am ON am.oid = i.relam "
+            "WHERE x.indrelid = CAST(:table AS regclass) "
+            "AND am.amname IN ('hnsw', 'ivfflat')"
+        ), {"table": EMBEDDING_TABLE}).mappings().all()
+        indexes = []
+        for row in rows:
+            try:
+                build_info = json.loads(row["comment"]) if row["comment"] else {}
+            except ValueError:
+                build_info = {}
+            indexes.append({
+                "name": row["name"],
+                "method": row["method"],
+                "size_bytes": row["size_bytes"],
+                "build": build_info,
+            })
+        return {
+            "table_exists": True,
+            "rows": _row_count(conn),
+            "table_size_bytes": conn.execute(
+                text("SELECT pg_total_relation_size(CAST(:table AS regclass))"),
+                {"table": EMBEDDING_TABLE},
+            ).scalar(),
+            "indexes": indexes,
+        }
+
+
+def maintain_vector_index(
+    engine: Engine, method: Optional[str] = None
+) -> Optional[dict]:
+    """
+    确保配置的索引存在；IVFFlat 的聚类中心在建索引时确定，
+    行数相比构建时变化超过 VECTOR_INDEX_REBUILD_FACTOR 倍后重建，以免召回率下降。
+    """
+    method = method or settings.VECTOR_INDEX_METHOD
+    if method == "none":
+        return None
+    status = get_index_status(engine)
+    if not status["table_exists"]:
+        return None
+
+    current = next(
+        (i for i in status["indexes"] if i["name"] == INDEX_NAMES[method]), None
+    )
+    if current is None:
+        return create_vector_index(
+            engine,
+            method=method,
+            m=settings.VECTOR_HNSW_M,
+            ef_construction=settings.VECTOR_HNSW_EF_CONSTRUCTION,
+            concurrently=True,
+        )
+
+    built_rows = current["build"].get("rows")
+    if method == "ivfflat" and built_rows:
+        growth = status["rows"] / max(built_rows, 1)
+        factor = settings.VECTOR_INDEX_REBUILD_FACTOR
+        if growth >= factor or growth <= 1 / factor:
+            logger.info("vector_index.rebuild", extra={
+                "index": INDEX_NAMES[method],
+                "built_rows": built_rows,
+                "rows": status["rows"],
+                "factor": factor,
+            })
+            drop_vector_index(engine, method)
+            return create_vector_index(engine, method=method, concurrently=True)
+    return current["build"]
+
+
+def startup_check(engine: Engine) -> None:
+    """应用启动时检查并维护向量索引；数据库不可用时只记录警告，不阻止启动"""
+    try:
+        build_info = maintain_vector_index(engine)
+    except Exception as e:
+        logger.warning("vector_index.check_failed", extra={"error": repr(e)})
+        return
+    if build_info:
+        logger.info("vector_index.ready", extra={"build": build_info})
@@ -0,0 +1,47 @@
+# app/services/vector_stores/__init__.py
+from functools import lru_cache
+from typing import Optional
+
+from app.core.config import settings
+
+from .base import ManifestEntry, ScoredDocument, VectorStoreBackend
+
+VECTOR_STORE_TYPES = ("pgvector", "faiss", "chromadb")
+
+
+@lru_cache(maxsize=None)
+def get_vector_store_backend(store_type: Optional[str] = None) -> VectorStoreBackend:
+    """
+    按 VECTOR_STORE_TYPE 返回进程内共享的向量存储后端。
+    各后端的依赖（langchain_postgres、faiss、chromadb）只在被选中时导入。
+    """
+    store_type = store_type or settings.VECTOR_STORE_TYPE
+    if store_type == "pgvector":
+        from .pgvector_store import PGVectorBackend
+
+        return PGVectorBackend(
+            connection_string=settings.DATABASE_URL,
+            async_connection=settings.ASYNC_DATABASE_URL,
+            embeddings_model_name=settings.EMBEDDING_MODEL_NAME,
+        )
+    if store_type == "faiss":
+        from .faiss_store import FaissBackend
+
+        return FaissBackend(settings.FAISS_INDEX_DIR)
+    if store_type == "chromadb":
+        from .chroma_store import ChromaBackend
+
+        return ChromaBackend(settings.CHROMA_PERSIST_DIR)
+    raise ValueError(
+        f"不支持的向量存储类型: {store_type}，"
+        f"可选值: {', '.join(VECTOR_STORE_TYPES)}"
+    )
+
+
+__all__ = [
+    "ManifestEntry",
+    "ScoredDocument",
+    "VECTOR_STORE_TYPES",
+    "VectorStoreBackend",
+    "get_vector_store_backend",
+]
@@ -0,0 +1,124 @@
+# app/services/vector_stores/base.py
+import fcntl
+import json
+import os
+import re
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+# 带分数的检索结果，分数越大越相关（向量检索为余弦相似度）
+ScoredDocument = tuple[Document, float]
+
+# 集合名称会被用作目录名，只允许安全的字符
+_COLLECTION_NAME_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,126}$")
+
+
+@dataclass
+class ManifestEntry:
+    file_hash: str
+    chunk_ids: list[str]
+
+
+class VectorStoreBackend(ABC):
+    """
+    向量存储后端。检索端按集合做向量（以及可选的全文）检索，
+    摄取端通过 open_writer 获得写入器。
+
+    写入器需要实现 bulk_ingestion_service.bulk_ingest 使用的接口：
+    load_manifest()、existing_ids(ids)、write(documents, vectors)、
+    commit_file(source, file_hash, chunk_ids, stale_ids, is_new, legacy_sources)、
+    remove_source(source, chunk_ids)、close()。
+    is_new 为真时，写入器删除来源为 source 或 legacy_sources 中任一名称、
+    但不在 chunk_ids 中的旧文本块。
+    """
+
+    name: str = ""
+    supports_lexical: bool = False
+
+    @abstractmethod
+    async def asearch(
+        self,
+        collection_name: str,
+        query_embedding: list[float],
+        k: int,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+    ) -> list[ScoredDocument]:
+        """返回与查询向量最相近的 k 个文本块及其余弦相似度，按相似度从高到低排列"""
+
+    async def alexical_search(
+        self, collection_name: str, question: str, k: int
+    ) -> list[ScoredDocument]:
+        raise NotImplementedError(f"{self.name} 后端不支持全文检索")
+
+    @abstractmethod
+    def open_writer(self, collection_name: str, embeddings_model_name: str):
+        """打开集合的写入器，使用完毕后需调用 close()"""
+
+    def iter_chunks(
+        self, collection_name: str, batch_size: int = 1000
+    ) -> Iterator[tuple[list[Document], np.ndarray]]:
+        """按批遍历集合中的全部文本块及其向量，用于导出索引"""
+        raise NotImplementedError(f"{self.name} 后端不支持遍历集合")
+
+    def stats(self) -> dict:
+        return {"type": self.name}
+
+
+def check_collection_name(collection_name: str) -> str:
+    if not _COLLECTION_NAME_PATTERN.match(collection_name):
+        raise ValueError(f"集合名称不合法: {collection_name}")
+    return collection_name
+
+
+class FileLock:
+    """
+    基于 flock 的进程间排他锁。多个 worker 同时写同一个集合时依次进行，
+    避免基于文件的后端互相覆盖对方的写入。进程退出时锁自动释放。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd: Optional[int] = None
+
+    def acquire(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+
+    def release(self) -> None:
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+
+def load_json_manifest(path: str) -> dict[str, ManifestEntry]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    return {
+        source: ManifestEntry(entry["file_hash"], entry["chunk_ids"])
+        for source, entry in data.items()
+    }
+
+
+def save_json_manifest(path: str, manifest: dict[str, ManifestEntry]) -> None:
+    """先写临时文件再原子替换，读者不会读到写了一半的清单"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                source: {"file_hash": e.file_hash, "chunk_ids": e.chunk_ids}
+                for source, e in manifest.items()
+            },
+            f,
+            ensure_ascii=False,
+        )
+    os.replace(tmp_path, path)
@@ -0,0 +1,184 @@
+# app/services/vector_stores/chroma_store.py
+import asyncio
+import json
+import os
+import threading
+from typing import Iterator, Optional, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .base import (
+    FileLock,
+    ManifestEntry,
+    ScoredDocument,
+    VectorStoreBackend,
+    check_collection_name,
+    load_json_manifest,
+    save_json_manifest,
+)
+
+_MANIFEST_DIR = "manifests"
+
+
+def _chroma_metadata(metadata: dict) -> dict:
+    """Chroma 的元数据只接受标量值：去掉空值，其余非标量值序列化为 JSON 字符串"""
+    return {
+        key: (
+            value
+            if isinstance(value, (str, int, float, bool))
+            else json.dumps(value, ensure_ascii=False, default=str)
+        )
+        for key, value in metadata.items()
+        if value is not None
+    }
+
+
+class ChromaBackend(VectorStoreBackend):
+    """嵌入式 Chroma 后端（PersistentClient），数据保存在本地目录中"""
+
+    name = "chromadb"
+
+    def __init__(self, persist_dir: str):
+        self.persist_dir = persist_dir
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import chromadb
+
+                    self._client = chromadb.PersistentClient(path=self.persist_dir)
+        return self._client
+
+    def collection(self, collection_name: str):
+        # 使用余弦距离，与其它后端的相似度含义一致
+        return self.client.get_or_create_collection(
+            check_collection_name(collection_name), metadata={"hnsw:space": "cosine"}
+        )
+
+    def _search(
+        self, collection_name: str, query_embedding: list[float], k: int
+    ) -> list[ScoredDocument]:
+        collection = self.collection(collection_name)
+        k = min(k, collection.count())
+        if k <= 0:
+            return []
+        result = collection.query(
+            query_embeddings=[list(query_embedding)],
+            n_results=k,
+            include=["documents", "metadatas", "distances"],
+        )
+        return [
+            (
+                Document(id=chunk_id, page_content=document, metadata=metadata or {}),
+                1.0 - distance,
+            )
+            for chunk_id, document, metadata, distance in zip(
+                result["ids"][0],
+                result["documents"][0],
+                result["metadatas"][0],
+                result["distances"][0],
+            )
+        ]
+
+    async def asearch(
+        self,
+        collection_name: str,
+        query_embedding: list[float],
+        k: int,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+    ) -> list[ScoredDocument]:
+        # Chroma 客户端是同步的，放到线程中执行
+        return await asyncio.to_thread(
+            self._search, collection_name, query_embedding, k
+        )
+
+    def open_writer(
+        self, collection_name: str, embeddings_model_name: str
+    ) -> "ChromaCollectionWriter":
+        return ChromaCollectionWriter(self, collection_name)
+
+    def iter_chunks(
+        self, collection_name: str, batch_size: int = 1000
+    ) -> Iterator[tuple[list[Document], np.ndarray]]:
+        collection = self.collection(collection_name)
+        for offset in range(0, collection.count(), batch_size):
+            result = collection.get(
+                include=["embeddings", "documents", "metadatas"],
+                limit=batch_size,
+                offset=offset,
+            )
+            documents = [
+                Document(id=chunk_id, page_content=document, metadata=metadata or {})
+                for chunk_id, document, metadata in zip(
+                    result["ids"], result["documents"], result["metadatas"]
+                )
+            ]
+            yield documents, np.asarray(result["embeddings"], dtype=np.float32)
+
+
+class ChromaCollectionWriter:
+    """写入 Chroma 集合；摄取清单保存在持久化目录下的 JSON 文件中"""
+
+    def __init__(self, backend: ChromaBackend, collection_name: str):
+        self._collection = backend.collection(collection_name)
+        self._manifest_path = os.path.join(
+            backend.persist_dir, _MANIFEST_DIR, f"{collection_name}.json"
+        )
+        self._lock = FileLock(f"{self._manifest_path}.lock")
+        self._lock.acquire()
+
+    def load_manifest(self) -> dict[str, ManifestEntry]:
+        return load_json_manifest(self._manifest_path)
+
+    def existing_ids(self, ids: list[str]) -> set[str]:
+        return set(self._collection.get(ids=ids, include=[])["ids"])
+
+    def write(self, documents: list[Document], vectors: list[list[float]]) -> None:
+        self._collection.upsert(
+            ids=[doc.id for doc in documents],
+            embeddings=[list(vector) for vector in vectors],
+            documents=[doc.page_content for doc in documents],
+            metadatas=[_chroma_metadata(doc.metadata) for doc in documents],
+        )
+
+    def _update_manifest(self, source: str, entry: Optional[ManifestEntry]) -> None:
+        manifest = load_json_manifest(self._manifest_path)
+        if entry is None:
+            manifest.pop(source, None)
+        else:
+            manifest[source] = entry
+        save_json_manifest(self._manifest_path, manifest)
+
+    def commit_file(
+        self,
+        source: str,
+        file_hash: str,
+        chunk_ids: list[str],
+        stale_ids: list[str],
+        is_new: bool,
+        legacy_sources: Sequence[str] = (),
+    ) -> None:
+        if stale_ids:
+            self._collection.delete(ids=stale_ids)
+        if is_new:
+            keep = set(chunk_ids)
+            where = {"source": {"$in": [source, *legacy_sources]}}
+            found = self._collection.get(where=where, include=[])["ids"]
+            legacy = [i for i in found if i not in keep]
+            if legacy:
+                self._collection.delete(ids=legacy)
+        self._update_manifest(source, ManifestEntry(file_hash, list(chunk_ids)))
+
+    def remove_source(self, source: str, chunk_ids: list[str]) -> None:
+        if chunk_ids:
+            self._collection.delete(ids=chunk_ids)
+        self._update_manifest(source, None)
+
+    def close(self) -> None:
+        self._lock.release()
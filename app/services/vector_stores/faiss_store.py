@@ -0,0 +1,414 @@
+# app/services/vector_stores/faiss_store.py
+import asyncio
+import json
+import mmap
+import os
+import shutil
+import threading
+import time
+import uuid
+from array import array
+from typing import Callable, Iterable, Iterator, Optional, Sequence
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+from .base import (
+    FileLock,
+    ManifestEntry,
+    ScoredDocument,
+    VectorStoreBackend,
+    check_collection_name,
+    load_json_manifest,
+    save_json_manifest,
+)
+
+# 每个集合一个目录，目录下每次写入生成一个新的版本目录，current 符号链接指向最新版本：
+#   <FAISS_INDEX_DIR>/<集合>/current -> v<时间戳>/
+#       index.faiss    归一化向量的内积索引（等价于余弦相似度）；
+#                      写入器生成扁平索引，导出的全局索引为量化的 IVF 索引
+#       docs.jsonl     每行一个文本块 {"id", "document", "metadata"}，
+#                      行号与索引中的向量序号一致
+#       offsets.npy    docs.jsonl 中每行的起始字节偏移（最后一项为文件长度）
+#       manifest.json  摄取清单
+#       meta.json      可选，导出的索引记录嵌入模型、索引类型等信息（见 global_index）
+_CURRENT = "current"
+_INDEX_FILE = "index.faiss"
+_DOCS_FILE = "docs.jsonl"
+_OFFSETS_FILE = "offsets.npy"
+_MANIFEST_FILE = "manifest.json"
+_META_FILE = "meta.json"
+_LOCK_FILE = ".lock"
+# 向量数不超过该值时直接在事件循环中搜索（耗时远小于 1 毫秒，不值得切换线程）
+_INLINE_SEARCH_MAX_VECTORS = 20000
+
+
+def _mmap_flags(ivf: bool) -> int:
+    # IO_FLAG_MMAP_IFC 让扁平索引的向量直接映射文件，IO_FLAG_MMAP 对 IVF 索引的倒排表
+    # 做同样的处理（两者不能同时使用），两种索引都不把向量复制到进程内存，
+    # 多个 worker 通过页缓存共享同一份数据
+    if ivf:
+        return faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+    flat_flag = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+    return flat_flag | faiss.IO_FLAG_READ_ONLY
+
+
+def _normalize(vectors) -> np.ndarray:
+    array = np.ascontiguousarray(vectors, dtype=np.float32)
+    if array.ndim == 1:
+        array = array.reshape(1, -1)
+    faiss.normalize_L2(array)
+    return array
+
+
+def _map_vectors(path: str) -> tuple[faiss.Index, np.ndarray]:
+    """
+    以 mmap 打开版本中的扁平索引，返回索引和直接指向其向量的只读数组
+    （数组有效期间须保留索引对象）
+    """
+    index = faiss.read_index(os.path.join(path, _INDEX_FILE), _mmap_flags(False))
+    vectors = faiss.rev_swig_ptr(index.get_xb(), index.ntotal * index.d)
+    vectors = vectors.reshape(index.ntotal, index.d)
+    return index, vectors
+
+
+def write_documents(path: str, records: Iterable[dict]) -> int:
+    """把文本块逐行写入 docs.jsonl，并写出行偏移数组，返回写入的行数"""
+    offsets = array("q", [0])
+    with open(os.path.join(path, _DOCS_FILE), "wb") as f:
+        for record in records:
+            line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+            f.write(line)
+            offsets.append(offsets[-1] + len(line))
+    np.save(os.path.join(path, _OFFSETS_FILE), np.frombuffer(offsets, dtype=np.int64))
+    return len(offsets) - 1
+
+
+def publish_version(collection_dir: str, build: Callable[[str], None]) -> str:
+    """
+    在临时目录中调用 build 生成一个完整的新版本，再原子地切换 current 链接。
+    旧版本保留一个，供仍在读取它的检索端使用，更早的版本被删除。返回新版本的目录。
+    """
+    version = f"v{time.time_ns()}"
+    tmp_dir = os.path.join(collection_dir, f".{version}.tmp")
+    os.makedirs(tmp_dir)
+    try:
+        build(tmp_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    os.rename(tmp_dir, os.path.join(collection_dir, version))
+
+    current = os.path.join(collection_dir, _CURRENT)
+    previous = None
+    if os.path.islink(current):
+        previous = os.path.basename(os.path.realpath(current))
+    link_tmp = os.path.join(collection_dir, f".{_CURRENT}.{uuid.uuid4().hex}")
+    os.symlink(version, link_tmp)
+    os.replace(link_tmp, current)
+
+    for name in os.listdir(collection_dir):
+        if name.startswith("v") and name not in (version, previous):
+            shutil.rmtree(os.path.join(collection_dir, name), ignore_errors=True)
+    return os.path.join(collection_dir, version)
+
+
+class _Snapshot:
+    """集合的一个只读版本：索引、偏移量和文本块文件都通过 mmap 打开，按需读取"""
+
+    def __init__(self, path: str):
+        self.path = path
+        try:
+            with open(os.path.join(path, _META_FILE), encoding="utf-8") as f:
+                self.meta = json.load(f)
+        except FileNotFoundError:
+            self.meta = {}
+        is_ivf = self.meta.get("index", "").startswith("IVF")
+        self.index = faiss.read_index(
+            os.path.join(path, _INDEX_FILE), _mmap_flags(is_ivf)
+        )
+        self.ivf = faiss.try_extract_index_ivf(self.index)
+        self.offsets = np.load(os.path.join(path, _OFFSETS_FILE), mmap_mode="r")
+        self._docs = None
+        if self.index.ntotal:
+            with open(os.path.join(path, _DOCS_FILE), "rb") as f:
+                self._docs = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def document(self, row: int) -> Document:
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        record = json.loads(self._docs[start:end])
+        return Document(
+            id=record["id"],
+            page_content=record["document"],
+            metadata=record["metadata"],
+        )
+
+    def search_cost(self, nprobe: int) -> int:
+        """一次搜索大约要比较的向量数"""
+        if self.ivf is None:
+            return self.index.ntotal
+        return self.index.ntotal * min(nprobe, self.ivf.nlist) // self.ivf.nlist
+
+    def search(
+        self, query: np.ndarray, k: int, nprobe: Optional[int] = None
+    ) -> list[ScoredDocument]:
+        k = min(k, self.index.ntotal)
+        if k <= 0:
+            return []
+        if query.shape[1] != self.index.d:
+            raise ValueError(
+                f"查询向量维度 {query.shape[1]} 与索引维度 {self.index.d} 不一致"
+            )
+        # 探查数通过搜索参数传入，不修改共享的索引对象，并发搜索互不影响
+        params = None
+        if self.ivf is not None and nprobe:
+            params = faiss.SearchParametersIVF(nprobe=nprobe)
+        scores, rows = self.index.search(query, k, params=params)
+        return [
+            (self.document(int(row)), float(score))
+            for row, score in zip(rows[0], scores[0])
+            if row >= 0
+        ]
+
+
+class FaissBackend(VectorStoreBackend):
+    """
+    进程内 FAISS 后端，适合单机部署：每个集合一组磁盘文件，通过 mmap 打开，
+    检索不经过数据库，小集合的搜索在亚毫秒级完成。
+    写入器生成新版本后切换 current 链接，检索端发现链接变化时重新打开。
+    """
+
+    name = "faiss"
+
+    def __init__(self, root: str):
+        self.root = root
+        self._snapshots = TTLCache(
+            maxsize=settings.RETRIEVER_CACHE_MAX_SIZE,
+            ttl=settings.RETRIEVER_CACHE_TTL_SECONDS,
+        )
+        self._lock = threading.Lock()
+
+    def collection_dir(self, collection_name: str) -> str:
+        return os.path.join(self.root, check_collection_name(collection_name))
+
+    def snapshot(self, collection_name: str) -> Optional[_Snapshot]:
+        """返回集合当前版本的快照；集合还没有数据时返回 None"""
+        try:
+            path = os.path.realpath(
+                os.path.join(self.collection_dir(collection_name), _CURRENT),
+                strict=True,
+            )
+        except OSError:
+            return None
+        snapshot = self._snapshots.get(collection_name)
+        if snapshot is None or snapshot.path != path:
+            with self._lock:
+                snapshot = self._snapshots.get(collection_name)
+                if snapshot is None or snapshot.path != path:
+                    snapshot = _Snapshot(path)
+                    self._snapshots.set(collection_name, snapshot)
+        return snapshot
+
+    async def asearch(
+        self,
+        collection_name: str,
+        query_embedding: list[float],
+        k: int,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+    ) -> list[ScoredDocument]:
+        snapshot = self.snapshot(collection_name)
+        if snapshot is None:
+            return []
+        query = _normalize(query_embedding)
+        nprobe = probes or settings.FAISS_IVF_NPROBE
+        if snapshot.search_cost(nprobe) <= _INLINE_SEARCH_MAX_VECTORS:
+            return snapshot.search(query, k, nprobe)
+        return await asyncio.to_thread(snapshot.search, query, k, nprobe)
+
+    def open_writer(
+        self, collection_name: str, embeddings_model_name: str
+    ) -> "FaissCollectionWriter":
+        return FaissCollectionWriter(self.collection_dir(collection_name))
+
+    def iter_chunks(
+        self, collection_name: str, batch_size: int = 1000
+    ) -> Iterator[tuple[list[Document], np.ndarray]]:
+        snapshot = self.snapshot(collection_name)
+        if snapshot is None:
+            return
+        for start in range(0, snapshot.index.ntotal, batch_size):
+            stop = min(start + batch_size, snapshot.index.ntotal)
+            documents = [snapshot.document(row) for row in range(start, stop)]
+            yield documents, snapshot.index.reconstruct_n(start, stop - start)
+
+    def stats(self) -> dict:
+        return {
+            "type": self.name,
+            "root": self.root,
+            "snapshots": self._snapshots.stats(),
+        }
+
+
+class FaissCollectionWriter:
+    """
+    修改集合后把完整的新版本写入新目录，再原子地切换 current 链接。
+    同一集合同时只允许一个写入器（文件锁），检索端始终读到某个完整的版本。
+
+    已发布的向量通过 mmap 读取，内存中只缓冲上次发布之后写入的向量；
+    新增的文本块累计达到 publish_every 个后，在提交文件时发布一个新版本，
+    摄取过程中新内容陆续可检索，缓冲随之释放。close() 时发布剩余的修改。
+    每个版本都是完整重写，文本块的内容和元数据在写入器存续期间保留在内存中。
+    """
+
+    def __init__(self, collection_dir: str, publish_every: Optional[int] = None):
+        self.dir = collection_dir
+        if publish_every is None:
+            publish_every = settings.FAISS_PUBLISH_EVERY_CHUNKS
+        self.publish_every = publish_every
+        self._lock = FileLock(os.path.join(collection_dir, _LOCK_FILE))
+        self._lock.acquire()
+        try:
+            self._load()
+        except BaseException:
+            self._lock.release()
+            raise
+
+    def _load(self) -> None:
+        self.dim: Optional[int] = None
+        # 第一项为已发布版本的映射向量，之后为新写入的批次
+        self._vectors: list[np.ndarray] = []
+        self._mapped: Optional[faiss.Index] = None
+        self._records: list[dict] = []
+        # 文本块 ID -> 在 _records 中的行号（仅包含未删除的）
+        self._rows: dict[str, int] = {}
+        # metadata["source"] -> 未删除的文本块 ID
+        self._by_source: dict[str, set[str]] = {}
+        self._manifest: dict[str, ManifestEntry] = {}
+        self._unpublished = 0  # 上次发布之后新增的文本块数
+        self._dirty = False
+
+        current = os.path.join(self.dir, _CURRENT)
+        if not os.path.exists(current):
+            return
+        self._map_baseline(os.path.realpath(current))
+        with open(os.path.join(current, _DOCS_FILE), encoding="utf-8") as f:
+            for line in f:
+                self._add_record(json.loads(line))
+        self._manifest = load_json_manifest(os.path.join(current, _MANIFEST_FILE))
+
+    def _add_record(self, record: dict) -> None:
+        self._rows[record["id"]] = len(self._records)
+        self._records.append(record)
+        source = record["metadata"].get("source")
+        self._by_source.setdefault(source, set()).add(record["id"])
+
+    def _map_baseline(self, path: str) -> None:
+        index, vectors = _map_vectors(path)
+        self._mapped = index
+        self._vectors = [vectors] if index.ntotal else []
+        if index.ntotal:
+            self.dim = index.d
+
+    def load_manifest(self) -> dict[str, ManifestEntry]:
+        return dict(self._manifest)
+
+    def existing_ids(self, ids: list[str]) -> set[str]:
+        return {i for i in ids if i in self._rows}
+
+    def write(self, documents: list[Document], vectors: list[list[float]]) -> None:
+        array = _normalize(vectors)
+        if self.dim is None:
+            self.dim = array.shape[1]
+        elif array.shape[1] != self.dim:
+            raise ValueError(
+                f"向量维度 {array.shape[1]} 与集合已有的维度 {self.dim} 不一致"
+            )
+        for doc in documents:
+            self._add_record({
+                "id": doc.id,
+                "document": doc.page_content,
+                "metadata": json.loads(
+                    json.dumps(doc.metadata, ensure_ascii=False, default=str)
+                ),
+            })
+        self._vectors.append(array)
+        self._unpublished += len(documents)
+        self._dirty = True
+
+    def _delete(self, ids) -> None:
+        for chunk_id in ids:
+            row = self._rows.pop(chunk_id, None)
+            if row is None:
+                continue
+            source = self._records[row]["metadata"].get("source")
+            source_ids = self._by_source[source]
+            source_ids.discard(chunk_id)
+            if not source_ids:
+                del self._by_source[source]
+            self._dirty = True
+
+    def commit_file(
+        self,
+        source: str,
+        file_hash: str,
+        chunk_ids: list[str],
+        stale_ids: list[str],
+        is_new: bool,
+        legacy_sources: Sequence[str] = (),
+    ) -> None:
+        self._delete(stale_ids)
+        if is_new:
+            # 与 PGVector 后端一致：清单中没有记录的文件，删除同名来源遗留的其它文本块
+            keep = set(chunk_ids)
+            for name in {source, *legacy_sources}:
+                leftover = self._by_source.get(name, ())
+                self._delete([i for i in leftover if i not in keep])
+        self._manifest[source] = ManifestEntry(file_hash, list(chunk_ids))
+        self._dirty = True
+        if self.publish_every and self._unpublished >= self.publish_every:
+            self.flush()
+
+    def remove_source(self, source: str, chunk_ids: list[str]) -> None:
+        self._delete(chunk_ids)
+        self._manifest.pop(source, None)
+        self._dirty = True
+
+    def flush(self) -> None:
+        """写出新版本并切换 current 链接"""
+        live_rows = np.array(sorted(self._rows.values()), dtype=np.int64)
+
+        def build(path: str) -> None:
+            # 逐个数组取出未删除的行加入索引，不先把所有向量拼接成一份副本
+            index = faiss.IndexFlatIP(self.dim or 1)
+            start = 0
+            for vectors in self._vectors:
+                stop = start + len(vectors)
+                first, last = np.searchsorted(live_rows, [start, stop])
+                rows = live_rows[first:last]
+                if len(rows):
+                    index.add(np.ascontiguousarray(vectors[rows - start]))
+                start = stop
+            faiss.write_index(index, os.path.join(path, _INDEX_FILE))
+            write_documents(path, (self._records[row] for row in live_rows))
+            save_json_manifest(os.path.join(path, _MANIFEST_FILE), self._manifest)
+
+        version_dir = publish_version(self.dir, build)
+
+        # 压缩后的版本成为新的基线，改为从映射的文件读取，释放缓冲的向量
+        self._map_baseline(version_dir)
+        self._records = [self._records[row] for row in live_rows]
+        self._rows = {record["id"]: row for row, record in enumerate(self._records)}
+        self._unpublished = 0
+        self._dirty = False
+
+    def close(self) -> None:
+        try:
+            if self._dirty:
+                self.flush()
+        finally:
+            self._lock.release()
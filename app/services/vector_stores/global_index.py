@@ -0,0 +1,226 @@
+# app/services/vector_stores/global_index.py
+"""
+全局集合的只读导出索引。
+
+全局集合（COLLECTION_NAME）被所有用户共享，只在 ingest.py 运行时变化。
+导出后它是一个只读的 FAISS 集合：向量经 int8 标量量化 (SQ8) 或乘积量化 (PQ)
+存入 IVF 索引，文本块按行偏移寻址，
+全部通过 mmap 只读打开，同一台机器上的多个 API worker 共享页缓存。
+检索全局集合时优先使用导出的索引，不再访问数据库。
+"""
+import json
+import logging
+import math
+import os
+import time
+from functools import lru_cache
+from typing import Iterable, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app.core.config import settings
+
+from .base import FileLock, VectorStoreBackend, check_collection_name
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_INDEX_QUANTIZERS = ("sq8", "pq")
+_VECTORS_TMP_FILE = "vectors.f32.tmp"  # 构建期间暂存归一化后的原始向量，发布前删除
+_MIN_POINTS_PER_LIST = 39  # FAISS 的 k-means 每个聚类至少需要的训练样本数
+_TRAIN_POINTS_PER_LIST = 64  # 训练 IVF 时每个聚类抽样的向量数
+_PQ_NBITS = 8
+_ADD_BATCH_SIZE = 65536
+
+# 已提示过嵌入模型不一致的导出版本，避免每次检索都打印
+_mismatch_warned: set[str] = set()
+
+
+def choose_index_factory(
+    n: int,
+    dim: int,
+    quantizer: str,
+    nlist: Optional[int] = None,
+    pq_m: int = 96,
+) -> str:
+    """按向量数量选择 IVF 聚类数和量化方式，返回 faiss.index_factory 的描述串"""
+    if quantizer not in GLOBAL_INDEX_QUANTIZERS:
+        raise ValueError(
+            f"不支持的量化方式: {quantizer}，"
+            f"可选值: {', '.join(GLOBAL_INDEX_QUANTIZERS)}"
+        )
+    nlist = min(nlist or int(4 * math.sqrt(n)), n // _MIN_POINTS_PER_LIST)
+    nlist = max(nlist, 1)
+    if quantizer == "pq":
+        if dim % pq_m:
+            raise ValueError(f"PQ 子向量个数 {pq_m} 不能整除向量维度 {dim}")
+        if n >= (1 << _PQ_NBITS) * _MIN_POINTS_PER_LIST:
+            return f"IVF{nlist},PQ{pq_m}x{_PQ_NBITS}"
+        # 向量数不足以训练 PQ 码本
+        logger.warning("global_index.pq_fallback", extra={
+            "vectors": n,
+            "required": (1 << _PQ_NBITS) * _MIN_POINTS_PER_LIST,
+            "quantizer": "sq8",
+        })
+    return f"IVF{nlist},SQ8"
+
+
+def export_collection(
+    batches: Iterable[tuple[list[Document], np.ndarray]],
+    collection_dir: str,
+    embeddings_model_name: str,
+    quantizer: Optional[str] = None,
+    nlist: Optional[int] = None,
+    pq_m: Optional[int] = None,
+) -> dict:
+    """
+    把按批给出的 (文本块, 向量) 写成一个新的导出版本并原子地发布，返回版本信息。
+    原始向量先顺序写入临时文件再通过 mmap 训练和建索引，内存占用只与训练样本量有关。
+    """
+    import faiss
+
+    from .faiss_store import (
+        _INDEX_FILE,
+        _LOCK_FILE,
+        _META_FILE,
+        _normalize,
+        publish_version,
+        write_documents,
+    )
+
+    quantizer = quantizer or settings.GLOBAL_INDEX_QUANTIZER
+    pq_m = pq_m or settings.GLOBAL_INDEX_PQ_M
+    started = time.perf_counter()
+    meta: dict = {}
+
+    def build(path: str) -> None:
+        vectors_path = os.path.join(path, _VECTORS_TMP_FILE)
+        shape = [0, 0]
+
+        def records():
+            with open(vectors_path, "wb") as f:
+                for documents, vectors in batches:
+                    array = _normalize(vectors)
+                    if shape[1] and array.shape[1] != shape[1]:
+                        raise ValueError(
+                            f"向量维度 {array.shape[1]} 与之前的维度 {shape[1]} 不一致"
+                        )
+                    shape[1] = array.shape[1]
+                    f.write(array.tobytes())
+                    shape[0] += len(documents)
+                    for doc in documents:
+                        yield {
+                            "id": doc.id,
+                            "document": doc.page_content,
+                            "metadata": json.loads(json.dumps(
+                                doc.metadata, ensure_ascii=False, default=str
+                            )),
+                        }
+
+        write_documents(path, records())
+        n, dim = shape
+        if n == 0:
+            raise ValueError("集合中没有文本块，无法导出")
+
+        vectors = np.memmap(vectors_path, dtype=np.float32, mode="r", shape=(n, dim))
+        factory = choose_index_factory(n, dim, quantizer, nlist, pq_m)
+        index = faiss.index_factory(dim, factory, faiss.METRIC_INNER_PRODUCT)
+        ivf = faiss.extract_index_ivf(index)
+        train_size = ivf.nlist * _TRAIN_POINTS_PER_LIST
+        if "PQ" in factory:
+            train_size = max(train_size, (1 << _PQ_NBITS) * _TRAIN_POINTS_PER_LIST)
+        rng = np.random.default_rng(0)
+        sample = np.sort(rng.choice(n, min(n, train_size), replace=False))
+        index.train(np.ascontiguousarray(vectors[sample]))
+        for start in range(0, n, _ADD_BATCH_SIZE):
+            index.add(np.ascontiguousarray(vectors[start:start + _ADD_BATCH_SIZE]))
+        faiss.write_index(index, os.path.join(path, _INDEX_FILE))
+        del vectors
+        os.remove(vectors_path)
+
+        meta.update({
+            "embedding_model": embeddings_model_name,
+            "index": factory,
+            "count": n,
+            "dim": dim,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        })
+        with open(os.path.join(path, _META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+    lock = FileLock(os.path.join(collection_dir, _LOCK_FILE))
+    lock.acquire()
+    try:
+        version_dir = publish_version(collection_dir, build)
+    finally:
+        lock.release()
+    size = sum(entry.stat().st_size for entry in os.scandir(version_dir))
+    return {
+        **meta,
+        "path": version_dir,
+        "size_bytes": size,
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+def export_global_index(
+    collection_name: Optional[str] = None,
+    source: Optional[VectorStoreBackend] = None,
+    embeddings_model_name: Optional[str] = None,
+    batch_size: int = 1000,
+    **options,
+) -> dict:
+    """从配置的向量存储后端读取全局集合，导出到 GLOBAL_INDEX_DIR 下"""
+    from . import get_vector_store_backend
+
+    collection_name = collection_name or settings.COLLECTION_NAME
+    source = source or get_vector_store_backend()
+    collection_dir = os.path.join(
+        settings.GLOBAL_INDEX_DIR, check_collection_name(collection_name)
+    )
+    return export_collection(
+        source.iter_chunks(collection_name, batch_size),
+        collection_dir,
+        embeddings_model_name or settings.EMBEDDING_MODEL_NAME,
+        **options,
+    )
+
+
+@lru_cache(maxsize=None)
+def get_global_index_backend():
+    from .faiss_store import FaissBackend
+
+    return FaissBackend(settings.GLOBAL_INDEX_DIR)
+
+
+def global_index_backend_for(collection_name: str, embeddings_model_name: str):
+    """
+    collection_name 是已导出的全局集合、且导出时使用的嵌入模型与查询一致时，
+    返回导出索引的后端；否则返回 None，由调用方使用配置的向量存储后端。
+    """
+    if not settings.GLOBAL_INDEX_ENABLED or collection_name != settings.COLLECTION_NAME:
+        return None
+    backend = get_global_index_backend()
+    snapshot = backend.snapshot(collection_name)
+    if snapshot is None:
+        return None
+    if snapshot.meta.get("embedding_model") != embeddings_model_name:
+        if snapshot.path not in _mismatch_warned:
+            _mismatch_warned.add(snapshot.path)
+            # 导出索引与当前嵌入模型不一致，忽略导出索引，需要重新导出
+            logger.warning("global_index.model_mismatch", extra={
+                "path": snapshot.path,
+                "index_model": snapshot.meta.get("embedding_model"),
+                "query_model": embeddings_model_name,
+            })
+        return None
+    return backend
+
+
+def global_index_stats() -> dict:
+    stats = {"enabled": settings.GLOBAL_INDEX_ENABLED, "dir": settings.GLOBAL_INDEX_DIR}
+    if settings.GLOBAL_INDEX_ENABLED:
+        snapshot = get_global_index_backend().snapshot(settings.COLLECTION_NAME)
+        if snapshot is not None:
+            stats.update(snapshot.meta, version=os.path.basename(snapshot.path))
+    return stats
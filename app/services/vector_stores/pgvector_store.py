@@ -0,0 +1,283 @@
+# app/services/vector_stores/pgvector_store.py
+import json
+import logging
+from functools import lru_cache
+from typing import Iterable, Iterator, Optional, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_postgres import PGVector
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.services import lexical_index_service
+from app.services.embedding_service import get_embeddings
+from app.services.vector_index_service import install_search_param_hook, search_params
+
+from .base import ManifestEntry, ScoredDocument, VectorStoreBackend
+
+logger = logging.getLogger(__name__)
+
+# 文本块写入的目标表（langchain_postgres.PGVector 的默认表结构）
+_COPY_SQL = (
+    "COPY langchain_pg_embedding (id, collection_id, embedding, document, cmetadata) "
+    "FROM STDIN"
+)
+# 导出集合时按 ID 顺序读取全部文本块，向量转换为 real[] 以便直接得到浮点数列表
+_EXPORT_SQL = (
+    "SELECT e.id, e.embedding::real[], e.document, e.cmetadata "
+    "FROM langchain_pg_embedding e "
+    "JOIN langchain_pg_collection c ON c.uuid = e.collection_id "
+    "WHERE c.name = %s ORDER BY e.id"
+)
+# 同一批文本块的全文索引行，与向量行在同一个事务中写入
+_LEXICAL_COPY_SQL = (
+    f"COPY {lexical_index_service.LEXICAL_TABLE} (id, collection_id, tsv) FROM STDIN"
+)
+
+
+@lru_cache(maxsize=None)
+def _get_async_engine(async_connection: str) -> AsyncEngine:
+    """同一个连接串的所有集合共用一个异步引擎（及其连接池）"""
+    engine = create_async_engine(async_connection, pool_pre_ping=True)
+    install_search_param_hook(engine.sync_engine)
+    return engine
+
+
+def _vector_literal(vector: Iterable[float]) -> str:
+    return "[" + ",".join(map(str, vector)) + "]"
+
+
+def _libpq_url(connection_string: str) -> str:
+    """把 SQLAlchemy 连接串转换成 psycopg 直接使用的 libpq 连接串"""
+    url = make_url(connection_string).set(drivername="postgresql")
+    return url.render_as_string(hide_password=False)
+
+
+class PGVectorBackend(VectorStoreBackend):
+    """PostgreSQL + pgvector 后端，支持 HNSW / IVFFlat 索引参数和全文检索"""
+
+    name = "pgvector"
+    supports_lexical = True
+
+    def __init__(
+        self,
+        connection_string: str,
+        async_connection: str,
+        embeddings_model_name: str,
+    ):
+        self.connection_string = connection_string
+        self.async_connection = async_connection
+        self.embeddings_model_name = embeddings_model_name
+        # 向量存储缓存：按 LRU + 空闲过期淘汰，避免随用户集合数量无限增长
+        self.store_cache = TTLCache(
+            maxsize=settings.RETRIEVER_CACHE_MAX_SIZE,
+            ttl=settings.RETRIEVER_CACHE_TTL_SECONDS,
+        )
+
+    async def aget_vector_store(self, collection_name: str) -> PGVector:
+        """通过异步驱动 (psycopg) 连接到 PGVector，返回指定集合的向量存储"""
+
+        async def _build_store() -> PGVector:
+            logger.debug(
+                "pgvector.store_created", extra={"collection": collection_name}
+            )
+            store = PGVector(
+                embeddings=get_embeddings(self.embeddings_model_name),
+                collection_name=collection_name,
+                connection=_get_async_engine(self.async_connection),
+                async_mode=True,
+            )
+            # 异步模式下建表和建集合是惰性的，这里提前完成，避免并发的首次查询相互竞争
+            await store.acreate_collection()
+            return store
+
+        return await self.store_cache.aget_or_create(collection_name, _build_store)
+
+    async def asearch(
+        self,
+        collection_name: str,
+        query_embedding: list[float],
+        k: int,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+    ) -> list[ScoredDocument]:
+        store = await self.aget_vector_store(collection_name)
+        with search_params(ef_search=ef_search, probes=probes):
+            results = await store.asimilarity_search_with_score_by_vector(
+                query_embedding, k=k
+            )
+        # PGVector 默认返回余弦距离，换算成相似度（越大越相关）
+        return [(doc, 1.0 - distance) for doc, distance in results]
+
+    async def alexical_search(
+        self, collection_name: str, question: str, k: int
+    ) -> list[ScoredDocument]:
+        engine = _get_async_engine(self.async_connection)
+        return await lexical_index_service.alexical_search(
+            engine, collection_name, question, k
+        )
+
+    def open_writer(
+        self, collection_name: str, embeddings_model_name: str
+    ) -> "PGVectorBulkWriter":
+        return PGVectorBulkWriter(
+            self.connection_string, collection_name, embeddings_model_name
+        )
+
+    def iter_chunks(
+        self, collection_name: str, batch_size: int = 1000
+    ) -> Iterator[tuple[list[Document], np.ndarray]]:
+        import psycopg
+
+        with psycopg.connect(_libpq_url(self.connection_string)) as conn:
+            # 服务端游标分批读取，导出大集合时内存占用只与批大小有关
+            with conn.cursor(name="export_chunks") as cursor:
+                cursor.itersize = batch_size
+                cursor.execute(_EXPORT_SQL, (collection_name,))
+                while rows := cursor.fetchmany(batch_size):
+                    documents = [
+                        Document(
+                            id=chunk_id, page_content=document, metadata=metadata or {}
+                        )
+                        for chunk_id, _, document, metadata in rows
+                    ]
+                    vectors = np.asarray([row[1] for row in rows], dtype=np.float32)
+                    yield documents, vectors
+
+    def stats(self) -> dict:
+        return {"type": self.name, "store_cache": self.store_cache.stats()}
+
+
+class PGVectorBulkWriter:
+    """
+    通过一个 psycopg 连接，使用 COPY 把文本块批量写入 PGVector 的表，并维护摄取清单。
+    表结构和集合记录仍由 langchain_postgres.PGVector 创建，保证与检索端一致。
+    每个文本块同时写入一行全文索引；删除向量行时全文索引行随外键级联删除。
+    """
+
+    def __init__(
+        self,
+        connection_string: str,
+        collection_name: str,
+        embeddings_model_name: str,
+    ):
+        import psycopg
+
+        from app.models.ingestion import IngestionManifest
+
+        # 构造 PGVector 会按需创建扩展、表和集合记录
+        store = PGVector(
+            embeddings=get_embeddings(embeddings_model_name),
+            collection_name=collection_name,
+            connection=connection_string,
+        )
+        IngestionManifest.__table__.create(bind=store._engine, checkfirst=True)
+        with store._engine.begin() as conn:
+            for statement in lexical_index_service.CREATE_STATEMENTS:
+                conn.execute(text(statement))
+        store._engine.dispose()
+
+        self.collection_name = collection_name
+        self._conn = psycopg.connect(_libpq_url(connection_string))
+        row = self._conn.execute(
+            "SELECT uuid FROM langchain_pg_collection WHERE name = %s",
+            (collection_name,),
+        ).fetchone()
+        if row is None:
+            raise RuntimeError(f"集合 {collection_name} 创建失败")
+        self.collection_id = str(row[0])
+
+    def load_manifest(self) -> dict[str, ManifestEntry]:
+        rows = self._conn.execute(
+            "SELECT source, file_hash, chunk_ids FROM ingestion_manifest "
+            "WHERE collection_name = %s",
+            (self.collection_name,),
+        ).fetchall()
+        self._conn.commit()
+        return {
+            source: ManifestEntry(file_hash, list(ids))
+            for source, file_hash, ids in rows
+        }
+
+    def existing_ids(self, ids: list[str]) -> set[str]:
+        """返回已在表中的文本块 ID（例如上次中断前已写入的部分）"""
+        rows = self._conn.execute(
+            "SELECT id FROM langchain_pg_embedding WHERE id = ANY(%s)", (ids,)
+        ).fetchall()
+        self._conn.commit()
+        return {row[0] for row in rows}
+
+    def write(self, documents: list[Document], vectors: list[list[float]]) -> None:
+        with self._conn.cursor() as cursor:
+            with cursor.copy(_COPY_SQL) as copy:
+                for doc, vector in zip(documents, vectors):
+                    copy.write_row((
+                        doc.id,
+                        self.collection_id,
+                        _vector_literal(vector),
+                        doc.page_content,
+                        json.dumps(doc.metadata, ensure_ascii=False, default=str),
+                    ))
+            with cursor.copy(_LEXICAL_COPY_SQL) as copy:
+                for doc in documents:
+                    tsv = lexical_index_service.tsvector_literal(doc.page_content)
+                    copy.write_row((doc.id, self.collection_id, tsv))
+        self._conn.commit()
+
+    def commit_file(
+        self,
+        source: str,
+        file_hash: str,
+        chunk_ids: list[str],
+        stale_ids: list[str],
+        is_new: bool,
+        legacy_sources: Sequence[str] = (),
+    ) -> None:
+        """文件的新文本块全部写入后，删除过期的块并更新清单（同一个事务）"""
+        with self._conn.transaction():
+            if stale_ids:
+                self._conn.execute(
+                    "DELETE FROM langchain_pg_embedding WHERE id = ANY(%s)",
+                    (stale_ids,),
+                )
+            if is_new:
+                # 清单中没有记录的文件，可能有启用增量摄取之前写入的旧数据
+                # （来源名称可能是旧的写法）；用 @> 包含条件匹配来源，
+                # 才能使用 cmetadata 上的 GIN 索引 (jsonb_path_ops)，
+                # ->> 等值条件只能扫描整张表，首次批量摄取会随文件数变成平方级
+                for name in (source, *legacy_sources):
+                    self._conn.execute(
+                        "DELETE FROM langchain_pg_embedding "
+                        "WHERE cmetadata @> jsonb_build_object('source', %s::text) "
+                        "AND collection_id = %s AND NOT (id = ANY(%s))",
+                        (name, self.collection_id, chunk_ids),
+                    )
+            self._conn.execute(
+                "INSERT INTO ingestion_manifest "
+                "(collection_name, source, file_hash, chunk_ids) "
+                "VALUES (%s, %s, %s, %s) "
+                "ON CONFLICT (collection_name, source) DO UPDATE "
+                "SET file_hash = EXCLUDED.file_hash, chunk_ids = EXCLUDED.chunk_ids, "
+                "updated_at = now()",
+                (self.collection_name, source, file_hash, chunk_ids),
+            )
+
+    def remove_source(self, source: str, chunk_ids: list[str]) -> None:
+        """文件已被删除：移除它的所有文本块和清单记录"""
+        with self._conn.transaction():
+            self._conn.execute(
+                "DELETE FROM langchain_pg_embedding WHERE id = ANY(%s)",
+                (chunk_ids,),
+            )
+            self._conn.execute(
+                "DELETE FROM ingestion_manifest "
+                "WHERE collection_name = %s AND source = %s",
+                (self.collection_name, source),
+            )
+
+    def close(self) -> None:
+        self._conn.close()
@@ -0,0 +1,251 @@
+# benchmarks/bench_global_index.py
+"""
+全局集合导出索引基准：对比 SQ8 / PQ 量化的 IVF 导出索引（以及可选的 PGVector 检索路径）
+相对精确检索的召回率、单次检索延迟和进程内存。
+
+每种导出索引在独立的子进程中通过 mmap 打开并执行全部查询，报告该进程的
+RssAnon（进程私有内存）和 RssFile（映射文件占用的页缓存，多个 worker 共享同一份）。
+
+数据默认为合成的聚类向量；
+--from-pgvector 时读取数据库中的全局集合，并同时测量 PGVector 检索。
+
+用法:
+    python benchmarks/bench_global_index.py --size 100000 --dim 768
+    python benchmarks/bench_global_index.py --from-pgvector --nprobe 8 16 32
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np  # noqa: E402
+from langchain_core.documents import Document  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.services.vector_stores.global_index import export_collection  # noqa: E402
+
+
+def memory_kb() -> dict:
+    fields = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("VmRSS", "RssAnon", "RssFile"):
+                fields[key] = int(value.split()[0])
+    return fields
+
+
+def percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def synthetic_data(size: int, dim: int, clusters: int = 200, seed: int = 0):
+    """按簇生成向量，接近真实嵌入“局部密集”的分布"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size)
+    vectors = centers[labels] + 0.5 * rng.standard_normal((size, dim)).astype(
+        np.float32
+    )
+    ids = [f"c{i}" for i in range(size)]
+    return ids, vectors
+
+
+def load_pgvector_data(collection_name: str):
+    from app.services.vector_stores import get_vector_store_backend
+
+    ids, batches = [], []
+    for documents, vectors in get_vector_store_backend("pgvector").iter_chunks(
+        collection_name, 5000
+    ):
+        ids.extend(doc.id for doc in documents)
+        batches.append(vectors)
+    return ids, np.concatenate(batches)
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    rows = []
+    for start in range(0, len(queries), 64):
+        similarities = queries[start : start + 64] @ normalized.T
+        rows.append(np.argsort(-similarities, axis=1)[:, :k])
+    return np.concatenate(rows)
+
+
+def recall(found: list[list[str]], truth: list[list[str]]) -> float:
+    return statistics.mean(len(set(f) & set(t)) / len(t) for f, t in zip(found, truth))
+
+
+def probe(args) -> None:
+    """子进程：mmap 打开导出版本，执行查询，输出延迟、结果和内存"""
+    from app.services.vector_stores.faiss_store import _Snapshot
+
+    before = memory_kb()
+    snapshot = _Snapshot(args.probe)
+    loaded = memory_kb()
+    queries = np.load(args.queries_file)
+    results = {}
+    for nprobe in args.nprobe:
+        latencies, found = [], []
+        for query in queries:
+            start = time.perf_counter()
+            hits = snapshot.search(query.reshape(1, -1), args.k, nprobe)
+            latencies.append((time.perf_counter() - start) * 1000)
+            found.append([doc.id for doc, _ in hits])
+        results[nprobe] = {"latencies": latencies, "found": found}
+    print(
+        json.dumps(
+            {
+                "before": before,
+                "loaded": loaded,
+                "after": memory_kb(),
+                "results": results,
+            }
+        )
+    )
+
+
+async def bench_pgvector(collection_name: str, queries: np.ndarray, k: int) -> dict:
+    from app.services.vector_stores import get_vector_store_backend
+
+    backend = get_vector_store_backend("pgvector")
+    await backend.asearch(collection_name, queries[0].tolist(), k)
+    latencies, found = [], []
+    for query in queries:
+        start = time.perf_counter()
+        hits = await backend.asearch(collection_name, query.tolist(), k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found.append([doc.id for doc, _ in hits])
+    return {"latencies": latencies, "found": found}
+
+
+def print_row(
+    label: str, found, truth, latencies, memory: dict, size_mb: float
+) -> None:
+    print(
+        f"{label:>24} {recall(found, truth):>9.1%} "
+        f"{statistics.median(latencies):>9.2f} {percentile(latencies, 0.99):>9.2f} "
+        f"{memory.get('RssAnon', 0) / 1024:>12.1f} "
+        f"{memory.get('RssFile', 0) / 1024:>12.1f} {size_mb:>10.1f}"
+    )
+
+
+def main(args) -> None:
+    if args.from_pgvector:
+        ids, vectors = load_pgvector_data(args.collection)
+    else:
+        ids, vectors = synthetic_data(args.size, args.dim)
+    rng = np.random.default_rng(1)
+    # 查询取自数据本身并加入扰动，模拟与已有文本块相近的问题
+    queries = vectors[rng.choice(len(vectors), args.queries, replace=False)]
+    queries = queries + 0.3 * rng.standard_normal(queries.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    truth = [
+        [ids[row] for row in rows] for rows in exact_top_k(vectors, queries, args.k)
+    ]
+    print(
+        f"{len(ids)} 个向量, 维度 {vectors.shape[1]}, {args.queries} 个查询, "
+        f"召回率按精确 top{args.k} 计算\n"
+    )
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        queries_path = os.path.join(work_dir, "queries.npy")
+        np.save(queries_path, queries.astype(np.float32))
+        print(
+            f"{'方式':>24} {'召回率':>9} {'p50(ms)':>9} {'p99(ms)':>9} "
+            f"{'RssAnon(MB)':>12} {'RssFile(MB)':>12} {'磁盘(MB)':>10}"
+        )
+        for quantizer in args.quantizers:
+            batches = (
+                (
+                    [Document(id=i, page_content="") for i in ids[s : s + 10000]],
+                    vectors[s : s + 10000],
+                )
+                for s in range(0, len(ids), 10000)
+            )
+            info = export_collection(
+                batches,
+                os.path.join(work_dir, quantizer),
+                "bench",
+                quantizer=quantizer,
+                pq_m=args.pq_m,
+            )
+            output = subprocess.run(
+                [
+                    sys.executable,
+                    __file__,
+                    "--probe",
+                    info["path"],
+                    "--queries-file",
+                    queries_path,
+                    "--k",
+                    str(args.k),
+                    "--nprobe",
+                    *map(str, args.nprobe),
+                ],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            report = json.loads(output.strip().splitlines()[-1])
+            for nprobe, result in report["results"].items():
+                label = f"{info['index']} nprobe={nprobe}"
+                print_row(
+                    label,
+                    result["found"],
+                    truth,
+                    result["latencies"],
+                    report["after"],
+                    info["size_bytes"] / 2**20,
+                )
+            grown = report["loaded"]["VmRSS"] - report["before"]["VmRSS"]
+            print(
+                f"{'':>24} 构建 {info['seconds']} 秒；"
+                f"打开后 RSS 增加 {grown / 1024:.1f} MB"
+            )
+
+        if args.from_pgvector:
+            result = asyncio.run(bench_pgvector(args.collection, queries, args.k))
+            print_row("PGVector", result["found"], truth, result["latencies"], {}, 0.0)
+            print(f"{'':>24} PGVector 的内存在数据库服务端，RssAnon / RssFile 不可比")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="全局集合导出索引基准")
+    parser.add_argument("--size", type=int, default=100000, help="合成数据的向量数")
+    parser.add_argument("--dim", type=int, default=768, help="合成数据的向量维度")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=settings.RETRIEVAL_K)
+    parser.add_argument(
+        "--nprobe", type=int, nargs="+", default=[8, settings.FAISS_IVF_NPROBE, 64]
+    )
+    parser.add_argument("--quantizers", nargs="+", default=["sq8", "pq"])
+    parser.add_argument(
+        "--pq-m",
+        type=int,
+        default=settings.GLOBAL_INDEX_PQ_M,
+        help="PQ 子向量个数，需整除维度",
+    )
+    parser.add_argument(
+        "--from-pgvector",
+        action="store_true",
+        help="使用数据库中的全局集合并测量 PGVector 检索",
+    )
+    parser.add_argument("--collection", default=settings.COLLECTION_NAME)
+    parser.add_argument("--probe", help=argparse.SUPPRESS)
+    parser.add_argument("--queries-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.probe:
+        probe(args)
+    else:
+        main(args)
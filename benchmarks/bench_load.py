@@ -0,0 +1,586 @@
+# benchmarks/bench_load.py
+"""
+端到端压测：启动模拟的 OpenAI 兼容 LLM 服务（fake_llm_server.py）和 uvicorn 运行的应用，
+按给定并发驱动 /query、/stream-query 和 /upload，报告吞吐 (RPS)、延迟 p50/p95/p99、
+流式接口的首 token 时间 (TTFT)、token 事件间隔与每个答案的事件数，以及服务进程的 RSS。
+结果保存为 JSON，可用 --compare 对比两次运行。
+
+向量检索默认使用本地 FAISS 目录代替 PGVector：
+启动前用 benchmarks/data/rerank_corpus.json 的段落填充全局集合（需要嵌入模型）；
+--vector-store pgvector 时直接使用数据库中已有的数据。
+用户、上传任务和问答历史写入 DB_* 配置的 PostgreSQL
+（可用 docker-compose up db 启动，并先执行 db_init.py）。
+压测期间不启动摄取 worker，上传只测量接收和入队，结束后删除本次压测创建的任务。
+
+用法:
+    python benchmarks/bench_load.py --concurrency 8 32 --requests 200
+    python benchmarks/bench_load.py --scenarios stream --token-rate 30 \\
+        --first-token-ms 500 --workers 2
+    python benchmarks/bench_load.py \\
+        --compare benchmarks/results/before.json benchmarks/results/after.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import httpx  # noqa: E402
+
+from benchmarks.fake_llm_server import free_port  # noqa: E402
+
+SCENARIOS = ("query", "stream", "upload")
+CORPUS_PATH = ROOT / "benchmarks" / "data" / "rerank_corpus.json"
+
+
+def percentiles(values: list[float]) -> dict:
+    if not values:
+        return {}
+    values = sorted(values)
+
+    def pick(q: float) -> float:
+        return round(values[min(int(len(values) * q), len(values) - 1)], 3)
+
+    return {
+        "p50": pick(0.5),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "max": round(values[-1], 3),
+    }
+
+
+def seed_faiss_store(faiss_dir: str, collection_name: str, model_name: str) -> int:
+    """把基准语料写入 FAISS 目录，作为全局集合"""
+    from langchain_core.documents import Document
+
+    from app.services.embedding_service import get_embeddings
+    from app.services.vector_stores.faiss_store import FaissBackend
+
+    passages = json.loads(CORPUS_PATH.read_text(encoding="utf-8"))["passages"]
+    documents = [
+        Document(
+            id=p["id"],
+            page_content=p["text"],
+            metadata={"source": "rerank_corpus.json", "passage": p["id"]},
+        )
+        for p in passages
+    ]
+    vectors = get_embeddings(model_name).embed_documents(
+        [doc.page_content for doc in documents]
+    )
+    writer = FaissBackend(faiss_dir).open_writer(collection_name, model_name)
+    try:
+        writer.write(documents, vectors)
+        writer.commit_file(
+            "rerank_corpus.json",
+            "bench",
+            [doc.id for doc in documents],
+            [],
+            is_new=True,
+        )
+    finally:
+        writer.close()
+    return len(documents)
+
+
+def process_rss_mb(root_pid: int) -> dict[int, float]:
+    """uvicorn 主进程及其全部子进程（worker）的 RSS"""
+    result, pending = {}, [root_pid]
+    while pending:
+        pid = pending.pop()
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        result[pid] = int(line.split()[1]) / 1024
+            with open(f"/proc/{pid}/task/{pid}/children") as f:
+                pending.extend(int(child) for child in f.read().split())
+        except FileNotFoundError:
+            continue
+    return result
+
+
+class RssSampler:
+    """压测期间定期采样服务进程的 RSS，记录峰值"""
+
+    def __init__(self, pid: int, interval: float = 0.5):
+        self.pid = pid
+        self.interval = interval
+        self.peak_total = 0.0
+        self.peak_per_process = 0.0
+        self._task = None
+
+    def sample(self) -> dict[int, float]:
+        rss = process_rss_mb(self.pid)
+        self.peak_total = max(self.peak_total, sum(rss.values()))
+        self.peak_per_process = max([self.peak_per_process, *rss.values()])
+        return rss
+
+    async def _run(self) -> None:
+        while True:
+            self.sample()
+            await asyncio.sleep(self.interval)
+
+    def __enter__(self):
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    def __exit__(self, *exc):
+        self._task.cancel()
+
+    def as_dict(self) -> dict:
+        end = self.sample()
+        return {
+            "peak_total": round(self.peak_total, 1),
+            "peak_per_process": round(self.peak_per_process, 1),
+            "end_total": round(sum(end.values()), 1),
+            "processes": len(end),
+        }
+
+
+class ScenarioResult:
+    def __init__(self):
+        self.latencies_ms: list[float] = []
+        self.ttft_ms: list[float] = []
+        self.inter_token_ms: list[float] = []
+        # 每个流式答案的 token 事件数（即响应写入次数）
+        self.token_events: list[float] = []
+        self.statuses: Counter = Counter()
+
+    def as_dict(self, seconds: float) -> dict:
+        ok = self.statuses.get(200, 0) + self.statuses.get(202, 0)
+        result = {
+            "requests": sum(self.statuses.values()),
+            "ok": ok,
+            "statuses": {
+                str(status): count for status, count in sorted(self.statuses.items())
+            },
+            "seconds": round(seconds, 3),
+            "rps": round(ok / seconds, 2) if seconds else 0.0,
+            "latency_ms": percentiles(self.latencies_ms),
+        }
+        if self.ttft_ms:
+            result["ttft_ms"] = percentiles(self.ttft_ms)
+            result["inter_token_ms"] = percentiles(self.inter_token_ms)
+            result["token_events"] = percentiles(self.token_events)
+        return result
+
+
+async def run_query(
+    client: httpx.AsyncClient, question: str, result: ScenarioResult
+) -> None:
+    start = time.perf_counter()
+    response = await client.post("/api/v1/query", json={"question": question})
+    result.latencies_ms.append((time.perf_counter() - start) * 1000)
+    result.statuses[response.status_code] += 1
+
+
+async def run_stream(
+    client: httpx.AsyncClient, question: str, result: ScenarioResult
+) -> None:
+    """
+    逐个读取 SSE 事件：首个 token 事件的到达时间为 TTFT，
+    相邻 token 事件的间隔为 token 间隔
+    """
+    start = time.perf_counter()
+    arrivals = []
+    async with client.stream(
+        "POST", "/api/v1/stream-query", json={"question": question}
+    ) as response:
+        async for line in response.aiter_lines():
+            if line == "event: token":
+                arrivals.append(time.perf_counter())
+        status = response.status_code
+    result.latencies_ms.append((time.perf_counter() - start) * 1000)
+    result.statuses[status] += 1
+    if status == 200 and arrivals:
+        result.ttft_ms.append((arrivals[0] - start) * 1000)
+        result.inter_token_ms.extend(
+            (b - a) * 1000 for a, b in zip(arrivals, arrivals[1:])
+        )
+        result.token_events.append(len(arrivals))
+
+
+def make_upload_body(i: int, size_kb: int) -> bytes:
+    # 每个文件内容都不同，避免被当作重复文件直接拒绝
+    return (
+        b"%PDF-1.4\n"
+        + f"% bench upload {i} {time.time_ns()}\n".encode()
+        + os.urandom(size_kb * 1024)
+    )
+
+
+async def run_upload(
+    client: httpx.AsyncClient, i: int, size_kb: int, result: ScenarioResult
+) -> None:
+    start = time.perf_counter()
+    response = await client.post(
+        "/api/v1/upload",
+        files={
+            "file": (f"bench_{i}.pdf", make_upload_body(i, size_kb), "application/pdf")
+        },
+    )
+    result.latencies_ms.append((time.perf_counter() - start) * 1000)
+    result.statuses[response.status_code] += 1
+
+
+async def drive(
+    client, scenario: str, concurrency: int, requests: int, questions: list[str], args
+) -> ScenarioResult:
+    """concurrency 个并发循环共同完成 requests 个请求"""
+    result = ScenarioResult()
+    counter = iter(range(requests))
+
+    async def loop():
+        for i in counter:
+            question = questions[i % len(questions)]
+            if scenario == "query":
+                await run_query(client, question, result)
+            elif scenario == "stream":
+                await run_stream(client, question, result)
+            else:
+                await run_upload(client, i, args.upload_kb, result)
+
+    await asyncio.gather(*(loop() for _ in range(concurrency)))
+    return result
+
+
+async def wait_until_ready(
+    client: httpx.AsyncClient, process: subprocess.Popen, timeout: float
+) -> float:
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if process.poll() is not None:
+            raise RuntimeError("应用进程已退出")
+        try:
+            if (await client.get("/readyz")).status_code == 200:
+                return time.perf_counter() - start
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"应用在 {timeout} 秒内未就绪")
+
+
+async def login(client: httpx.AsyncClient, username: str, password: str) -> str:
+    response = await client.post(
+        "/api/v1/users/", json={"username": username, "password": password}
+    )
+    if response.status_code not in (201, 400):
+        response.raise_for_status()
+    response = await client.post(
+        "/api/v1/token", data={"username": username, "password": password}
+    )
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+def delete_bench_jobs(username: str) -> None:
+    """删除本次压测上传产生的排队任务，避免之后启动的 worker 去处理它们"""
+    from sqlalchemy import delete, select
+
+    from app.db.session import SessionLocal
+    from app.models.ingestion import IngestionJob
+    from app.models.user import User
+
+    with SessionLocal() as db:
+        user_id = db.execute(
+            select(User.id).where(User.username == username)
+        ).scalar_one_or_none()
+        if user_id is not None:
+            db.execute(delete(IngestionJob).where(IngestionJob.user_id == user_id))
+            db.commit()
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_result(row: dict) -> None:
+    latency, ttft, itl = (
+        row["latency_ms"],
+        row.get("ttft_ms", {}),
+        row.get("inter_token_ms", {}),
+    )
+    events = row.get("token_events", {})
+    print(
+        f"{row['scenario']:>7} {row['concurrency']:>5} "
+        f"{row['ok']:>5}/{row['requests']:<5} {row['rps']:>8.2f} "
+        f"{latency.get('p50', 0):>9.1f} {latency.get('p95', 0):>9.1f} "
+        f"{latency.get('p99', 0):>9.1f} "
+        f"{ttft.get('p50', 0):>9.1f} {ttft.get('p99', 0):>9.1f} "
+        f"{itl.get('p50', 0):>8.1f} {itl.get('p99', 0):>8.1f} "
+        f"{events.get('p50', 0):>6.0f} {row['rss_mb']['peak_total']:>9.1f}"
+    )
+
+
+def print_header() -> None:
+    print(
+        f"{'场景':>7} {'并发':>5} {'成功/请求':>11} {'RPS':>8} "
+        f"{'p50(ms)':>9} {'p95(ms)':>9} {'p99(ms)':>9} "
+        f"{'TTFT50':>9} {'TTFT99':>9} {'ITL50':>8} {'ITL99':>8} "
+        f"{'事件数':>6} {'RSS峰值MB':>9}"
+    )
+
+
+async def run(args) -> dict:
+    work_dir = tempfile.mkdtemp(prefix="bench_load_")
+    faiss_dir = os.path.join(work_dir, "faiss")
+    upload_dir = os.path.join(work_dir, "uploads")
+    os.makedirs(upload_dir)
+
+    from app.core.config import settings
+
+    if args.vector_store == "faiss":
+        count = seed_faiss_store(
+            faiss_dir, settings.COLLECTION_NAME, settings.EMBEDDING_MODEL_NAME
+        )
+        print(f"已向 FAISS 写入 {count} 个文本块: {faiss_dir}")
+
+    llm_port, app_port = free_port(), free_port()
+    llm_server = subprocess.Popen(
+        [
+            sys.executable,
+            str(ROOT / "benchmarks" / "fake_llm_server.py"),
+            "--port",
+            str(llm_port),
+            "--tokens",
+            str(args.tokens),
+            "--token-rate",
+            str(args.token_rate),
+            "--first-token-ms",
+            str(args.first_token_ms),
+        ]
+    )
+    env = {
+        **os.environ,
+        "APP_PROFILE": "full",
+        "VECTOR_STORE_TYPE": args.vector_store,
+        "FAISS_INDEX_DIR": faiss_dir,
+        "GLOBAL_INDEX_ENABLED": "false",
+        "LLM_BASE_URL": f"http://127.0.0.1:{llm_port}",
+        "DEEPSEEK_API_KEY": "bench-fake-key",
+        "RETRIEVAL_MODE": "vector"
+        if args.vector_store == "faiss"
+        else settings.RETRIEVAL_MODE,
+        "ENABLE_CACHE": "true" if args.answer_cache else "false",
+        "UPLOAD_DIR": upload_dir,
+        # 压测期间没有 worker 消费队列，放开排队上限以测量接收本身
+        "INGEST_QUEUE_MAX_PENDING": "1000000",
+        "INGEST_QUEUE_MAX_PENDING_PER_USER": "1000000",
+    }
+    app_server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.main:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(app_port),
+            "--workers",
+            str(args.workers),
+            "--log-level",
+            "warning",
+        ],
+        cwd=ROOT,
+        env=env,
+    )
+    username = f"bench_load_{int(time.time())}"
+    questions = [
+        q["question"]
+        for q in json.loads(CORPUS_PATH.read_text(encoding="utf-8"))["queries"]
+    ]
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "config": {
+            "workers": args.workers,
+            "vector_store": args.vector_store,
+            "tokens": args.tokens,
+            "token_rate": args.token_rate,
+            "first_token_ms": args.first_token_ms,
+            "answer_cache": args.answer_cache,
+            "upload_kb": args.upload_kb,
+            "requests": args.requests,
+            "embedding_model": settings.EMBEDDING_MODEL_NAME,
+            "llm_max_concurrency": settings.LLM_MAX_CONCURRENCY,
+        },
+        "results": [],
+    }
+    try:
+        limits = httpx.Limits(max_connections=max(args.concurrency) * 2)
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{app_port}", timeout=600, limits=limits
+        ) as client:
+            report["ready_seconds"] = round(
+                await wait_until_ready(client, app_server, args.startup_timeout), 2
+            )
+            report["idle_rss_mb"] = round(
+                sum(process_rss_mb(app_server.pid).values()), 1
+            )
+            print(
+                f"应用已就绪（{report['ready_seconds']} 秒），"
+                f"空闲 RSS {report['idle_rss_mb']} MB\n"
+            )
+            client.headers["Authorization"] = (
+                f"Bearer {await login(client, username, 'bench_password')}"
+            )
+
+            print_header()
+            for scenario in args.scenarios:
+                for concurrency in args.concurrency:
+                    # 预热：建立连接、填充各级缓存，不计入结果
+                    await drive(
+                        client, scenario, concurrency, concurrency, questions, args
+                    )
+                    with RssSampler(app_server.pid) as sampler:
+                        start = time.perf_counter()
+                        result = await drive(
+                            client,
+                            scenario,
+                            concurrency,
+                            args.requests,
+                            questions,
+                            args,
+                        )
+                        seconds = time.perf_counter() - start
+                    row = {
+                        "scenario": scenario,
+                        "concurrency": concurrency,
+                        **result.as_dict(seconds),
+                        "rss_mb": sampler.as_dict(),
+                    }
+                    report["results"].append(row)
+                    print_result(row)
+            report["server_stats"] = (await client.get("/api/v1/stats")).json()
+    finally:
+        app_server.terminate()
+        llm_server.terminate()
+        app_server.wait()
+        llm_server.wait()
+        if "upload" in args.scenarios:
+            try:
+                delete_bench_jobs(username)
+            except Exception as e:
+                print(f"清理压测上传任务失败: {e}")
+    return report
+
+
+def compare(before_path: str, after_path: str) -> None:
+    """按 (场景, 并发) 对比两次运行的吞吐和延迟"""
+    before, after = (
+        json.loads(Path(p).read_text(encoding="utf-8"))
+        for p in (before_path, after_path)
+    )
+    rows = {(r["scenario"], r["concurrency"]): r for r in before["results"]}
+    print(
+        f"{before_path} ({before['git_commit']}) -> "
+        f"{after_path} ({after['git_commit']})\n"
+    )
+    print(
+        f"{'场景':>7} {'并发':>5} {'RPS':>18} "
+        f"{'p50(ms)':>18} {'p99(ms)':>18} {'TTFT50(ms)':>18}"
+    )
+
+    def cell(old, new) -> str:
+        if old is None or new is None:
+            return f"{'-':>18}"
+        change = f"{(new - old) / old:+.0%}" if old else ""
+        return f"{old:>7.1f}→{new:<7.1f}{change:>4}"
+
+    for row in after["results"]:
+        old = rows.get((row["scenario"], row["concurrency"]))
+        if old is None:
+            continue
+        old_ttft, new_ttft = old.get("ttft_ms", {}), row.get("ttft_ms", {})
+        print(
+            f"{row['scenario']:>7} {row['concurrency']:>5} "
+            f"{cell(old['rps'], row['rps'])} "
+            f"{cell(old['latency_ms'].get('p50'), row['latency_ms'].get('p50'))} "
+            f"{cell(old['latency_ms'].get('p99'), row['latency_ms'].get('p99'))} "
+            f"{cell(old_ttft.get('p50'), new_ttft.get('p50'))}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="端到端压测")
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS)
+    )
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument(
+        "--requests", type=int, default=100, help="每个场景、每个并发度的请求数"
+    )
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker 进程数")
+    parser.add_argument(
+        "--vector-store", choices=["faiss", "pgvector"], default="faiss"
+    )
+    parser.add_argument(
+        "--tokens", type=int, default=64, help="模拟上游每个答案的 token 数"
+    )
+    parser.add_argument(
+        "--token-rate",
+        type=float,
+        default=50.0,
+        help="模拟上游每秒输出的 token 数，0 表示不限速",
+    )
+    parser.add_argument(
+        "--first-token-ms", type=float, default=200.0, help="模拟上游首个 token 的延迟"
+    )
+    parser.add_argument(
+        "--answer-cache",
+        action="store_true",
+        help="启用答案缓存（默认关闭，每个问题都调用上游）",
+    )
+    parser.add_argument("--upload-kb", type=int, default=256, help="每个上传文件的大小")
+    parser.add_argument(
+        "--startup-timeout", type=float, default=300.0, help="等待 /readyz 的最长时间"
+    )
+    parser.add_argument(
+        "--output", help="结果 JSON 路径，默认 benchmarks/results/load_<时间>.json"
+    )
+    parser.add_argument(
+        "--compare",
+        nargs=2,
+        metavar=("BEFORE", "AFTER"),
+        help="对比两次运行的结果 JSON",
+    )
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    report = asyncio.run(run(args))
+    output = Path(
+        args.output
+        or ROOT / "benchmarks" / "results" / f"load_{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(
+        json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8"
+    )
+    print(f"\n结果已保存: {output}")
+
+
+if __name__ == "__main__":
+    main()
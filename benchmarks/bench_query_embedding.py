@@ -0,0 +1,137 @@
+# benchmarks/bench_query_embedding.py
+"""
+查询向量化吞吐基准：对比“每个请求单独向量化”与“微批处理”两种方式
+在 1 / 8 / 64 个并发用户下的吞吐和延迟。
+
+用法:
+    python benchmarks/bench_query_embedding.py                 # 使用模拟编码器
+    python benchmarks/bench_query_embedding.py --model shibing624/text2vec-base-chinese
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.embedding_service import (  # noqa: E402
+    QueryEmbeddingBatcher,
+    get_embeddings,
+)
+
+
+class SimulatedEmbeddings:
+    """
+    模拟 BERT-base 在 CPU 上的耗时特征：
+    每次前向计算有固定开销，批内每多一个文本只增加少量耗时。
+    """
+
+    def __init__(self, call_overhead_ms: float, per_text_ms: float, dim: int = 768):
+        self.call_overhead = call_overhead_ms / 1000
+        self.per_text = per_text_ms / 1000
+        self.dim = dim
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        time.sleep(self.call_overhead + self.per_text * len(texts))
+        return [[float(len(t))] * self.dim for t in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+
+class BenchBatcher(QueryEmbeddingBatcher):
+    def __init__(self, embeddings, **kwargs):
+        super().__init__(model_name="bench", device="cpu", **kwargs)
+        self._embeddings = embeddings
+
+    def _encode(self, texts):
+        return self._embeddings.embed_documents(texts)
+
+
+async def run_users(embed, users: int, queries_per_user: int) -> dict:
+    latencies = []
+
+    async def user(user_id: int):
+        for i in range(queries_per_user):
+            start = time.perf_counter()
+            await embed(f"用户{user_id} 的第 {i} 个问题：操作系统如何调度进程？")
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user(u) for u in range(users)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "qps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+async def main(args):
+    if args.model:
+        embeddings = get_embeddings(args.model)
+        embeddings.embed_query("预热")
+        encoder_desc = args.model
+    else:
+        embeddings = SimulatedEmbeddings(args.call_overhead_ms, args.per_text_ms)
+        encoder_desc = (
+            f"模拟编码器 (固定开销 {args.call_overhead_ms}ms, "
+            f"每条 {args.per_text_ms}ms)"
+        )
+
+    print(
+        f"编码器: {encoder_desc}, 线程数: {args.workers}, "
+        f"批处理窗口: {args.window_ms}ms\n"
+    )
+    print(f"{'并发用户':>8} {'方式':>8} {'QPS':>10} {'p50(ms)':>10} {'p99(ms)':>10}")
+
+    for users in args.users:
+        queries = max(args.total_queries // users, 1)
+
+        executor = ThreadPoolExecutor(max_workers=args.workers)
+        loop = asyncio.get_running_loop()
+
+        async def direct(text):
+            return await loop.run_in_executor(executor, embeddings.embed_query, text)
+
+        direct_result = await run_users(direct, users, queries)
+        print(
+            f"{users:>8} {'逐条':>8} {direct_result['qps']:>10.1f} "
+            f"{direct_result['p50_ms']:>10.1f} {direct_result['p99_ms']:>10.1f}"
+        )
+
+        batcher = BenchBatcher(
+            embeddings,
+            max_batch_size=args.batch_size,
+            window_seconds=args.window_ms / 1000,
+            cache_size=1,  # 问题各不相同，避免缓存影响结果
+            executor=executor,
+        )
+        batched_result = await run_users(batcher.embed, users, queries)
+        stats = batcher.stats()
+        print(
+            f"{users:>8} {'微批':>8} {batched_result['qps']:>10.1f} "
+            f"{batched_result['p50_ms']:>10.1f} {batched_result['p99_ms']:>10.1f}"
+            f"   (平均批大小 {stats['avg_batch_size']:.1f})"
+        )
+        executor.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="查询向量化吞吐基准")
+    parser.add_argument(
+        "--model", help="使用真实的 HuggingFace 模型，不指定则使用模拟编码器"
+    )
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 8, 64])
+    parser.add_argument("--total-queries", type=int, default=512)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--window-ms", type=float, default=5.0)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--call-overhead-ms", type=float, default=10.0)
+    parser.add_argument("--per-text-ms", type=float, default=1.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,98 @@
+# benchmarks/bench_startup.py
+"""
+启动基准：用 python -X importtime 在全新的子进程中导入 app.main，
+分别统计 full 与 auth 两种 APP_PROFILE 的总导入耗时、耗时最多的顶层模块，
+以及是否意外导入了模型相关的重量级依赖。
+
+用法:
+    python benchmarks/bench_startup.py
+    # 超过上限时以非零状态退出，可用于 CI
+    python benchmarks/bench_startup.py --profiles auth --max-seconds 1.0
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# 认证 worker 不应导入的模块（首次导入就要数百毫秒到数秒）
+HEAVY_MODULES = (
+    "torch",
+    "transformers",
+    "sentence_transformers",
+    "langchain",
+    "langchain_openai",
+    "langchain_huggingface",
+    "langchain_postgres",
+    "openai",
+    "faiss",
+    "fitz",
+    "numpy",
+)
+
+
+def measure(profile: str, module: str) -> dict:
+    """在子进程中导入 module，返回总耗时（秒）、各顶层包的累计耗时和导入的重量级模块"""
+    env = {**os.environ, "APP_PROFILE": profile, "PYTHONDONTWRITEBYTECODE": "1"}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    packages: dict[str, int] = {}
+    total_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, _, name = (
+            part.strip() for part in line[len("import time:") :].split("|")
+        )
+        if not self_us.isdigit():
+            continue  # 表头
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0) + int(self_us)
+        total_us += int(self_us)
+    heavy = sorted(p for p in packages if p in HEAVY_MODULES)
+    return {"seconds": total_us / 1e6, "packages": packages, "heavy": heavy}
+
+
+def main(args) -> int:
+    failed = False
+    for profile in args.profiles:
+        runs = [measure(profile, args.module) for _ in range(args.repeat)]
+        seconds = statistics.median(run["seconds"] for run in runs)
+        top = sorted(runs[-1]["packages"].items(), key=lambda item: -item[1])[
+            : args.top
+        ]
+        print(
+            f"APP_PROFILE={profile}: 导入 {args.module} "
+            f"耗时中位数 {seconds:.3f} 秒（{args.repeat} 次）"
+        )
+        print(
+            "  耗时最多的顶层包: "
+            + ", ".join(f"{name} {us / 1000:.0f}ms" for name, us in top)
+        )
+        print(f"  重量级依赖: {', '.join(runs[-1]['heavy']) or '无'}")
+        if args.max_seconds is not None and seconds > args.max_seconds:
+            print(f"  超过上限 {args.max_seconds} 秒")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="启动导入耗时基准")
+    parser.add_argument("--profiles", nargs="+", default=["full", "auth"])
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument(
+        "--max-seconds", type=float, help="任一配置的导入耗时超过该值时以非零状态退出"
+    )
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,162 @@
+# benchmarks/bench_upload_memory.py
+"""
+上传内存基准：对比“整块读入内存再写临时文件”与“流式写盘”两种上传方式，
+在 N 个并发上传（默认 20 个 50 MB 文件）下服务进程的峰值 RSS。
+
+每种方式在独立的 uvicorn 子进程中运行，上传结束后读取该进程的 ru_maxrss。
+
+用法:
+    python benchmarks/bench_upload_memory.py
+    python benchmarks/bench_upload_memory.py --uploads 20 --size-mb 50
+"""
+
+import argparse
+import asyncio
+import os
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def create_app(mode: str, upload_dir: str):
+    from fastapi import FastAPI, File, Request, UploadFile
+
+    from app.services.upload_service import save_pdf_upload
+
+    app = FastAPI()
+
+    if mode == "buffered":
+        # 原实现：await file.read() 把整个文件读入内存，再写入临时文件
+        @app.post("/upload")
+        async def upload(file: UploadFile = File(...)):
+            content = await file.read()
+            with tempfile.NamedTemporaryFile(
+                delete=False, suffix=".pdf", dir=upload_dir
+            ) as tmp:
+                tmp.write(content)
+            return {"size": len(content)}
+    else:
+
+        @app.post("/upload")
+        async def upload(request: Request):
+            saved = await save_pdf_upload(
+                request.headers, request.stream(), upload_dir, max_bytes=1024**3
+            )
+            return {"size": saved.size}
+
+    @app.get("/rss")
+    def rss():
+        # Linux 上 ru_maxrss 的单位是 KB
+        return {
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        }
+
+    return app
+
+
+def serve(mode: str, port: int, upload_dir: str) -> None:
+    import uvicorn
+
+    uvicorn.run(
+        create_app(mode, upload_dir), host="127.0.0.1", port=port, log_level="warning"
+    )
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def wait_until_ready(client, base_url: str) -> float:
+    for _ in range(200):
+        try:
+            return (await client.get(f"{base_url}/rss")).json()["peak_rss_mb"]
+        except Exception:
+            await asyncio.sleep(0.05)
+    raise RuntimeError("服务未能启动")
+
+
+async def run_mode(mode: str, sample_path: str, uploads: int, work_dir: str) -> dict:
+    import httpx
+
+    port = free_port()
+    upload_dir = os.path.join(work_dir, mode)
+    os.makedirs(upload_dir)
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            __file__,
+            "--serve",
+            mode,
+            "--port",
+            str(port),
+            "--upload-dir",
+            upload_dir,
+        ]
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        async with httpx.AsyncClient(timeout=600) as client:
+            idle_rss = await wait_until_ready(client, base_url)
+
+            async def upload_one(i: int):
+                with open(sample_path, "rb") as f:
+                    response = await client.post(
+                        f"{base_url}/upload",
+                        files={"file": (f"doc{i}.pdf", f, "application/pdf")},
+                    )
+                response.raise_for_status()
+
+            start = time.perf_counter()
+            await asyncio.gather(*(upload_one(i) for i in range(uploads)))
+            elapsed = time.perf_counter() - start
+            peak_rss = (await client.get(f"{base_url}/rss")).json()["peak_rss_mb"]
+    finally:
+        server.terminate()
+        server.wait()
+    return {"idle_rss_mb": idle_rss, "peak_rss_mb": peak_rss, "seconds": elapsed}
+
+
+async def main(args) -> None:
+    work_dir = tempfile.mkdtemp(prefix="bench_upload_")
+    try:
+        sample_path = os.path.join(work_dir, "sample.pdf")
+        with open(sample_path, "wb") as f:
+            f.write(b"%PDF-1.4\n")
+            for _ in range(args.size_mb):
+                f.write(os.urandom(1024 * 1024))
+
+        print(f"{args.uploads} 个并发上传，每个 {args.size_mb} MB\n")
+        print(f"{'方式':>10} {'空闲RSS(MB)':>12} {'峰值RSS(MB)':>12} {'耗时(秒)':>10}")
+        for mode in ("buffered", "streaming"):
+            result = await run_mode(mode, sample_path, args.uploads, work_dir)
+            print(
+                f"{mode:>10} {result['idle_rss_mb']:>12.1f} "
+                f"{result['peak_rss_mb']:>12.1f} {result['seconds']:>10.1f}"
+            )
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="上传内存基准")
+    parser.add_argument("--uploads", type=int, default=20)
+    parser.add_argument("--size-mb", type=int, default=50)
+    parser.add_argument(
+        "--serve", choices=["buffered", "streaming"], help=argparse.SUPPRESS
+    )
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--upload-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve(args.serve, args.port, args.upload_dir)
+    else:
+        asyncio.run(main(args))
@@ -0,0 +1,162 @@
+# benchmarks/fake_llm_server.py
+"""
+模拟的 OpenAI 兼容 LLM 服务，压测时代替真实上游，使结果不受上游波动和费用影响。
+
+实现 POST /chat/completions（以及 /v1/chat/completions）的普通和流式 (SSE) 两种响应：
+首个 token 前等待 --first-token-ms 毫秒，
+之后按每秒 --token-rate 个的速度输出 --tokens 个 token（--token-rate 0 表示不限速）。
+答案内容固定，便于测试断言。
+
+用法:
+    python benchmarks/fake_llm_server.py --port 9000 --tokens 200 \\
+        --token-rate 50 --first-token-ms 300
+    LLM_BASE_URL=http://127.0.0.1:9000 DEEPSEEK_API_KEY=fake uvicorn app.main:app
+"""
+
+import argparse
+import asyncio
+import json
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Iterator
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+ANSWER_TEXT = "这是模拟上游生成的答案。"
+
+
+def fake_answer_tokens(tokens: int) -> list[str]:
+    """模拟服务输出的 token 序列：循环取 ANSWER_TEXT 中的字符"""
+    return [ANSWER_TEXT[i % len(ANSWER_TEXT)] for i in range(tokens)]
+
+
+def create_app(
+    tokens: int = 64, token_rate: float = 50.0, first_token_ms: float = 200.0
+) -> FastAPI:
+    app = FastAPI()
+    app.state.stats = {"requests": 0, "streams": 0, "in_flight": 0, "peak_in_flight": 0}
+    interval = 1 / token_rate if token_rate > 0 else 0.0
+    answer = fake_answer_tokens(tokens)
+
+    def chunk(completion_id: str, model: str, delta: dict, finish_reason=None) -> str:
+        payload = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+    async def stream(completion_id: str, model: str):
+        stats = app.state.stats
+        try:
+            await asyncio.sleep(first_token_ms / 1000)
+            yield chunk(completion_id, model, {"role": "assistant", "content": ""})
+            for i, token in enumerate(answer):
+                if i:
+                    await asyncio.sleep(interval)
+                yield chunk(completion_id, model, {"content": token})
+            yield chunk(completion_id, model, {}, finish_reason="stop")
+            yield "data: [DONE]\n\n"
+        finally:
+            stats["in_flight"] -= 1
+
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats = app.state.stats
+        stats["requests"] += 1
+        stats["in_flight"] += 1
+        stats["peak_in_flight"] = max(stats["peak_in_flight"], stats["in_flight"])
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        model = body.get("model", "fake")
+        if body.get("stream"):
+            stats["streams"] += 1
+            return StreamingResponse(
+                stream(completion_id, model), media_type="text/event-stream"
+            )
+        try:
+            await asyncio.sleep(
+                first_token_ms / 1000 + interval * max(len(answer) - 1, 0)
+            )
+        finally:
+            stats["in_flight"] -= 1
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(answer)},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": 0,
+                "completion_tokens": len(answer),
+                "total_tokens": len(answer),
+            },
+        }
+
+    app.add_api_route("/chat/completions", chat_completions, methods=["POST"])
+    app.add_api_route("/v1/chat/completions", chat_completions, methods=["POST"])
+    app.add_api_route("/stats", lambda: app.state.stats, methods=["GET"])
+    return app
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def serve_in_thread(app: FastAPI) -> Iterator[str]:
+    """在后台线程中运行服务（供测试使用），返回其 base_url"""
+    import uvicorn
+
+    config = uvicorn.Config(
+        app, host="127.0.0.1", port=free_port(), log_level="warning"
+    )
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("模拟 LLM 服务未能启动")
+        time.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{config.port}"
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="模拟的 OpenAI 兼容 LLM 服务")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--tokens", type=int, default=64, help="每个答案的 token 数")
+    parser.add_argument(
+        "--token-rate",
+        type=float,
+        default=50.0,
+        help="每秒输出的 token 数，0 表示不限速",
+    )
+    parser.add_argument(
+        "--first-token-ms", type=float, default=200.0, help="首个 token 之前的等待时间"
+    )
+    args = parser.parse_args()
+    uvicorn.run(
+        create_app(args.tokens, args.token_rate, args.first_token_ms),
+        host="127.0.0.1",
+        port=args.port,
+        log_level="warning",
+    )
@@ -1,5 +1,7 @@
 from app.db.session import engine
 from app.models.user import Base # 导入我们定义 User 模型的 Base
+import app.models.ingestion # noqa: F401  注册摄取清单表和任务队列表
+import app.models.history # noqa: F401  注册问答历史表
 
 def init_db():
     print("正在创建数据库表...")
@@ -8,4 +10,4 @@ def init_db():
     print("数据库表创建成功！")
 
 if __name__ == "__main__":
-    init_db()
\ No newline at end of file
+    init_db()
@@ -1,44 +1,140 @@
 # ingest.py
+import argparse
+import os
 from pathlib import Path
-from app.services.ingestion_service import process_and_embed_document
+from app.services.bulk_ingestion_service import SourceFile, ingest_files
+from app.services.vector_stores.global_index import export_global_index
 from app.core.config import settings
+from app.core.logging_config import configure_logging
 
-def ingest_all_documents():
+def source_file(path: Path, data_dir: str) -> SourceFile:
     """
-    遍历 data 目录下的所有 PDF,并调用核心服务进行处理。
+    清单以相对 data 目录的路径为键，
+    同一目录换一种写法（./data、绝对路径）或整体移动后仍能对上。
+    以前的版本以命令行中的原样路径（如 data/a.pdf）作为来源，
+    文件首次摄取时一并删除这些旧文本块，避免检索返回重复内容。
     """
-    data_dir = Path("data")
-    total_splits = 0
-    processed_files = 0
+    source = path.relative_to(data_dir).as_posix()
+    legacy = (str(path),) if str(path) != source else ()
+    return SourceFile(path=str(path), source=source, legacy_sources=legacy)
 
-    print("开始扫描并处理 data/ 目录下的所有 PDF 文档...")
+
+def ingest_all_documents(
+    data_dir: str = "data",
+    collection_name: str = settings.COLLECTION_NAME,
+    workers: int = None,
+    batch_size: int = settings.INGEST_EMBEDDING_BATCH_SIZE,
+    dry_run: bool = False,
+    export_global: bool = False,
+):
+    """
+    遍历 data 目录下的所有 PDF，并行解析切分后批量向量化、批量写入数据库。
+    按摄取清单增量处理：未变化的文件跳过，变化的文件只替换变化的文本块，
+    目录中已删除的文件从集合中移除。dry_run 为 True 时只报告会发生的变化。
+    """
+    if not Path(data_dir).is_dir():
+        # 目录不存在时不做任何处理，避免把集合中的文件全部当作已删除
+        print(f"目录 {data_dir}/ 不存在。")
+        return
+
+    print(f"开始扫描并处理 {data_dir}/ 目录下的所有 PDF 文档...")
     # 从 data 目录开始，遍历它自己以及它下面的所有子文件夹，找出所有以 .pdf 结尾的文件
-    pdf_files = list(data_dir.rglob("*.pdf"))
+    pdf_files = sorted(Path(data_dir).rglob("*.pdf"))
 
     if not pdf_files:
-        print("在 data/ 目录下没有找到任何 PDF 文件。")
-        return
+        print(f"在 {data_dir}/ 目录下没有找到任何 PDF 文件。")
 
-    for pdf_path in pdf_files:
-        print("-" * 50)
-        try:
-            num_splits = process_and_embed_document(
-                file_path=str(pdf_path),
-                collection_name=settings.COLLECTION_NAME,
-                embeddings_model_name=settings.EMBEDDING_MODEL_NAME,
-                connection_string=settings.DATABASE_URL
-            )
-            if num_splits > 0:
-                total_splits += num_splits
-                processed_files += 1
-        except Exception as e:
-            print(f"!!! 处理文件 {pdf_path.name} 时发生未知错误: {e}")
+    if workers is None:
+        workers = settings.INGEST_WORKERS or os.cpu_count() or 1
+    print(
+        f"共 {len(pdf_files)} 个文件，解析进程数: {workers}，"
+        f"每批文本块数: {batch_size}"
+    )
+
+    stats = ingest_files(
+        [source_file(p, data_dir) for p in pdf_files],
+        collection_name=collection_name,
+        embeddings_model_name=settings.EMBEDDING_MODEL_NAME,
+        workers=min(workers, len(pdf_files)),
+        batch_size=batch_size,
+        prune_missing=True,
+        dry_run=dry_run,
+    )
 
     print("-" * 50)
+    if dry_run:
+        for change in stats.changes:
+            print(
+                f"{change['status']:>8} {change['source']}: "
+                f"+{change['added_chunks']} / -{change['removed_chunks']} 个文本块"
+            )
     print("\n所有文档处理完毕!")
-    print(f"总共处理了 {processed_files} 个文件。")
-    print(f"总共生成了 {total_splits} 个文本块并存入数据库。")
+    print(stats.summary())
+
+    # 全局集合已经导出过时同步刷新，避免检索读到过期的导出索引
+    global_dir = Path(settings.GLOBAL_INDEX_DIR) / settings.COLLECTION_NAME / "current"
+    if (
+        not dry_run
+        and collection_name == settings.COLLECTION_NAME
+        and (export_global or global_dir.exists())
+    ):
+        export_global_collection()
+
+
+def export_global_collection():
+    """把全局集合导出为量化的只读 FAISS 索引，所有 API worker 通过 mmap 共享"""
+    print(
+        f"开始导出全局集合 {settings.COLLECTION_NAME} "
+        f"到 {settings.GLOBAL_INDEX_DIR}/ ..."
+    )
+    try:
+        info = export_global_index()
+    except ValueError as e:
+        print(f"导出失败: {e}")
+        return
+    print(
+        f"导出完成: {info['count']} 个文本块，索引 {info['index']}，"
+        f"{info['size_bytes'] / 1024 / 1024:.1f} MB，"
+        f"耗时 {info['seconds']} 秒 ({info['path']})"
+    )
 
 
 if __name__ == "__main__":
-    ingest_all_documents()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="批量摄取 PDF 文档到向量数据库")
+    parser.add_argument("--data-dir", default="data", help="PDF 所在目录")
+    parser.add_argument(
+        "--collection", default=settings.COLLECTION_NAME, help="目标集合名称"
+    )
+    parser.add_argument("--workers", type=int, help="解析进程数，0 表示在主进程中解析")
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=settings.INGEST_EMBEDDING_BATCH_SIZE,
+        help="每批向量化的文本块数量",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="只报告新增、变更和删除的文件及文本块，不写入数据库",
+    )
+    parser.add_argument(
+        "--export-global-index",
+        action="store_true",
+        help="摄取完成后把全局集合导出为只读的量化索引",
+    )
+    parser.add_argument(
+        "--export-only", action="store_true", help="不摄取文档，只导出全局集合"
+    )
+    args = parser.parse_args()
+    configure_logging()
+    if args.export_only:
+        export_global_collection()
+    else:
+        ingest_all_documents(
+            args.data_dir,
+            args.collection,
+            args.workers,
+            args.batch_size,
+            args.dry_run,
+            args.export_global_index,
+        )
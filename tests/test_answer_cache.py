@@ -0,0 +1,91 @@
+from langchain_core.documents import Document
+
+from app.services.answer_cache import AnswerCache, normalize_question
+
+COLLECTIONS = ["user_1_collection", "all_documents"]
+DOCS = [
+    Document(id="a", page_content="文本块 A"),
+    Document(id="b", page_content="文本块 B"),
+]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_cache(clock=None):
+    return AnswerCache(
+        maxsize=8, ttl=60, similarity_threshold=0.95, timer=clock or FakeClock()
+    )
+
+
+def test_normalize_question():
+    assert normalize_question("  什么是 操作系统？ ") == normalize_question(
+        "什么是 操作系统"
+    )
+    assert normalize_question("ＡＢＣ  def?") == "abc def"
+
+
+def test_exact_and_semantic_hits():
+    cache = make_cache()
+    cache.store("qa", COLLECTIONS, "什么是操作系统？", [1.0, 0.0], DOCS, ["答案"])
+
+    # 规范化后相同的问题
+    assert cache.lookup("qa", COLLECTIONS, "什么是操作系统", [0.0, 1.0], DOCS) == [
+        "答案"
+    ]
+    # 问法不同但向量足够接近
+    assert cache.lookup("qa", COLLECTIONS, "操作系统是什么", [0.99, 0.05], DOCS) == [
+        "答案"
+    ]
+    # 向量差异较大
+    assert cache.lookup("qa", COLLECTIONS, "如何安装 Python", [0.5, 0.5], DOCS) is None
+
+    stats = cache.stats()
+    assert (stats["exact_hits"], stats["semantic_hits"], stats["misses"]) == (1, 1, 1)
+
+
+def test_different_chunks_or_variant_miss():
+    cache = make_cache()
+    cache.store("qa", COLLECTIONS, "什么是操作系统", [1.0, 0.0], DOCS, ["答案"])
+
+    assert (
+        cache.lookup("qa", COLLECTIONS, "什么是操作系统", [1.0, 0.0], DOCS[:1]) is None
+    )
+    assert (
+        cache.lookup("stream", COLLECTIONS, "什么是操作系统", [1.0, 0.0], DOCS) is None
+    )
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = make_cache(clock)
+    cache.store("qa", COLLECTIONS, "什么是操作系统", [1.0, 0.0], DOCS, ["答案"])
+
+    clock.now = 30
+    assert cache.lookup("qa", COLLECTIONS, "什么是操作系统", [1.0, 0.0], DOCS) == [
+        "答案"
+    ]
+    clock.now = 61
+    assert cache.lookup("qa", COLLECTIONS, "什么是操作系统", [1.0, 0.0], DOCS) is None
+
+
+def test_changed_chunks_miss_without_invalidation():
+    cache = make_cache()
+    cache.store("qa", COLLECTIONS, "什么是操作系统", [1.0, 0.0], DOCS, ["答案"])
+
+    # 重新摄取后内容变化的文本块有新的 ID，检索结果的指纹不同，不需要通知其它进程
+    changed = [DOCS[0], Document(id="b2", page_content="新的文本块 B")]
+    assert (
+        cache.lookup("qa", COLLECTIONS, "什么是操作系统", [1.0, 0.0], changed) is None
+    )
+    assert (
+        cache.lookup("qa", COLLECTIONS, "什么是操作系统", [1.0, 0.0], DOCS[:1]) is None
+    )
+    assert cache.lookup("qa", COLLECTIONS, "什么是操作系统", [1.0, 0.0], DOCS) == [
+        "答案"
+    ]
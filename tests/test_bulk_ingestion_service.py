@@ -0,0 +1,231 @@
+# tests/test_bulk_ingestion_service.py
+from langchain_core.documents import Document
+
+from app.services.bulk_ingestion_service import SourceFile, bulk_ingest, chunk_id
+from app.services.vector_stores import ManifestEntry
+
+
+def fake_loader(path: str, start_page: int = 0, stop_page=None):
+    """文件内容的每一行是一页、切成一个文本块；内容为 bad 时解析失败"""
+    with open(path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    if lines == ["bad"]:
+        raise ValueError("损坏的 PDF")
+    for number, line in enumerate(lines[start_page:stop_page], start=start_page):
+        yield Document(page_content=line, metadata={"source": path, "page": number})
+
+
+def fake_page_counter(path: str) -> int:
+    with open(path, encoding="utf-8") as f:
+        return len(f.read().splitlines())
+
+
+class FakeWriter:
+    """在内存中模拟向量表和摄取清单"""
+
+    def __init__(self):
+        self.rows = {}
+        self.manifest = {}
+        self.batches = []
+
+    def load_manifest(self):
+        return {
+            source: ManifestEntry(entry.file_hash, list(entry.chunk_ids))
+            for source, entry in self.manifest.items()
+        }
+
+    def existing_ids(self, ids):
+        return {i for i in ids if i in self.rows}
+
+    def write(self, documents, vectors):
+        assert len(documents) == len(vectors)
+        self.batches.append([doc.page_content for doc in documents])
+        for doc in documents:
+            assert doc.id not in self.rows
+            self.rows[doc.id] = doc.page_content
+
+    def commit_file(
+        self, source, file_hash, chunk_ids, stale_ids, is_new, legacy_sources=()
+    ):
+        for i in stale_ids:
+            self.rows.pop(i, None)
+        self.manifest[source] = ManifestEntry(file_hash, chunk_ids)
+
+    def remove_source(self, source, chunk_ids):
+        for i in chunk_ids:
+            self.rows.pop(i, None)
+        del self.manifest[source]
+
+
+def fake_embed(texts):
+    return [[float(len(t))] for t in texts]
+
+
+def make_files(tmp_path, contents: dict[str, str]) -> list[SourceFile]:
+    files = []
+    for name, content in contents.items():
+        path = tmp_path / name
+        path.write_text(content, encoding="utf-8")
+        files.append(SourceFile(path=str(path), source=name))
+    return files
+
+
+def ingest(files, writer, **kwargs):
+    kwargs.setdefault("batch_size", 4)
+    return bulk_ingest(
+        files,
+        "docs",
+        fake_embed,
+        writer,
+        chunk_loader=fake_loader,
+        page_counter=fake_page_counter,
+        **kwargs,
+    )
+
+
+def test_bulk_ingest_uses_fixed_size_batches(tmp_path):
+    """文本块跨文件合并成固定大小的批次，最后一批为剩余部分；解析失败的文件被跳过"""
+    files = make_files(
+        tmp_path,
+        {"a": "a0\na1\na2", "bad": "bad", "b": "b0\nb1\nb2\nb3", "c": "c0\nc1"},
+    )
+    writer = FakeWriter()
+    progress = []
+    stats = ingest(files, writer, progress=lambda s: progress.append(s.chunks))
+
+    assert [len(batch) for batch in writer.batches] == [4, 4, 1]
+    assert writer.batches[0] == ["a0", "a1", "a2", "b0"]
+    assert progress == [4, 8, 9]
+    assert stats.files_done == 3
+    assert stats.files_failed == 1
+    assert stats.chunks == 9
+    assert stats.docs_per_second > 0
+    assert set(writer.manifest) == {"a", "b", "c"}
+
+
+def test_bulk_ingest_with_process_pool(tmp_path):
+    """使用进程池按页段并行切分时，所有文件的文本块都会写入，且每个文件都会提交清单"""
+    files = make_files(
+        tmp_path,
+        {f"f{n}": "\n".join(f"f{n}-{i}" for i in range(n)) for n in (5, 1, 7, 3, 2)},
+    )
+    files += make_files(tmp_path, {"bad": "bad"})
+    writer = FakeWriter()
+    stats = ingest(files, writer, workers=2, batch_size=8, pages_per_task=2)
+
+    assert sorted(writer.rows.values()) == sorted(
+        f"f{n}-{i}" for n in (5, 1, 7, 3, 2) for i in range(n)
+    )
+    assert all(len(batch) == 8 for batch in writer.batches[:-1])
+    assert (stats.files_done, stats.files_failed) == (5, 1)
+    assert sorted(writer.manifest) == ["f1", "f2", "f3", "f5", "f7"]
+    assert sorted(writer.manifest["f7"].chunk_ids) == sorted(
+        chunk_id("docs", "f7", f"f7-{i}") for i in range(7)
+    )
+
+
+def test_large_file_is_written_in_rolling_batches(tmp_path):
+    """大文件的文本块边切分边写入：第一批写入时文件还没有切分完"""
+    files = make_files(tmp_path, {"big": "\n".join(f"p{i}" for i in range(10))})
+    writer = FakeWriter()
+    pages_read_at_first_write = []
+    loaded = []
+
+    def tracking_loader(path, start_page=0, stop_page=None):
+        for doc in fake_loader(path, start_page, stop_page):
+            loaded.append(doc.page_content)
+            yield doc
+
+    original_write = writer.write
+
+    def write(documents, vectors):
+        if not pages_read_at_first_write:
+            pages_read_at_first_write.append(len(loaded))
+        original_write(documents, vectors)
+
+    writer.write = write
+    stats = bulk_ingest(
+        files, "docs", fake_embed, writer, batch_size=3, chunk_loader=tracking_loader
+    )
+
+    assert pages_read_at_first_write == [3]
+    assert [len(batch) for batch in writer.batches] == [3, 3, 3, 1]
+    assert stats.chunks == 10
+    assert "big" in writer.manifest
+
+
+def test_reingest_skips_unchanged_and_replaces_changed_chunks(tmp_path):
+    """未变化的文件不再解析；变化的文件只向量化新文本块并删除旧文本块；重复文本块只写一次"""
+    files = make_files(tmp_path, {"a": "x\ny\ny", "b": "p\nq"})
+    writer = FakeWriter()
+    ingest(files, writer)
+    assert sorted(writer.rows.values()) == ["p", "q", "x", "y"]
+
+    (tmp_path / "b").write_text("p\nr", encoding="utf-8")
+    writer.batches.clear()
+    stats = ingest(files, writer)
+
+    assert writer.batches == [["r"]]
+    assert sorted(writer.rows.values()) == ["p", "r", "x", "y"]
+    assert (stats.files_unchanged, stats.files_changed, stats.files_new) == (1, 1, 0)
+    assert (stats.chunks, stats.chunks_reused, stats.chunks_removed) == (1, 3, 1)
+    assert writer.manifest["b"].chunk_ids == [
+        chunk_id("docs", "b", "p"),
+        chunk_id("docs", "b", "r"),
+    ]
+
+
+def test_prune_missing_and_dry_run(tmp_path):
+    """dry_run 只报告变化；prune_missing 删除已不存在文件的文本块"""
+    files = make_files(tmp_path, {"a": "x", "b": "y"})
+    writer = FakeWriter()
+    ingest(files, writer)
+    (tmp_path / "a").write_text("x\nz", encoding="utf-8")
+
+    before = dict(writer.rows)
+    stats = ingest(files[:1], writer, prune_missing=True, dry_run=True)
+    assert writer.rows == before
+    assert {
+        c["source"]: (c["status"], c["added_chunks"], c["removed_chunks"])
+        for c in stats.changes
+    } == {
+        "a": ("changed", 1, 0),
+        "b": ("removed", 0, 1),
+    }
+
+    ingest(files[:1], writer, prune_missing=True)
+    assert sorted(writer.rows.values()) == ["x", "z"]
+    assert set(writer.manifest) == {"a"}
+
+
+def test_iter_pdf_chunks_matches_whole_document_split(tmp_path):
+    """逐页流式切分的结果与整本加载后 split_documents 的结果一致"""
+    import pymupdf
+    from langchain_community.document_loaders import PyMuPDFLoader
+    from langchain_text_splitters import CharacterTextSplitter
+
+    from app.services.bulk_ingestion_service import count_pdf_pages, iter_pdf_chunks
+
+    path = str(tmp_path / "manual.pdf")
+    with pymupdf.open() as doc:
+        for i in range(5):
+            page = doc.new_page()
+            page.insert_textbox(
+                pymupdf.Rect(50, 50, 550, 800),
+                "\n\n".join(f"Section {i}.{j} " + "text " * 60 for j in range(6)),
+            )
+        doc.save(path)
+
+    expected = CharacterTextSplitter(
+        chunk_size=1000, chunk_overlap=100
+    ).split_documents(PyMuPDFLoader(path).load())
+    chunks = list(iter_pdf_chunks(path))
+
+    assert count_pdf_pages(path) == 5
+    assert [c.page_content for c in chunks] == [e.page_content for e in expected]
+    assert [c.metadata["page"] for c in chunks] == [
+        e.metadata["page"] for e in expected
+    ]
+    assert [c.page_content for c in iter_pdf_chunks(path, 2, 4)] == [
+        e.page_content for e in expected if 2 <= e.metadata["page"] < 4
+    ]
@@ -0,0 +1,82 @@
+import threading
+import time
+
+import pytest
+
+from app.core.cache import TTLCache
+
+
+class FakeClock:
+    """可手动推进的时钟，避免测试依赖真实时间"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_eviction_when_full():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")  # a 变为最近使用
+    cache.set("c", 3)  # 应淘汰最久未使用的 b
+
+    assert "a" in cache and "c" in cache
+    assert "b" not in cache
+    assert cache.stats()["evictions"] == 1
+
+
+def test_idle_entries_expire():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=30, timer=clock)
+    cache.set("a", 1)
+
+    clock.now = 20
+    assert cache.get("a") == 1  # 访问会刷新空闲计时
+    clock.now = 45
+    assert cache.get("a") == 1
+    clock.now = 80
+    assert cache.get("a") is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["evictions"] == 1
+
+
+def test_get_or_create_builds_once_under_concurrency():
+    cache = TTLCache(maxsize=10, ttl=60)
+    calls = []
+
+    def slow_factory():
+        calls.append(1)
+        time.sleep(0.05)
+        return object()
+
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(cache.get_or_create("k", slow_factory))
+        )
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+
+
+def test_failed_factory_is_not_cached():
+    cache = TTLCache(maxsize=10, ttl=60)
+
+    def broken_factory():
+        raise RuntimeError("数据库不可用")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_create("k", broken_factory)
+    assert cache.get_or_create("k", lambda: 42) == 42
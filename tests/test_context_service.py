@@ -0,0 +1,49 @@
+from langchain_core.documents import Document
+
+from app.services import context_service
+
+
+def test_estimate_tokens_counts_chinese_and_ascii():
+    # 10 个汉字 * 0.6 + 10 个英文字符 * 0.3，空白不计
+    assert context_service.estimate_tokens("操作系统管理硬件资源 hello world") == 9
+
+
+def test_reciprocal_rank_fusion_merges_same_content():
+    dense = [
+        (Document(id="a", page_content="A"), 0.9),
+        (Document(id="b1", page_content="B"), 0.8),
+    ]
+    lexical = [
+        (Document(id="c", page_content="C"), 3.0),
+        (Document(id="b2", page_content="B "), 2.0),
+    ]
+
+    fused = context_service.reciprocal_rank_fusion([dense, lexical], k=60)
+
+    # B 同时出现在两路结果中（ID 不同、内容相同），得分最高，且只保留一次
+    assert [doc.page_content for doc, _ in fused] == ["B", "A", "C"]
+    assert fused[0][1] == 1 / 62 + 1 / 62
+
+
+def test_build_context_applies_top_k_and_token_budget():
+    user = [
+        (Document(page_content="甲" * 100), 0.9),
+        (Document(page_content="乙" * 100), 0.5),
+    ]
+    shared = [
+        (Document(page_content="甲" * 100), 0.7),
+        (Document(page_content="丙" * 10), 0.4),
+    ]
+
+    selected, report = context_service.build_context(
+        [user, shared], top_k=3, token_budget=70
+    )
+
+    # 每段 100 个汉字约 60 token：“乙”放不下被跳过，较短的“丙”仍可放入
+    assert [doc.page_content[0] for doc, _ in selected] == ["甲", "丙"]
+    assert report.candidates == 4
+    assert report.duplicates == 1
+    assert report.dropped_by_budget == 1
+    assert report.tokens_candidates == 186
+    assert report.tokens_context == 66
+    assert report.tokens_saved == 120
@@ -0,0 +1,64 @@
+# tests/test_db_session.py
+import asyncio
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app.core import password
+from app.core.config import settings
+from app.db.session import PoolWaitStats, TimedQueuePool
+
+
+def test_pool_checkout_wait_is_recorded(tmp_path):
+    class Pool(TimedQueuePool):
+        wait_stats = PoolWaitStats()
+
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=Pool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.2,
+    )
+    holding = engine.connect()
+
+    def release_later():
+        time.sleep(0.1)
+        holding.close()
+
+    threading.Thread(target=release_later).start()
+    # 唯一的连接被占用，需要排队等到它归还
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+    with engine.connect():
+        # 池满且没有连接归还时超时，同样计入统计
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+
+    stats = Pool.wait_stats.stats()
+    assert stats["checkouts"] == 4
+    assert stats["timeouts"] == 1
+    assert stats["max_ms"] >= 150
+    assert engine.pool.status()
+    engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_password_hashing_is_bounded(monkeypatch):
+    hashed = await password.aget_password_hash("secret123")
+    assert await password.averify_password("secret123", hashed)
+    assert not await password.averify_password("wrong", hashed)
+
+    monkeypatch.setattr(settings, "PASSWORD_HASH_MAX_PENDING", 2)
+    results = await asyncio.gather(
+        *(password.averify_password("secret123", hashed) for _ in range(3)),
+        return_exceptions=True,
+    )
+    # 超过排队上限的请求立即被拒绝，而不是继续排队
+    assert results[:2] == [True, True]
+    assert isinstance(results[2], password.PasswordHasherBusyError)
+    assert password.get_password_hasher_stats()["pending"] == 0
@@ -0,0 +1,124 @@
+import asyncio
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.services import embedding_service
+
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    embedding_service.clear_registry()
+    embedding_service._LOAD_COUNTS.clear()
+    yield
+    embedding_service.clear_registry()
+    embedding_service._LOAD_COUNTS.clear()
+
+
+@patch("app.services.embedding_service.HuggingFaceEmbeddings")
+def test_same_model_is_loaded_once(mock_embeddings_cls):
+    """同一 (模型, 设备) 多次获取时只加载一次，并返回同一个实例"""
+    mock_embeddings_cls.return_value = MagicMock(_client=None)
+
+    first = embedding_service.get_embeddings("fake-model", device="cpu")
+    second = embedding_service.get_embeddings("fake-model", device="cpu")
+
+    assert first is second
+    mock_embeddings_cls.assert_called_once_with(
+        model_name="fake-model", model_kwargs={"device": "cpu"}
+    )
+    stats = embedding_service.get_registry_stats()
+    assert stats["models"][0]["load_count"] == 1
+    assert stats["models"][0]["hits"] == 2
+
+
+@patch("app.services.embedding_service.HuggingFaceEmbeddings")
+def test_device_is_part_of_registry_key(mock_embeddings_cls):
+    """不同设备上的同名模型分别加载"""
+    mock_embeddings_cls.side_effect = lambda **kwargs: MagicMock(_client=None)
+
+    cpu_model = embedding_service.get_embeddings("fake-model", device="cpu")
+    gpu_model = embedding_service.get_embeddings("fake-model", device="cuda")
+
+    assert cpu_model is not gpu_model
+    assert mock_embeddings_cls.call_count == 2
+    assert len(embedding_service.get_registry_stats()["models"]) == 2
+
+
+@patch("app.services.embedding_service.HuggingFaceEmbeddings")
+def test_memory_usage_is_reported(mock_embeddings_cls):
+    """注册表按模型参数估算内存占用"""
+    param = MagicMock()
+    param.numel.return_value = 1000
+    param.element_size.return_value = 4
+    client = MagicMock()
+    client.parameters.return_value = [param, param]
+    client.buffers.return_value = []
+    mock_embeddings_cls.return_value = MagicMock(_client=client)
+
+    embedding_service.get_embeddings("fake-model", device="cpu")
+
+    assert embedding_service.get_registry_stats()["total_memory_bytes"] == 8000
+
+
+class RecordingEmbeddings:
+    """记录每次批量向量化调用的假模型"""
+
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(t)), 1.0] for t in texts]
+
+
+def make_batcher(max_batch_size=32):
+    from concurrent.futures import ThreadPoolExecutor
+
+    return embedding_service.QueryEmbeddingBatcher(
+        model_name="fake-model",
+        device="cpu",
+        max_batch_size=max_batch_size,
+        window_seconds=0.01,
+        cache_size=100,
+        executor=ThreadPoolExecutor(max_workers=1),
+    )
+
+
+@pytest.mark.asyncio
+async def test_concurrent_queries_are_batched_while_encoder_is_busy():
+    fake = RecordingEmbeddings()
+    batcher = make_batcher()
+    questions = [f"问题{i}" for i in range(10)] + ["问题0"]
+
+    with patch("app.services.embedding_service.get_embeddings", return_value=fake):
+        vectors = await asyncio.gather(*(batcher.embed(q) for q in questions))
+        # 已计算过的问题直接命中缓存
+        again = await batcher.embed("问题3")
+
+    # 编码器空闲时第一个问题立即计算，其余问题在其计算期间合并为一批
+    assert [len(call) for call in fake.calls] == [1, 9]
+    assert sorted(fake.calls[0] + fake.calls[1]) == sorted(set(questions))
+    assert vectors[0] == vectors[-1]
+    assert again == [3.0, 1.0]
+    assert batcher.stats()["cache"]["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_batch_is_flushed_when_full():
+    fake = RecordingEmbeddings()
+    batcher = make_batcher(max_batch_size=4)
+
+    with patch("app.services.embedding_service.get_embeddings", return_value=fake):
+        await asyncio.gather(*(batcher.embed(f"问题{i}") for i in range(10)))
+
+    assert [len(call) for call in fake.calls] == [1, 4, 4, 1]
+
+
+def test_getting_query_batcher_does_not_wait_for_model_load():
+    """模型在线程中加载（持有注册表锁）时，事件循环中获取批处理器不被阻塞"""
+    with embedding_service._LOCK:
+        batcher = embedding_service.get_query_batcher("fake-model", device="cpu")
+        assert (
+            embedding_service.get_query_batcher("fake-model", device="cpu") is batcher
+        )
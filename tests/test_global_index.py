@@ -0,0 +1,102 @@
+# tests/test_global_index.py
+import os
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from app.core.config import settings
+from app.services.vector_stores import global_index
+from app.services.vector_stores.faiss_store import FaissBackend
+
+
+def make_batches(vectors: np.ndarray, batch_size: int = 100):
+    for start in range(0, len(vectors), batch_size):
+        chunk = vectors[start : start + batch_size]
+        documents = [
+            Document(
+                id=f"c{start + i}",
+                page_content=f"文本块 {start + i}",
+                metadata={"source": "a.pdf", "page": start + i},
+            )
+            for i in range(len(chunk))
+        ]
+        yield documents, chunk
+
+
+@pytest.fixture
+def exported(tmp_path, monkeypatch):
+    """在临时目录中导出一个 2000 个文本块的全局集合"""
+    monkeypatch.setattr(settings, "GLOBAL_INDEX_DIR", str(tmp_path / "global"))
+    global_index.get_global_index_backend.cache_clear()
+    vectors = np.random.default_rng(1).standard_normal((2000, 32)).astype(np.float32)
+    info = global_index.export_collection(
+        make_batches(vectors),
+        os.path.join(settings.GLOBAL_INDEX_DIR, settings.COLLECTION_NAME),
+        "test-model",
+        quantizer="sq8",
+    )
+    yield vectors, info
+    global_index.get_global_index_backend.cache_clear()
+
+
+def test_choose_index_factory():
+    assert global_index.choose_index_factory(10000, 768, "sq8") == "IVF256,SQ8"
+    assert (
+        global_index.choose_index_factory(20000, 768, "pq", nlist=100, pq_m=96)
+        == "IVF100,PQ96x8"
+    )
+    # 样本太少时聚类数受训练样本限制，PQ 退回 SQ8
+    assert global_index.choose_index_factory(100, 768, "pq") == "IVF2,SQ8"
+    with pytest.raises(ValueError):
+        global_index.choose_index_factory(20000, 768, "pq", pq_m=100)
+
+
+@pytest.mark.asyncio
+async def test_exported_global_index_is_used_for_global_collection(exported):
+    vectors, info = exported
+    assert (info["count"], info["dim"], info["index"]) == (2000, 32, "IVF51,SQ8")
+    assert not os.path.exists(os.path.join(info["path"], "vectors.f32.tmp"))
+
+    backend = global_index.global_index_backend_for(
+        settings.COLLECTION_NAME, "test-model"
+    )
+    assert isinstance(backend, FaissBackend)
+    assert (
+        global_index.global_index_backend_for("user_1_collection", "test-model") is None
+    )
+    assert (
+        global_index.global_index_backend_for(settings.COLLECTION_NAME, "other-model")
+        is None
+    )
+
+    # 探查全部聚类时，量化后的最近邻仍是查询向量本身
+    results = await backend.asearch(
+        settings.COLLECTION_NAME, vectors[42].tolist(), k=3, probes=51
+    )
+    doc, score = results[0]
+    assert (doc.id, doc.page_content, doc.metadata) == (
+        "c42",
+        "文本块 42",
+        {"source": "a.pdf", "page": 42},
+    )
+    assert score == pytest.approx(1.0, abs=0.02)
+
+
+def test_reexport_swaps_version_atomically(exported):
+    vectors, info = exported
+    backend = global_index.get_global_index_backend()
+    old = backend.snapshot(settings.COLLECTION_NAME)
+
+    new_info = global_index.export_collection(
+        make_batches(vectors[:1000]),
+        os.path.join(settings.GLOBAL_INDEX_DIR, settings.COLLECTION_NAME),
+        "test-model",
+    )
+
+    current = backend.snapshot(settings.COLLECTION_NAME)
+    assert current.path == new_info["path"] != old.path
+    assert current.index.ntotal == 1000
+    # 切换前打开的版本仍然可以读取
+    assert old.document(1999).id == "c1999"
+    assert global_index.global_index_stats()["count"] == 1000
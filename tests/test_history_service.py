@@ -0,0 +1,190 @@
+# tests/test_history_service.py
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.documents import Document
+from sqlalchemy import create_engine
+from sqlalchemy import exc as sa_exc
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.security import get_current_user
+from app.crud import crud_history
+from app.db.session import get_async_db
+from app.main import app
+from app.models.history import ChatHistory
+from app.models.user import User
+from app.schemas.user import AuthenticatedUser
+from app.services import history_service, rag_service
+
+
+@pytest.fixture
+def session_factory(monkeypatch, tmp_path):
+    """临时 SQLite 文件代替 PostgreSQL，写缓冲区和读接口共用同一个库"""
+    database = tmp_path / "history.db"
+    engine = create_engine(f"sqlite:///{database}")
+    User.__table__.create(engine)
+    ChatHistory.__table__.create(engine)
+    engine.dispose()
+    factory = async_sessionmaker(
+        create_async_engine(f"sqlite+aiosqlite:///{database}", poolclass=NullPool)
+    )
+    monkeypatch.setattr(history_service, "AsyncSessionLocal", factory)
+    monkeypatch.setattr(
+        history_service, "HISTORY_WRITER", history_service.HistoryWriter()
+    )
+    return factory
+
+
+@pytest.mark.asyncio
+async def test_records_are_written_in_batches_and_paged_by_cursor(session_factory):
+    writer = history_service.HISTORY_WRITER
+    for i in range(5):
+        writer.record(
+            1,
+            f"问题{i}",
+            f"答案{i}",
+            sources=[{"source": "a.pdf", "page": i}],
+            mode="query",
+        )
+    writer.record(2, "别人的问题", "别人的答案", sources=[], mode="stream")
+    assert writer.stats()["buffered"] == 6
+
+    assert await writer.aflush() == 6
+    assert writer.stats() | {"last_flush_ms": 0} == {
+        "buffered": 0,
+        "written": 6,
+        "batches": 1,
+        "dropped": 0,
+        "rejected": 0,
+        "failures": 0,
+        "last_flush_ms": 0,
+    }
+
+    pages, cursor = [], None
+    async with session_factory() as db:
+        while True:
+            page = await history_service.aget_history_page(
+                db, 1, limit=2, cursor=cursor
+            )
+            pages.append([item.question for item in page["items"]])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+    # 从新到旧，每页不重叠，只包含当前用户的记录
+    assert pages == [["问题4", "问题3"], ["问题2", "问题1"], ["问题0"]]
+
+
+@pytest.mark.asyncio
+async def test_rejected_row_is_dropped_without_blocking_later_writes(
+    session_factory, monkeypatch
+):
+    add_history_batch = crud_history.add_history_batch
+    outage = False
+
+    async def flaky_add_history_batch(db, rows):
+        if outage:
+            raise sa_exc.OperationalError("INSERT", {}, ConnectionError("连接断开"))
+        if any(row["question"] == "坏记录" for row in rows):
+            raise sa_exc.DataError("INSERT", {}, ValueError("数据库拒绝的记录"))
+        await add_history_batch(db, rows)
+
+    monkeypatch.setattr(crud_history, "add_history_batch", flaky_add_history_batch)
+    writer = history_service.HISTORY_WRITER
+    for question in ["问题0", "坏记录", "问题2"]:
+        writer.record(1, question, "答案", sources=[], mode="query")
+
+    # 批次被拒绝后逐条写入，只丢弃被拒绝的那一条
+    assert await writer.aflush() == 2
+    assert (
+        writer.stats()["buffered"],
+        writer.stats()["rejected"],
+        writer.stats()["failures"],
+    ) == (0, 1, 0)
+    assert not writer.has_pending(1)
+
+    # 暂时性错误时记录留在缓冲区，恢复后写入
+    outage = True
+    writer.record(1, "问题\x003", "答\x00案", sources=[], mode="query")
+    assert await writer.aflush() == 0
+    assert (writer.stats()["buffered"], writer.stats()["failures"]) == (1, 1)
+    outage = False
+    assert await writer.aflush() == 1
+
+    async with session_factory() as db:
+        page = await history_service.aget_history_page(db, 1, limit=10)
+    # NUL 字符在放入缓冲区时去掉
+    assert [(item.question, item.answer) for item in page["items"]] == [
+        ("问题3", "答案"),
+        ("问题2", "答案"),
+        ("问题0", "答案"),
+    ]
+
+
+def test_history_endpoint_sees_buffered_answers(session_factory):
+    async def override_get_async_db():
+        async with session_factory() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[get_current_user] = lambda: AuthenticatedUser(
+        id=1, username="alice", is_active=True
+    )
+    try:
+        client = TestClient(app)  # 不进入 lifespan，没有后台写入任务
+        history_service.HISTORY_WRITER.record(
+            1, "什么是操作系统？", "操作系统是……", sources=[], mode="stream"
+        )
+
+        # 还在缓冲区中的记录在读取前写入，刚得到的答案立即可见
+        response = client.get("/api/v1/history/", params={"limit": 1})
+        assert response.status_code == 200
+        body = response.json()
+        assert [item["question"] for item in body["items"]] == ["什么是操作系统？"]
+        assert body["next_cursor"] is None
+
+        assert (
+            client.get("/api/v1/history/", params={"cursor": "不是游标"}).status_code
+            == 400
+        )
+    finally:
+        app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_streamed_answer_is_saved_once_on_completion():
+    docs = [
+        Document(id="a", page_content="文本块", metadata={"source": "a.pdf", "page": 1})
+    ]
+    retrieval = rag_service.RetrievalResult(
+        documents=docs,
+        query_embedding=[1.0, 0.0],
+        collection_names=["user_1_collection", "all_documents"],
+    )
+    rag_service.ANSWER_CACHE.store(
+        "stream",
+        retrieval.collection_names,
+        "什么是操作系统",
+        retrieval.query_embedding,
+        docs,
+        ["操作", "系统"],
+    )
+    completed = []
+    try:
+        events = [
+            event
+            async for event in rag_service.stream_rag_answer(
+                "什么是操作系统", retrieval, llm_pool=None, on_complete=completed.append
+            )
+        ]
+        assert completed == ["操作系统"]
+        assert events[:2] == [("token", "操作"), ("token", "系统")]
+
+        # 客户端中途断开：答案不完整，不保存
+        stream = rag_service.stream_rag_answer(
+            "什么是操作系统", retrieval, llm_pool=None, on_complete=completed.append
+        )
+        await stream.__anext__()
+        await stream.aclose()
+        assert completed == ["操作系统"]
+    finally:
+        rag_service.ANSWER_CACHE.clear()
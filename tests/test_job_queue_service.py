@@ -0,0 +1,106 @@
+# tests/test_job_queue_service.py
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models.ingestion import IngestionJob
+from app.models.user import User
+from app.services import job_queue_service
+
+
+@pytest.fixture
+def db():
+    """
+    使用内存 SQLite 验证队列状态流转
+    （SKIP LOCKED 等 PostgreSQL 特性在 SQLite 中被忽略）
+    """
+    engine = create_engine("sqlite://")
+    User.__table__.create(engine)
+    IngestionJob.__table__.create(engine)
+    session = sessionmaker(bind=engine)()
+    session.add(User(id=1, username="alice", hashed_password="x"))
+    session.commit()
+    yield session
+    session.close()
+
+
+def enqueue(db, name="a.pdf"):
+    return job_queue_service.enqueue_job(
+        db,
+        user_id=1,
+        collection_name="user_1_collection",
+        filename=name,
+        file_path=f"/tmp/{name}",
+    )
+
+
+def test_claim_and_complete(db):
+    job = enqueue(db)
+    assert job.status == "queued"
+
+    claimed = job_queue_service.claim_job(db, "worker-1")
+    assert claimed.id == job.id
+    assert (claimed.status, claimed.attempts, claimed.worker_id) == (
+        "running",
+        1,
+        "worker-1",
+    )
+    assert job_queue_service.claim_job(db, "worker-2") is None
+
+    job_queue_service.heartbeat(db, job.id, chunks_done=3, chunks_total=10)
+    job_queue_service.complete_job(db, job.id, chunks_done=10)
+    db.expire_all()
+    finished = db.get(IngestionJob, job.id)
+    assert (finished.status, finished.chunks_done, finished.chunks_total) == (
+        "succeeded",
+        10,
+        10,
+    )
+
+
+def test_failed_job_is_retried_with_backoff_then_fails(db, monkeypatch):
+    monkeypatch.setattr(job_queue_service.settings, "INGEST_JOB_MAX_ATTEMPTS", 2)
+    job = enqueue(db)
+
+    claimed = job_queue_service.claim_job(db, "worker-1")
+    assert job_queue_service.fail_job(db, claimed, "boom") is True
+    db.expire_all()
+    retried = db.get(IngestionJob, job.id)
+    assert retried.status == "queued"
+    # 退避期间不会被再次领取
+    assert job_queue_service.claim_job(db, "worker-1") is None
+
+    retried.run_after = datetime.now(timezone.utc) - timedelta(seconds=1)
+    db.commit()
+    claimed = job_queue_service.claim_job(db, "worker-1")
+    assert claimed.attempts == 2
+    assert job_queue_service.fail_job(db, claimed, "boom again") is False
+    db.expire_all()
+    assert db.get(IngestionJob, job.id).status == "failed"
+
+
+def test_stale_running_job_is_requeued(db):
+    job = enqueue(db)
+    job_queue_service.claim_job(db, "worker-1")
+    assert job_queue_service.requeue_stale_jobs(db, timeout_seconds=60) == 0
+
+    db.get(IngestionJob, job.id).heartbeat_at = datetime.now(timezone.utc) - timedelta(
+        minutes=5
+    )
+    db.commit()
+    assert job_queue_service.requeue_stale_jobs(db, timeout_seconds=60) == 1
+    db.expire_all()
+    assert db.get(IngestionJob, job.id).status == "queued"
+
+
+def test_check_capacity_applies_backpressure(db, monkeypatch):
+    monkeypatch.setattr(
+        job_queue_service.settings, "INGEST_QUEUE_MAX_PENDING_PER_USER", 2
+    )
+    enqueue(db, "a.pdf")
+    job_queue_service.check_capacity(db, user_id=1)
+    enqueue(db, "b.pdf")
+    with pytest.raises(job_queue_service.QueueFullError):
+        job_queue_service.check_capacity(db, user_id=1)
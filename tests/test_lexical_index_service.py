@@ -0,0 +1,21 @@
+from app.services import lexical_index_service
+
+
+def test_tokenize_chinese_bigrams_and_codes():
+    tokens = lexical_index_service.tokenize("操作系统报错 ERR-1042")
+
+    assert tokens[:4] == ["操作", "作系", "系统", "统报"]
+    # 型号整体保留，同时保留各个组成部分
+    assert "err-1042" in tokens
+    assert "err" in tokens and "1042" in tokens
+
+
+def test_tsvector_literal_records_positions():
+    literal = lexical_index_service.tsvector_literal("v2.3 系统 系统")
+
+    assert literal == "'v2.3':1 'v2':2 '3':3 '系统':4,5"
+
+
+def test_build_tsquery_ors_unique_terms():
+    assert lexical_index_service.build_tsquery("系统系统") == "'系统' | '统系'"
+    assert lexical_index_service.build_tsquery("？！") is None
@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+
+from app.services.llm_service import LLMClientPool
+
+
+def make_pool(max_concurrency=2):
+    return LLMClientPool(
+        api_key="sk-test",
+        base_url="http://127.0.0.1:9/v1",
+        model="fake-model",
+        max_concurrency=max_concurrency,
+        max_connections=4,
+        max_keepalive_connections=2,
+        keepalive_expiry=30,
+        timeout=5,
+    )
+
+
+@pytest.mark.asyncio
+async def test_models_share_one_http_client():
+    pool = make_pool()
+    try:
+        assert pool.chat.http_async_client is pool.streaming_chat.http_async_client
+        assert pool.streaming_chat.streaming is True
+    finally:
+        await pool.aclose()
+
+
+@pytest.mark.asyncio
+async def test_slot_limits_concurrent_upstream_requests():
+    pool = make_pool(max_concurrency=2)
+    observed = []
+
+    async def fake_request():
+        async with pool.slot():
+            observed.append(pool.in_flight)
+            await asyncio.sleep(0.02)
+
+    await asyncio.gather(*(fake_request() for _ in range(6)))
+    await pool.aclose()
+
+    stats = pool.stats()
+    assert max(observed) == 2
+    assert stats["peak_in_flight"] == 2
+    assert stats["total_requests"] == 6
+    assert stats["in_flight"] == 0 and stats["waiting"] == 0
+    assert stats["max_wait_seconds"] > 0
@@ -0,0 +1,74 @@
+# tests/test_metrics.py
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from pydantic import SecretStr
+
+from app.core.config import settings
+from app.main import app
+
+
+def test_trace_id_is_echoed_or_generated():
+    client = TestClient(app)
+
+    response = client.get("/healthz", headers={"X-Request-ID": "req-123"})
+    assert response.headers["X-Request-ID"] == "req-123"
+
+    # 没有或不合法的 trace id（可能用于注入响应头或日志）被替换为新生成的值
+    generated = client.get("/healthz").headers["X-Request-ID"]
+    replaced = client.get("/healthz", headers={"X-Request-ID": "a b\tc"}).headers[
+        "X-Request-ID"
+    ]
+    assert len(generated) == len(replaced) == 32
+    assert generated != replaced
+
+
+def test_metrics_endpoint_exposes_stage_histograms_and_http_timings(monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_ENABLED", True)
+    client = TestClient(app)
+    labels = {"method": "GET", "route": "/healthz", "status": "200"}
+    before = (
+        REGISTRY.get_sample_value("http_request_duration_seconds_count", labels) or 0
+    )
+    client.get("/healthz")
+    assert (
+        REGISTRY.get_sample_value("http_request_duration_seconds_count", labels)
+        == before + 1
+    )
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    for name in (
+        "rag_stage_duration_seconds",
+        "rag_search_duration_seconds",
+        "rag_llm_time_to_first_token_seconds",
+        "rag_llm_tokens_per_second",
+        "rag_stream_duration_seconds",
+        "rag_documents_retrieved_total",
+        "rag_prompt_tokens_total",
+        "db_pool_checkout_wait_seconds",
+    ):
+        assert f"# TYPE {name} " in response.text
+
+
+def test_internal_endpoints_are_not_public(monkeypatch):
+    client = TestClient(app)
+    assert client.get("/api/v1/stats").status_code == 401
+    # /metrics 默认关闭
+    assert client.get("/metrics").status_code == 404
+
+    monkeypatch.setattr(settings, "METRICS_ENABLED", True)
+    monkeypatch.setattr(settings, "METRICS_TOKEN", SecretStr("scrape-token"))
+    assert client.get("/metrics").status_code == 401
+    assert (
+        client.get(
+            "/metrics", headers={"Authorization": "Bearer wrong-token"}
+        ).status_code
+        == 401
+    )
+    assert (
+        client.get(
+            "/metrics", headers={"Authorization": "Bearer scrape-token"}
+        ).status_code
+        == 200
+    )
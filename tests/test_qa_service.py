@@ -1,61 +1,126 @@
+# tests/test_qa_service.py
+"""问答链对接模拟的 OpenAI 兼容服务（benchmarks/fake_llm_server.py），不依赖真实上游"""
+
+import time
+
 import pytest
-from unittest.mock import patch, MagicMock
+from langchain_core.documents import Document
+from prometheus_client import REGISTRY
+
 from app.services import rag_service
+from app.services.llm_service import LLMClientPool
+from benchmarks.fake_llm_server import create_app, fake_answer_tokens, serve_in_thread
+
 
-import os
-from dotenv import load_dotenv
-load_dotenv() # 加载 .env 文件
-
-# 使用 pytest 的 @patch 装饰器来“模拟”整个 create_rag_chain 函数
-@patch('app.services.qa_service.create_rag_chain')
-def test_query_document_with_mocking(mock_create_rag_chain):
-    """
-    这是一个单元测试函数，用于测试 query_document 函数。
-    它通过模拟 create_rag_chain 的返回值，来隔离对真实 LLM 和文件系统的依赖。
-    """
-    # 1. 准备 (Arrange)
-    # --------------------
-    # 定义一个假的、预设好的 RAG 链返回结果
-    fake_result = {
-        "result": "这是一个来自模拟链的答案",
-        "source_documents": [MagicMock(page_content="这是一个模拟的来源文档")]
-    }
-
-    # 创建一个模拟的 RAG 链对象
-    mock_rag_chain = MagicMock()
-    # 配置这个假链，当它的 __call__ 方法（对应 qa_chain({"query": ...})）被调用时，
-    # 就返回我们预设好的 fake_result
-    mock_rag_chain.return_value = fake_result
-
-    # 配置我们的“模拟函数”，当 create_rag_chain 被调用时，
-    # 让它返回我们刚刚创建的 mock_rag_chain 对象
-    mock_create_rag_chain.return_value = mock_rag_chain
-
-    # 定义测试用的输入
-    test_question = "这是一个测试问题"
-    test_file_path = "data/fake_test.pdf"
-
-
-    # 2. 执行 (Act)
-    # -----------------
-    # 调用我们真正想要测试的函数
-    actual_response = rag_service.query_document(
-        question=test_question,
-        file_path=test_file_path
+@pytest.fixture(scope="module")
+def fake_llm_url():
+    with serve_in_thread(create_app(tokens=12, token_rate=0, first_token_ms=0)) as url:
+        yield url
+
+
+def make_pool(base_url: str) -> LLMClientPool:
+    return LLMClientPool(
+        api_key="fake",
+        base_url=base_url,
+        model="fake",
+        max_concurrency=4,
+        max_connections=4,
+        max_keepalive_connections=4,
+        keepalive_expiry=60,
+        timeout=10,
     )
 
 
-    # 3. 断言 (Assert)
-    # -----------------
-    # 检查函数的返回值是否和我们预期的完全一致
-    assert actual_response["answer"] == fake_result["result"]
-    assert len(actual_response["source_documents"]) == 1
-    assert actual_response["source_documents"][0] == "这是一个模拟的来源文档"
-
-    # 检查我们的模拟函数是否真的被调用了
-    mock_create_rag_chain.assert_called_once_with(
-    file_path=test_file_path,
-    llm_api_key=os.getenv("DEEPSEEK_API_KEY"), # <-- 修改这里
-    llm_base_url="https://api.deepseek.com",
-    llm_model="deepseek-chat"
-    )
\ No newline at end of file
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.mark.asyncio
+async def test_query_and_stream_answers_come_from_llm(fake_llm_url, monkeypatch):
+    monkeypatch.setattr(rag_service.settings, "ENABLE_CACHE", False)
+    docs = [
+        Document(
+            id="a",
+            page_content="操作系统管理硬件与软件资源。",
+            metadata={"source": "os.pdf", "page": 1},
+        )
+    ]
+    retrieval = rag_service.RetrievalResult(
+        documents=docs,
+        query_embedding=[1.0, 0.0],
+        collection_names=["user_1_collection", "all_documents"],
+    )
+    expected = "".join(fake_answer_tokens(12))
+    pool = make_pool(fake_llm_url)
+    prompt_builds = sample("rag_stage_duration_seconds_count", stage="prompt_build")
+    prompt_tokens = sample("rag_prompt_tokens_total")
+    ttft = sample("rag_llm_time_to_first_token_seconds_count")
+    completion_tokens = sample("rag_completion_tokens_total")
+    streams = sample("rag_stream_duration_seconds_count", outcome="llm")
+    try:
+        result = await rag_service.get_answer_from_rag(
+            "什么是操作系统？", retrieval, pool
+        )
+        assert result["answer"] == expected
+        assert [doc.metadata for doc in result["source_documents"]] == [
+            {"source": "os.pdf", "page": 1}
+        ]
+
+        completed = []
+        events = [
+            event
+            async for event in rag_service.stream_rag_answer(
+                "什么是操作系统？", retrieval, pool, on_complete=completed.append
+            )
+        ]
+        assert (
+            "".join(content for event, content in events if event == "token")
+            == expected
+        )
+        assert events[-1] == ("sources", [{"source": "os.pdf", "page": 1}])
+        assert completed == [expected]
+        assert pool.stats()["total_requests"] == 2
+
+        # 两次调用都记录了 prompt 构建和 prompt token，
+        # 首 token 时间和生成 token 数只在流式时记录
+        assert (
+            sample("rag_stage_duration_seconds_count", stage="prompt_build")
+            == prompt_builds + 2
+        )
+        assert sample("rag_prompt_tokens_total") > prompt_tokens
+        assert sample("rag_llm_time_to_first_token_seconds_count") == ttft + 1
+        assert sample("rag_completion_tokens_total") == completion_tokens + 12
+        assert sample("rag_stream_duration_seconds_count", outcome="llm") == streams + 1
+    finally:
+        await pool.aclose()
+
+
+@pytest.mark.asyncio
+async def test_closing_stream_releases_llm_slot_without_waiting_for_answer(monkeypatch):
+    monkeypatch.setattr(rag_service.settings, "ENABLE_CACHE", False)
+    docs = [
+        Document(id="a", page_content="文本块", metadata={"source": "a.pdf", "page": 1})
+    ]
+    retrieval = rag_service.RetrievalResult(
+        documents=docs, query_embedding=[1.0, 0.0], collection_names=["all_documents"]
+    )
+    # 完整答案需要约 10 秒
+    with serve_in_thread(
+        create_app(tokens=200, token_rate=20, first_token_ms=0)
+    ) as url:
+        pool = make_pool(url)
+        try:
+            completed = []
+            stream = rag_service.stream_rag_answer(
+                "问题", retrieval, pool, on_complete=completed.append
+            )
+            assert (await stream.__anext__())[0] == "token"
+            assert pool.stats()["in_flight"] == 1
+
+            start = time.perf_counter()
+            await stream.aclose()
+            assert time.perf_counter() - start < 1
+            assert pool.stats()["in_flight"] == 0
+            assert completed == []
+        finally:
+            await pool.aclose()
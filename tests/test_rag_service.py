@@ -0,0 +1,163 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from langchain_core.documents import Document
+
+from app.services import rag_service
+from app.services.vector_stores import VectorStoreBackend, pgvector_store
+from app.services.vector_stores.pgvector_store import PGVectorBackend
+
+
+class FakeBackend(VectorStoreBackend):
+    """模拟向量存储后端，记录同时进行中的搜索数量"""
+
+    name = "fake"
+    supports_lexical = True
+
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+
+    async def asearch(
+        self, collection_name, query_embedding, k, ef_search=None, probes=None
+    ):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.02)
+        self.active -= 1
+        # 全局库的结果更相关，两个集合都返回了同一段“共享”内容
+        prefix = "global" if collection_name == "all_documents" else "user"
+        scores = [0.9, 0.7] if prefix == "global" else [0.8, 0.6]
+        docs = [
+            (Document(page_content=f"{prefix}-{i}"), score)
+            for i, score in enumerate(scores)
+        ]
+        return docs + [(Document(page_content="共享"), 0.5)]
+
+    async def alexical_search(self, collection_name, question, k):
+        return [
+            (
+                Document(
+                    id=f"{collection_name}-0",
+                    page_content=f"{collection_name} ERR-1042 错误码说明",
+                ),
+                0.5,
+            )
+        ]
+
+    def open_writer(self, collection_name, embeddings_model_name):
+        raise NotImplementedError
+
+
+@pytest.mark.asyncio
+async def test_collections_are_searched_concurrently_with_one_embedding():
+    backend = FakeBackend()
+    with patch.object(
+        rag_service, "aembed_query", AsyncMock(return_value=[0.1, 0.2])
+    ) as mock_embed:
+        retrieval = await rag_service.aretrieve_documents(
+            question="什么是操作系统？",
+            collection_names=["user_1_collection", "all_documents"],
+            embeddings_model_name="fake-model",
+            k=3,
+            top_k=4,
+            token_budget=None,
+            min_similarity=0.0,
+            backend=backend,
+        )
+
+    mock_embed.assert_awaited_once_with("什么是操作系统？", "fake-model")
+    assert backend.peak == 2
+    # 结果按相似度全局排序，重复内容只保留一次，再按 top_k 截断
+    assert [d.page_content for d in retrieval.documents] == [
+        "global-0",
+        "user-0",
+        "global-1",
+        "user-1",
+    ]
+    assert retrieval.scores == pytest.approx([0.9, 0.8, 0.7, 0.6])
+    assert retrieval.report.candidates == 6
+    assert retrieval.report.duplicates == 1
+    assert retrieval.report.dropped_by_top_k == 1
+
+
+@pytest.mark.asyncio
+async def test_pgvector_store_is_built_once_for_concurrent_requests():
+    built = []
+
+    class FakePGVector:
+        def __init__(self, **kwargs):
+            built.append(kwargs["collection_name"])
+
+        async def acreate_collection(self):
+            await asyncio.sleep(0.02)
+
+    backend = PGVectorBackend(
+        "postgresql+psycopg2://fake", "postgresql+psycopg://fake", "fake-model"
+    )
+    with (
+        patch.object(pgvector_store, "PGVector", FakePGVector),
+        patch.object(pgvector_store, "get_embeddings", return_value=object()),
+        patch.object(pgvector_store, "_get_async_engine", return_value=object()),
+    ):
+        results = await asyncio.gather(
+            *(backend.aget_vector_store("user_1_collection") for _ in range(5))
+        )
+
+    assert built == ["user_1_collection"]
+    assert all(r is results[0] for r in results)
+
+
+@pytest.mark.asyncio
+async def test_stream_replays_cached_answer_without_llm():
+    docs = [
+        Document(id="a", page_content="文本块", metadata={"source": "a.pdf", "page": 1})
+    ]
+    retrieval = rag_service.RetrievalResult(
+        documents=docs,
+        query_embedding=[1.0, 0.0],
+        collection_names=["user_1_collection", "all_documents"],
+    )
+    rag_service.ANSWER_CACHE.store(
+        "stream",
+        retrieval.collection_names,
+        "什么是操作系统",
+        retrieval.query_embedding,
+        docs,
+        ["操作", "系统"],
+    )
+
+    # 命中缓存时不会使用 LLM 客户端池
+    events = [
+        event
+        async for event in rag_service.stream_rag_answer(
+            "什么是操作系统？", retrieval, llm_pool=None
+        )
+    ]
+
+    rag_service.ANSWER_CACHE.clear()
+    assert events == [
+        ("token", "操作"),
+        ("token", "系统"),
+        ("sources", [{"source": "a.pdf", "page": 1}]),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_lexical_mode_does_not_embed_question():
+    with patch.object(rag_service, "aembed_query", AsyncMock()) as mock_embed:
+        retrieval = await rag_service.aretrieve_documents(
+            question="ERR-1042 是什么错误",
+            collection_names=["user_1_collection", "all_documents"],
+            embeddings_model_name="fake-model",
+            mode="lexical",
+            backend=FakeBackend(),
+        )
+
+    mock_embed.assert_not_awaited()
+    assert retrieval.query_embedding is None
+    assert [d.id for d in retrieval.documents] == [
+        "user_1_collection-0",
+        "all_documents-0",
+    ]
@@ -0,0 +1,34 @@
+import pytest
+from langchain_core.documents import Document
+
+from app.services import rerank_service
+
+
+@pytest.mark.asyncio
+async def test_rerank_orders_by_scorer_and_caches_pairs():
+    rerank_service.SCORE_CACHE.clear()
+    calls = []
+
+    def fake_scorer(question, texts):
+        calls.append(list(texts))
+        return [float(len(text)) for text in texts]
+
+    candidates = [
+        (Document(page_content="短"), 0.9),
+        (Document(page_content="最长的文本块"), 0.5),
+    ]
+    reranked = await rerank_service.arerank(
+        "问题", candidates, scorer=fake_scorer, model_name="fake"
+    )
+
+    assert [doc.page_content for doc, _ in reranked] == ["最长的文本块", "短"]
+    assert [score for _, score in reranked] == [6.0, 1.0]
+
+    # 规范化后相同的问题再次重排序时，只为新的文本块打分，且所有候选在一次调用中完成
+    candidates.append((Document(page_content="中等长度"), 0.1))
+    await rerank_service.arerank(
+        "问题？", candidates, scorer=fake_scorer, model_name="fake"
+    )
+
+    rerank_service.SCORE_CACHE.clear()
+    assert calls == [["短", "最长的文本块"], ["中等长度"]]
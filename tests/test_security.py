@@ -0,0 +1,117 @@
+# tests/test_security.py
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from jose import jwt
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core import security
+from app.core.config import settings
+from app.db.session import get_async_db
+from app.main import app
+from app.models.user import User
+from app.schemas.user import UserCreate
+from app.services import user_service
+
+
+@pytest.fixture
+def session_factory(monkeypatch, tmp_path):
+    """
+    临时 SQLite 文件代替 PostgreSQL：
+    应用走异步会话，测试本身用同步会话准备和修改数据
+    """
+    database = tmp_path / "auth.db"
+    engine = create_engine(f"sqlite:///{database}")
+    User.__table__.create(engine)
+    async_factory = async_sessionmaker(
+        create_async_engine(f"sqlite+aiosqlite:///{database}"), expire_on_commit=False
+    )
+    monkeypatch.setattr(security, "AsyncSessionLocal", async_factory)
+
+    async def override_get_async_db():
+        async with async_factory() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    security.USER_CACHE.clear()
+    yield sessionmaker(bind=engine)
+    app.dependency_overrides.pop(get_async_db, None)
+    security.USER_CACHE.clear()
+    engine.dispose()
+
+
+@pytest.fixture
+def client(session_factory):
+    with session_factory() as db:
+        user_service.create_user(db, UserCreate(username="alice", password="secret123"))
+    return TestClient(app)
+
+
+def login(client) -> dict:
+    response = client.post(
+        "/api/v1/token", data={"username": "alice", "password": "secret123"}
+    )
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_user_is_loaded_once_and_invalidated_on_deactivation(client, session_factory):
+    headers = login(client)
+    lookups = security.get_auth_stats()["db_lookups"]
+
+    for _ in range(3):
+        response = client.get("/api/v1/users/me", headers=headers)
+        assert response.json() == {"username": "alice", "id": 1, "is_active": True}
+    assert security.get_auth_stats()["db_lookups"] == lookups + 1
+
+    with session_factory() as db:
+        user_service.set_user_active(
+            db, user_service.get_user_by_username(db, "alice"), False
+        )
+
+    # 禁用后缓存立即失效，不需要等待 TTL
+    assert client.get("/api/v1/users/me", headers=headers).status_code == 403
+    assert security.get_auth_stats()["db_lookups"] == lookups + 2
+
+
+def test_signed_claims_are_trusted_only_when_enabled_and_fresh(client, monkeypatch):
+    headers = login(client)
+
+    async def fail_lookup(username):
+        raise AssertionError("不应查询数据库")
+
+    monkeypatch.setattr(settings, "AUTH_TRUST_TOKEN_CLAIMS", True)
+    monkeypatch.setattr(security, "_load_user", fail_lookup)
+    response = client.get("/api/v1/users/me", headers=headers)
+    assert response.json() == {"username": "alice", "id": 1, "is_active": True}
+
+    # 签发过久的 token 不直接信任，回到缓存 / 数据库
+    issued_at = datetime.now(timezone.utc) - timedelta(
+        seconds=settings.AUTH_TRUST_TOKEN_CLAIMS_MAX_AGE_SECONDS + 60
+    )
+    old_token = jwt.encode(
+        {
+            "sub": "alice",
+            "uid": 1,
+            "active": True,
+            "iat": issued_at,
+            "exp": issued_at + timedelta(days=1),
+        },
+        settings.SECRET_KEY.get_secret_value(),
+        algorithm="HS256",
+    )
+    with pytest.raises(AssertionError):
+        client.get("/api/v1/users/me", headers={"Authorization": f"Bearer {old_token}"})
+
+
+def test_unknown_user_is_not_cached(client):
+    token = security.create_access_token(data={"sub": "bob"})
+    assert (
+        client.get(
+            "/api/v1/users/me", headers={"Authorization": f"Bearer {token}"}
+        ).status_code
+        == 401
+    )
+    assert "bob" not in security.USER_CACHE
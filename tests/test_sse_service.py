@@ -0,0 +1,143 @@
+# tests/test_sse_service.py
+import asyncio
+import json
+
+import pytest
+from langchain_core.documents import Document
+
+from app.services import rag_service, sse_service
+from app.services.llm_service import LLMClientPool
+from benchmarks.fake_llm_server import create_app, serve_in_thread
+
+
+def parse(frames: list[str]) -> list[tuple[str, object]]:
+    """把 SSE 文本解析为 (事件类型, 内容)，心跳注释记为 ("ping", None)"""
+    events = []
+    for frame in frames:
+        if frame.startswith(":"):
+            events.append(("ping", None))
+            continue
+        lines = dict(line.split(": ", 1) for line in frame.strip().split("\n"))
+        payload = json.loads(lines["data"])
+        assert payload["type"] == lines["event"]
+        events.append((lines["event"], payload.get("content")))
+    return events
+
+
+async def token_source(
+    tokens: list[str], interval: float, first_delay: float = 0.0, fail: bool = False
+):
+    await asyncio.sleep(first_delay)
+    for i, token in enumerate(tokens):
+        if i:
+            await asyncio.sleep(interval)
+        yield "token", token
+    if fail:
+        raise RuntimeError("上游断开")
+    yield "sources", [{"source": "a.pdf", "page": 1}]
+
+
+@pytest.mark.asyncio
+async def test_tokens_are_coalesced_and_first_token_is_sent_immediately():
+    tokens = [f"t{i}" for i in range(100)]
+    frames = [
+        frame
+        async for frame in sse_service.encode_events(
+            token_source(tokens, interval=0.002), min_window_ms=10, max_window_ms=50
+        )
+    ]
+    events = parse(frames)
+    token_events = [content for event, content in events if event == "token"]
+
+    assert "".join(token_events) == "".join(tokens)
+    assert token_events[0] == "t0"
+    # 每个 token 单独写出需要 100 次，合并后少一个数量级
+    assert len(token_events) <= 10
+    assert events[-2:] == [
+        ("sources", [{"source": "a.pdf", "page": 1}]),
+        ("done", None),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_byte_budget_and_disabled_coalescing():
+    tokens = ["操作系统"] * 20  # 每个 12 字节
+    budgeted = parse(
+        [
+            frame
+            async for frame in sse_service.encode_events(
+                token_source(tokens, interval=0),
+                min_window_ms=1000,
+                max_window_ms=1000,
+                max_bytes=48,
+            )
+        ]
+    )
+    assert [len(content) for event, content in budgeted if event == "token"] == [4] + [
+        16
+    ] * 4 + [12]
+
+    unmerged = parse(
+        [
+            frame
+            async for frame in sse_service.encode_events(
+                token_source(tokens[:5], interval=0), max_window_ms=0
+            )
+        ]
+    )
+    assert [event for event, _ in unmerged] == ["token"] * 5 + ["sources", "done"]
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_while_waiting_and_error_event_on_failure():
+    events = parse(
+        [
+            frame
+            async for frame in sse_service.encode_events(
+                token_source(["答案"], interval=0, first_delay=0.08, fail=True),
+                heartbeat_seconds=0.03,
+            )
+        ]
+    )
+    assert events[0] == ("ping", None)
+    # 已生成的部分照常发送，异常以 error 事件结束，不发送 done
+    assert events[-2:] == [("token", "答案"), ("error", sse_service.ERROR_MESSAGE)]
+
+
+@pytest.mark.asyncio
+async def test_disconnect_cancels_upstream_llm_call(monkeypatch):
+    monkeypatch.setattr(rag_service.settings, "ENABLE_CACHE", False)
+    docs = [
+        Document(id="a", page_content="文本块", metadata={"source": "a.pdf", "page": 1})
+    ]
+    retrieval = rag_service.RetrievalResult(
+        documents=docs, query_embedding=[1.0, 0.0], collection_names=["all_documents"]
+    )
+    fake_llm = create_app(tokens=200, token_rate=20, first_token_ms=0)
+    with serve_in_thread(fake_llm) as url:
+        pool = LLMClientPool(
+            api_key="fake",
+            base_url=url,
+            model="fake",
+            max_concurrency=1,
+            max_connections=1,
+            max_keepalive_connections=1,
+            keepalive_expiry=60,
+            timeout=10,
+        )
+        try:
+            frames = sse_service.encode_events(
+                rag_service.stream_rag_answer("问题", retrieval, pool)
+            )
+            assert parse([await frames.__anext__()])[0][0] == "token"
+
+            # 客户端断开：上游请求被取消，不等完整答案（约 10 秒）生成完
+            await frames.aclose()
+            assert pool.stats()["in_flight"] == 0
+            for _ in range(100):
+                if fake_llm.state.stats["in_flight"] == 0:
+                    break
+                await asyncio.sleep(0.01)
+            assert fake_llm.state.stats["in_flight"] == 0
+        finally:
+            await pool.aclose()
@@ -0,0 +1,56 @@
+# tests/test_startup_imports.py
+"""
+导入 app.main 时不应加载模型和 LangChain 相关的重量级依赖
+（在子进程中检查，不受其它测试的导入影响）
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# 任何配置下都只在首次使用时导入
+DEFERRED = [
+    "torch",
+    "sentence_transformers",
+    "transformers",
+    "langchain_openai",
+    "langchain_huggingface",
+    "openai",
+    "langchain",
+    "fitz",
+    "faiss",
+]
+
+
+def imported_modules(profile: str) -> set[str]:
+    code = (
+        "import sys, json, app.main; "
+        "print(json.dumps(sorted({m.split('.')[0] for m in sys.modules})))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        env={**os.environ, "APP_PROFILE": profile},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return set(json.loads(result.stdout.strip().splitlines()[-1]))
+
+
+@pytest.mark.parametrize("profile", ["full", "auth"])
+def test_heavy_dependencies_are_deferred(profile):
+    modules = imported_modules(profile)
+    assert modules.isdisjoint(DEFERRED), sorted(modules.intersection(DEFERRED))
+
+
+def test_auth_profile_skips_inference_stack():
+    modules = imported_modules("auth")
+    assert modules.isdisjoint(["numpy", "langchain_core", "langchain_postgres"])
+    assert "jose" in modules
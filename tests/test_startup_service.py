@@ -0,0 +1,123 @@
+# tests/test_startup_service.py
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from pydantic import SecretStr
+
+from app.core.config import settings
+from app.core.security import get_current_user
+from app.main import app
+from app.schemas.user import AuthenticatedUser
+from app.services import llm_service, startup_service
+from app.services.startup_service import StartupPhase, StartupState
+
+
+@pytest.mark.asyncio
+async def test_failed_required_phase_is_retried_until_ready():
+    state = StartupState()
+    calls = {"database": 0}
+
+    async def model():
+        pass
+
+    async def database():
+        calls["database"] += 1
+        if calls["database"] < 3:
+            raise ConnectionError("数据库未启动")
+
+    async def llm_pool():
+        raise RuntimeError("未配置密钥")
+
+    phases = [
+        StartupPhase("embedding_model", model),
+        StartupPhase("database", database),
+        StartupPhase("llm_pool", llm_pool, required=False),
+    ]
+    await state.run(phases, retry_seconds=0)
+
+    result = state.as_dict()
+    assert result["ready"] is True
+    assert [(p["name"], p["status"], p["attempts"]) for p in result["phases"]] == [
+        ("embedding_model", "ok", 1),
+        ("database", "ok", 3),
+        # 非必需阶段失败不影响就绪，也不重试
+        ("llm_pool", "failed", 1),
+    ]
+    assert result["ready_after_seconds"] >= 0
+
+
+@pytest.mark.asyncio
+async def test_background_phase_runs_after_ready_without_blocking_it():
+    state = StartupState()
+    index_built = asyncio.Event()
+    order = []
+
+    async def retriever():
+        order.append("global_retriever")
+
+    async def vector_index():
+        order.append("vector_index")
+        await index_built.wait()
+
+    phases = [
+        StartupPhase("vector_index", vector_index, required=False, background=True),
+        StartupPhase("global_retriever", retriever),
+    ]
+    task = asyncio.create_task(state.run(phases, retry_seconds=0))
+    while not order or order[-1] != "vector_index":
+        await asyncio.sleep(0)
+
+    # 建索引期间服务已经就绪
+    assert order == ["global_retriever", "vector_index"]
+    assert state.ready is True
+    assert phases[0].status == "running"
+
+    index_built.set()
+    await task
+    assert phases[0].status == "ok"
+
+
+def test_readyz_reflects_startup_state(monkeypatch):
+    state = StartupState()
+    monkeypatch.setattr(startup_service, "STARTUP", state)
+    client = TestClient(app)  # 不进入 lifespan，不触发真实的预热
+
+    assert client.get("/healthz").status_code == 200
+    response = client.get("/readyz")
+    assert response.status_code == 503
+    assert response.json()["ready"] is False
+
+    phase = StartupPhase("database", None, status="ok")
+    state.phases = [phase]
+    state.started_at = 0.0
+    assert client.get("/readyz").status_code == 200
+
+
+def test_llm_pool_phase_is_required_when_api_key_is_configured(monkeypatch):
+    monkeypatch.setattr(settings, "DEEPSEEK_API_KEY", SecretStr("sk-test"))
+    phases = {
+        phase.name: phase for phase in startup_service.default_phases(engine=None)
+    }
+    assert phases["llm_pool"].required is True
+
+    monkeypatch.setattr(settings, "DEEPSEEK_API_KEY", SecretStr(""))
+    phases = {
+        phase.name: phase for phase in startup_service.default_phases(engine=None)
+    }
+    assert phases["llm_pool"].required is False
+
+
+def test_query_without_llm_pool_returns_503(monkeypatch):
+    monkeypatch.setattr(llm_service, "_POOL", None)
+    app.dependency_overrides[get_current_user] = lambda: AuthenticatedUser(
+        id=1, username="alice", is_active=True
+    )
+    try:
+        client = TestClient(app)
+        for path in ("/api/v1/query", "/api/v1/stream-query"):
+            response = client.post(path, json={"question": "什么是操作系统？"})
+            assert response.status_code == 503
+            assert "LLM" in response.json()["detail"]
+    finally:
+        app.dependency_overrides.clear()
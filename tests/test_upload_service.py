@@ -0,0 +1,104 @@
+# tests/test_upload_service.py
+import hashlib
+import os
+
+import pytest
+
+from app.services.upload_service import (
+    InvalidUploadError,
+    UploadTooLargeError,
+    save_pdf_upload,
+)
+
+BOUNDARY = "test-boundary"
+
+
+def multipart_body(
+    content: bytes, filename: str = "报告.pdf", content_type: str = "application/pdf"
+) -> bytes:
+    return (
+        (
+            f"--{BOUNDARY}\r\n"
+            f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        ).encode("utf-8")
+        + content
+        + f"\r\n--{BOUNDARY}--\r\n".encode()
+    )
+
+
+def headers_for(body: bytes, with_length: bool = True) -> dict:
+    headers = {"content-type": f"multipart/form-data; boundary={BOUNDARY}"}
+    if with_length:
+        headers["content-length"] = str(len(body))
+    return headers
+
+
+async def stream(body: bytes, chunk_size: int = 1000):
+    for i in range(0, len(body), chunk_size):
+        yield body[i : i + chunk_size]
+
+
+@pytest.mark.asyncio
+async def test_upload_is_streamed_to_disk_with_hash(tmp_path):
+    content = b"%PDF-1.7\n" + os.urandom(10_000)
+    body = multipart_body(content)
+
+    upload = await save_pdf_upload(
+        headers_for(body), stream(body), str(tmp_path), max_bytes=1024 * 1024
+    )
+
+    assert upload.filename == "报告.pdf"
+    assert upload.size == len(content)
+    assert upload.sha256 == hashlib.sha256(content).hexdigest()
+    with open(upload.path, "rb") as f:
+        assert f.read() == content
+    assert os.listdir(tmp_path) == [os.path.basename(upload.path)]
+
+
+@pytest.mark.asyncio
+async def test_content_length_over_limit_is_rejected_before_reading(tmp_path):
+    body = multipart_body(b"%PDF-" + b"x" * 5000)
+
+    async def must_not_read():
+        raise AssertionError("不应读取请求体")
+        yield b""
+
+    with pytest.raises(UploadTooLargeError):
+        await save_pdf_upload(
+            {**headers_for(body), "content-length": str(100 * 1024 * 1024)},
+            must_not_read(),
+            str(tmp_path),
+            max_bytes=1024,
+        )
+
+
+@pytest.mark.asyncio
+async def test_size_limit_enforced_while_streaming(tmp_path):
+    """没有 Content-Length（分块传输）时，写入过程中超过上限立即中止并清理临时文件"""
+    body = multipart_body(b"%PDF-" + b"x" * 50_000)
+
+    with pytest.raises(UploadTooLargeError):
+        await save_pdf_upload(
+            headers_for(body, with_length=False),
+            stream(body),
+            str(tmp_path),
+            max_bytes=20_000,
+        )
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.asyncio
+async def test_non_pdf_content_is_rejected(tmp_path):
+    body = multipart_body(b"MZ\x90\x00 not a pdf")
+    with pytest.raises(InvalidUploadError):
+        await save_pdf_upload(
+            headers_for(body), stream(body), str(tmp_path), max_bytes=1024 * 1024
+        )
+
+    body = multipart_body(b"%PDF-1.4", content_type="text/plain")
+    with pytest.raises(InvalidUploadError):
+        await save_pdf_upload(
+            headers_for(body), stream(body), str(tmp_path), max_bytes=1024 * 1024
+        )
+    assert os.listdir(tmp_path) == []
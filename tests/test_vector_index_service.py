@@ -0,0 +1,80 @@
+# tests/test_vector_index_service.py
+import pytest
+
+from app.services import vector_index_service
+from app.services.vector_index_service import (
+    _apply_search_params,
+    build_index_sql,
+    default_ivfflat_lists,
+    search_params,
+)
+
+
+class FakeCursor:
+    def __init__(self, executed):
+        self.executed = executed
+
+    def execute(self, statement):
+        self.executed.append(statement)
+
+    def close(self):
+        pass
+
+
+class FakeDBAPIConnection:
+    def __init__(self):
+        self.executed = []
+
+    def cursor(self):
+        return FakeCursor(self.executed)
+
+
+def test_build_index_sql():
+    """HNSW 与 IVFFlat 索引语句使用余弦距离算子类和对应参数"""
+    sql = build_index_sql("hnsw", m=24, ef_construction=100, concurrently=True)
+    assert sql.startswith(
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_langchain_pg_embedding_hnsw"
+    )
+    assert (
+        "USING hnsw (embedding vector_cosine_ops) WITH (m = 24, ef_construction = 100)"
+        in sql
+    )
+
+    sql = build_index_sql("ivfflat", lists=50)
+    assert "CONCURRENTLY" not in sql
+    assert "USING ivfflat (embedding vector_cosine_ops) WITH (lists = 50)" in sql
+
+    with pytest.raises(ValueError):
+        build_index_sql("flat")
+
+
+def test_default_ivfflat_lists():
+    assert default_ivfflat_lists(0) == 1
+    assert default_ivfflat_lists(200_000) == 200
+    assert default_ivfflat_lists(4_000_000) == 2000
+
+
+def test_search_params_applied_only_when_changed(monkeypatch):
+    """连接取出时只在参数变化时发送 SET / RESET，请求结束后恢复默认值"""
+    monkeypatch.setattr(vector_index_service.settings, "VECTOR_HNSW_EF_SEARCH", None)
+    monkeypatch.setattr(vector_index_service.settings, "VECTOR_IVFFLAT_PROBES", None)
+    conn = FakeDBAPIConnection()
+    info = {}
+
+    with search_params(ef_search=100):
+        _apply_search_params(conn, info)
+        _apply_search_params(conn, info)
+    assert conn.executed == ["SET hnsw.ef_search = 100"]
+
+    _apply_search_params(conn, info)
+    assert conn.executed == ["SET hnsw.ef_search = 100", "RESET hnsw.ef_search"]
+
+
+def test_search_params_fall_back_to_settings(monkeypatch):
+    monkeypatch.setattr(vector_index_service.settings, "VECTOR_HNSW_EF_SEARCH", 80)
+    monkeypatch.setattr(vector_index_service.settings, "VECTOR_IVFFLAT_PROBES", 10)
+    conn = FakeDBAPIConnection()
+
+    with search_params(probes=20):
+        _apply_search_params(conn, {})
+    assert conn.executed == ["SET hnsw.ef_search = 80", "SET ivfflat.probes = 20"]
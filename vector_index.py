@@ -0,0 +1,77 @@
+import argparse
+import json
+
+from app.core.config import settings
+from app.core.logging_config import configure_logging
+from app.db.session import engine
+from app.services import lexical_index_service, vector_index_service
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="管理 PGVector 向量表上的 HNSW / IVFFlat 近似最近邻索引"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    create_parser = subparsers.add_parser("create", help="创建向量索引")
+    create_parser.add_argument(
+        "--method", choices=["hnsw", "ivfflat"], default=settings.VECTOR_INDEX_METHOD
+    )
+    create_parser.add_argument(
+        "--m", type=int, default=settings.VECTOR_HNSW_M, help="HNSW 每个节点的连接数"
+    )
+    create_parser.add_argument(
+        "--ef-construction", type=int, default=settings.VECTOR_HNSW_EF_CONSTRUCTION
+    )
+    create_parser.add_argument(
+        "--lists", type=int, help="IVFFlat 聚类数，默认按行数自动计算"
+    )
+    create_parser.add_argument(
+        "--concurrently",
+        action="store_true",
+        help="使用 CREATE INDEX CONCURRENTLY，构建期间不阻塞写入",
+    )
+
+    drop_parser = subparsers.add_parser("drop", help="删除向量索引")
+    drop_parser.add_argument("--method", choices=["hnsw", "ivfflat"], required=True)
+
+    subparsers.add_parser("status", help="查看表行数、索引大小和构建耗时")
+
+    maintain_parser = subparsers.add_parser(
+        "maintain", help="索引缺失时创建，IVFFlat 数据量变化较大时重建"
+    )
+    maintain_parser.add_argument("--method", choices=["hnsw", "ivfflat"])
+
+    backfill_parser = subparsers.add_parser(
+        "lexical-backfill", help="为启用全文索引之前写入的文本块补建全文索引"
+    )
+    backfill_parser.add_argument("--batch-size", type=int, default=1000)
+
+    args = parser.parse_args()
+    configure_logging()
+    if args.command == "create":
+        vector_index_service.create_vector_index(
+            engine,
+            method=args.method,
+            m=args.m,
+            ef_construction=args.ef_construction,
+            lists=args.lists,
+            concurrently=args.concurrently,
+        )
+    elif args.command == "drop":
+        vector_index_service.drop_vector_index(engine, args.method)
+        print(f"索引 {vector_index_service.INDEX_NAMES[args.method]} 已删除。")
+    elif args.command == "status":
+        status = vector_index_service.get_index_status(engine)
+        print(json.dumps(status, ensure_ascii=False, indent=2))
+    elif args.command == "maintain":
+        vector_index_service.maintain_vector_index(engine, method=args.method)
+    elif args.command == "lexical-backfill":
+        total = lexical_index_service.backfill_lexical_index(
+            engine, batch_size=args.batch_size
+        )
+        print(f"全文索引补建完成，共 {total} 行。")
+
+
+if __name__ == "__main__":
+    main()
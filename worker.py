@@ -0,0 +1,46 @@
+# worker.py
+import argparse
+import multiprocessing
+import signal
+
+from app.core.config import settings
+from app.services.ingestion_worker import run_worker
+
+
+def main():
+    """
+    启动摄取 worker 进程池。每个进程独立地从数据库任务队列中领取上传任务，
+    加载一次嵌入模型后持续处理，与 API 进程完全隔离。
+    """
+    parser = argparse.ArgumentParser(description="启动文档摄取 worker")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=settings.INGEST_WORKER_CONCURRENCY,
+        help="worker 进程数",
+    )
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    stop_event = context.Event()
+
+    def handle_signal(signum, frame):
+        print("收到退出信号，等待正在执行的任务完成...")
+        stop_event.set()
+
+    processes = [
+        context.Process(
+            target=run_worker, args=(i, stop_event), name=f"ingest-worker-{i}"
+        )
+        for i in range(args.concurrency)
+    ]
+    for process in processes:
+        process.start()
+    # 子进程启动后再注册信号处理，子进程忽略 Ctrl+C，由主进程统一通知退出
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+    for process in processes:
+        process.join()
+
+if __name__ == "__main__":
+    main()